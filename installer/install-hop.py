@@ -76,6 +76,11 @@ Acquire::CompressionTypes::Order:: "gz";
 Dir::Cache { srcpkgcache ""; pkgcache ""; }
 """
 
+# Checking the nginx config (before reloading it) needs root
+SUDOERS = f"""
+{HOP3_USER} ALL=(root) NOPASSWD: /usr/sbin/nginx -t
+"""
+
 
 def main() -> None:
     setup_server()
@@ -265,6 +270,13 @@ def setup_nginx() -> None:
         force=True,
     )
 
+    files.put(
+        name="Allow hop3 to check the nginx config",
+        src=StringIO(SUDOERS),
+        dest="/etc/sudoers.d/hop3",
+        mode="440",
+    )
+
     # Systemd
     files.put(
         name="Put systemd.path hop3-nginx.path",
@@ -7,6 +7,7 @@ certificate validation, but this still needs to be implemented.
 
 from __future__ import annotations
 
+import json
 import os
 from dataclasses import dataclass
 from functools import cached_property
@@ -20,6 +21,8 @@ from sshtunnel import SSHTunnelForwarder
 from .exceptions import CliError
 
 if TYPE_CHECKING:
+    from collections.abc import Iterator
+
     from .config import Config
     from .state import State
 
@@ -63,6 +66,11 @@ class Client:
         else:
             return f"http://localhost:{self.server_port}/rpc"
 
+    @property
+    def rpc_stream_url(self):
+        """Return the URL of the streaming variant of the RPC endpoint."""
+        return f"{self.rpc_url}/stream"
+
     def start_ssh_tunnel(self):
         self.tunnel = SSHTunnelForwarder(
             self.host,
@@ -95,3 +103,19 @@ class Client:
             return parse(response.json())
         except Exception as e:
             return Error(response.status_code, str(e), "", json_request["id"])
+
+    def rpc_stream(self, method: str, *args: list[str]) -> Iterator[dict]:
+        """Call a remote method, yielding the result items as they arrive.
+
+        The server sends the items as NDJSON (one JSON object per line).
+        """
+        json_request = request(method, args)
+        with requests.post(
+            self.rpc_stream_url, json=json_request, stream=True
+        ) as response:
+            if not response.ok:
+                msg = f"Server error ({response.status_code}): {response.text}"
+                raise CliError(msg)
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
@@ -9,12 +9,12 @@ from __future__ import annotations
 
 import sys
 
-from jsonrpcclient import Error, Ok
 from loguru import logger
 
 from .client import Client
 from .config import Config
 from .console import err
+from .exceptions import CliError
 from .printer import Printer
 
 logger.remove()
@@ -54,9 +54,9 @@ def run_command_from_args(args: list[str]) -> None:
         # debug_cmd(args, context)
         return
 
-    parsed = context.rpc("cli", args)
-    match parsed:
-        case Ok(result=result):
-            Printer().print(result)
-        case Error(message=message):
-            print("Error:\n", message)
+    # The result is streamed, so that long-running commands (e.g. deploy)
+    # show their output as it is produced.
+    try:
+        Printer().print(context.rpc_stream("cli", args))
+    except CliError as e:
+        print("Error:\n", e)
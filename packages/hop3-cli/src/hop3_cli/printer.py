@@ -1,10 +1,15 @@
 # Copyright (c) 2023-2025, Abilian SAS
 from __future__ import annotations
 
+import sys
 from dataclasses import dataclass
+from typing import TYPE_CHECKING
 
 from tabulate import tabulate
 
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
 Message = list[str]
 
 
@@ -12,7 +17,8 @@ Message = list[str]
 class Printer:
     verbose: bool = False
 
-    def print(self, msg) -> None:
+    def print(self, msg: Iterable[dict]) -> None:
+        # `msg` may be a stream: items are printed as they arrive
         for item in msg:
             t = item["t"]
             meth = getattr(self, f"print_{t}")
@@ -21,7 +27,10 @@ class Printer:
     def print_table(self, table: dict) -> None:
         headers = table["headers"]
         rows = table["rows"]
-        print(tabulate(rows, headers=headers))
+        print(tabulate(rows, headers=headers), flush=True)
 
     def print_text(self, obj: dict) -> None:
-        print(obj["text"])
+        print(obj["text"], flush=True)
+
+    def print_error(self, obj: dict) -> None:
+        print(f"Error: {obj['text']}", file=sys.stderr, flush=True)
@@ -8,6 +8,8 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING
 
+from ._cache import BuildCache, PackageCache, get_build_caches
+from ._toolchains import ToolchainStore, get_used_toolchains, link_binaries
 from .clojure import ClojureBuilder
 from .go import GoBuilder
 from .node import NodeBuilder
@@ -17,6 +19,21 @@ from .ruby import RubyBuilder
 if TYPE_CHECKING:
     from ._base import Builder
 
+__all__ = [
+    "BUILDER_CLASSES",
+    "BuildCache",
+    "ClojureBuilder",
+    "GoBuilder",
+    "NodeBuilder",
+    "PackageCache",
+    "PythonBuilder",
+    "RubyBuilder",
+    "ToolchainStore",
+    "get_build_caches",
+    "get_used_toolchains",
+    "link_binaries",
+]
+
 BUILDER_CLASSES: list[type[Builder]] = [
     PythonBuilder,
     RubyBuilder,
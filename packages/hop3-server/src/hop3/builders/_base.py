@@ -6,6 +6,7 @@
 
 from __future__ import annotations
 
+import os
 from abc import ABC, abstractmethod
 from typing import TYPE_CHECKING, ClassVar
 
@@ -13,6 +14,8 @@ from hop3 import config as c
 from hop3.core.env import Env
 from hop3.lib import shell
 
+from ._cache import PackageCache
+
 if TYPE_CHECKING:
     import subprocess
     from pathlib import Path
@@ -102,6 +105,11 @@ class Builder(ABC):
         """Return the path to the environment file for the application."""
         return self.app_path / "ENV"
 
+    def get_outputs(self) -> list[Path]:
+        """Return the trees produced by the build (a redeploy must rebuild
+        the app if one of them is missing)."""
+        return [self.virtual_env]
+
     def shell(
         self, command: str, cwd: str | Path = "", **kwargs
     ) -> subprocess.CompletedProcess:
@@ -114,10 +122,19 @@ class Builder(ABC):
             cwd (str or Path, optional): The working directory where the command will be executed.
                 Defaults to the application path if not provided.
             **kwargs: Additional keyword arguments to be passed to the shell function.
+
+        The package managers are pointed to the download caches shared by
+        all apps (unless the environment says otherwise).
+
+        The working directory and the environment are passed explicitly to
+        the command (they are never changed for the whole process), so that
+        several builds can run concurrently.
         """
         if not cwd:
             # Build in the source directory
             cwd = str(self.src_path)
+        env = kwargs.get("env") or {}
+        kwargs["env"] = {**PackageCache().get_env(), **os.environ, **env}
         return shell(command, cwd=str(cwd), **kwargs)
 
     def get_env(self) -> Env:
@@ -0,0 +1,454 @@
+# Copyright (c) 2025, Abilian SAS
+#
+# SPDX-License-Identifier: Apache-2.0
+"""Build caches.
+
+Installing dependencies (a virtualenv, `node_modules`, a bundler vendor
+tree...) is usually the slowest step of a build, and is useless when the
+dependencies didn't change since the last push.
+
+The key of the build cache (`BuildCache`) is a hash of the dependency
+lockfiles (`requirements.txt`, `package-lock.json`, `Gemfile.lock`...) and
+of the runtime version. When the key didn't change, the installed tree is
+reused as is. When it did, but a tree with the same key was built before
+(e.g. when rolling back), it is restored from the cache using hardlinks.
+
+Restored trees share their files with the cache (and, e.g. for
+`node_modules`, with every app using the same lockfile): they must never
+be modified in place. Files are replaced (removed, then written again),
+as the builders and the package managers do.
+
+The trees which are no longer used by any app (the cache remembers where
+each one was installed) are pruned by age and size (`BUILD_CACHE_MAX_AGE`,
+`BUILD_CACHE_MAX_SIZE`) whenever a new tree is stored, and by
+`hop system cache prune`. The trees of an app are forgotten when it is
+destroyed.
+
+The package cache (`PackageCache`) is a per-host directory for the download
+caches of the package managers, so that a package used by several apps is
+downloaded once. It is pruned by LRU (`hop system cache prune`).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import stat
+import time
+import uuid
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from attrs import field, frozen
+
+from hop3 import config as c
+from hop3.lib import log
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+__all__ = ["BuildCache", "CacheEntry", "PackageCache", "get_build_caches"]
+
+# Stamp file, in the installed tree, containing its cache key
+STAMP_FILE = ".hop3-build-key"
+
+# Next to each cached tree: the paths where it was installed (its mtime is
+# the last time it was used)
+TARGETS_SUFFIX = ".targets"
+
+# In the cache of each kind: its mtime is the last time it was pruned
+PRUNE_STAMP_FILE = ".last-prune"
+
+
+@frozen
+class CacheEntry:
+    """A tree in the build cache."""
+
+    key: str
+    path: Path
+    last_used: float
+    # Where the tree was installed
+    targets: list[str]
+
+    @property
+    def size(self) -> int:
+        """The size of the files only held by the cache (i.e. what removing
+        the entry frees)."""
+        return sum(st.st_size for _, st in _iter_files(self.path) if st.st_nlink == 1)
+
+
+@frozen
+class BuildCache:
+    """Cache of the dependency trees of a given kind (e.g. "python").
+
+    Attributes:
+        kind: The kind of tree (one cache directory per kind).
+        root: The root of the build cache.
+    """
+
+    kind: str
+    root: Path = field(factory=lambda: c.BUILD_CACHE_ROOT)
+
+    @property
+    def enabled(self) -> bool:
+        return c.BUILD_CACHE
+
+    def compute_key(self, files: Iterable[Path], *extra: str) -> str:
+        """Compute the cache key from the given files (when they exist) and
+        extra strings (e.g. the runtime version)."""
+        digest = hashlib.sha256(self.kind.encode())
+        for path in sorted(files):
+            if not path.is_file():
+                continue
+            digest.update(b"\0" + path.name.encode() + b"\0")
+            digest.update(path.read_bytes())
+        for value in extra:
+            digest.update(b"\0" + value.encode())
+        return digest.hexdigest()
+
+    def get_path(self, key: str) -> Path:
+        return self.root / self.kind / key
+
+    def is_current(self, key: str, target: Path) -> bool:
+        """Check if the tree at `target` was built for this key."""
+        stamp = target / STAMP_FILE
+        return stamp.exists() and stamp.read_text().strip() == key
+
+    def reuse(self, key: str, target: Path) -> bool:
+        """Make sure the tree at `target` matches the key, if possible.
+
+        Returns:
+            True if the tree is up to date (possibly after being restored
+            from the cache), False if it must be (re)built.
+        """
+        if not self.enabled:
+            return False
+
+        if self.is_current(key, target):
+            log("Dependencies unchanged, reusing them.", level=3, fg="green")
+            self._add_target(key, target)
+            return True
+
+        if self.restore(key, target):
+            log("Dependencies restored from the build cache.", level=3, fg="green")
+            self._add_target(key, target)
+            return True
+
+        return False
+
+    def restore(self, key: str, target: Path) -> bool:
+        """Replace the tree at `target` by the cached one (if any).
+
+        The files of the restored tree are hardlinks to the cached ones:
+        they must not be modified in place.
+        """
+        cached = self.get_path(key)
+        if not cached.exists():
+            return False
+
+        # Build the new tree next to the target, then swap them, so the
+        # target is never left half-populated.
+        tmp = target.with_name(f"{target.name}.tmp-{uuid.uuid4().hex}")
+        _link_tree(cached, tmp)
+        if target.exists():
+            old = target.with_name(f"{target.name}.old-{uuid.uuid4().hex}")
+            target.rename(old)
+            tmp.rename(target)
+            shutil.rmtree(old, ignore_errors=True)
+        else:
+            tmp.rename(target)
+        return True
+
+    def detach(self, target: Path) -> None:
+        """Remove the tree at `target` if it shares its files with the cache,
+        before it is rebuilt by a tool which may modify files in place."""
+        if (target / STAMP_FILE).exists():
+            shutil.rmtree(target)
+
+    def store(self, key: str, target: Path) -> None:
+        """Stamp the tree at `target`, and add it to the cache."""
+        if not target.is_dir():
+            # Nothing was installed (e.g. a project without dependencies)
+            return
+
+        # The stamp may be hardlinked to a cached tree: never modify it in place
+        stamp = target / STAMP_FILE
+        stamp.unlink(missing_ok=True)
+        stamp.write_text(key)
+
+        if not self.enabled:
+            return
+
+        cached = self.get_path(key)
+        if not cached.exists():
+            cached.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cached.with_name(f"{key}.tmp-{uuid.uuid4().hex}")
+            try:
+                _link_tree(target, tmp)
+                tmp.rename(cached)
+            except OSError:
+                # E.g. another build stored the same key in the meantime
+                shutil.rmtree(tmp, ignore_errors=True)
+        self._add_target(key, target)
+        self.prune_if_due()
+
+    def entries(self) -> list[CacheEntry]:
+        """The cached trees, least recently used first."""
+        entries = []
+        kind_path = self.root / self.kind
+        for path in kind_path.iterdir() if kind_path.is_dir() else []:
+            # (Skip the partial trees, and the lists of targets)
+            if "." in path.name or not path.is_dir():
+                continue
+            targets_path = path.with_name(path.name + TARGETS_SUFFIX)
+            try:
+                targets = targets_path.read_text().splitlines()
+                last_used = targets_path.stat().st_mtime
+            except OSError:
+                targets = []
+                last_used = path.stat().st_mtime
+            entries.append(
+                CacheEntry(
+                    key=path.name,
+                    path=path,
+                    last_used=last_used,
+                    targets=[target for target in targets if target],
+                )
+            )
+        entries.sort(key=lambda entry: entry.last_used)
+        return entries
+
+    def is_live(self, entry: CacheEntry) -> bool:
+        """Check if the tree is currently installed somewhere."""
+        return any(self.is_current(entry.key, Path(t)) for t in entry.targets)
+
+    def prune(self, max_size: int = 0, max_age: int = 0) -> tuple[int, int]:
+        """Remove the cached trees which are no longer installed anywhere,
+        if unused for more than `max_age` days, then the least recently
+        used ones until they fit in `max_size` bytes.
+
+        Returns:
+            The number of trees and bytes removed.
+        """
+        max_size = max_size or c.BUILD_CACHE_MAX_SIZE
+        max_age = max_age or c.BUILD_CACHE_MAX_AGE
+        min_last_used = time.time() - max_age * 86400
+
+        unused = [
+            (entry, entry.size) for entry in self.entries() if not self.is_live(entry)
+        ]
+        total = sum(size for _, size in unused)
+        removed = freed = 0
+        for entry, size in unused:
+            if entry.last_used >= min_last_used and total <= max_size:
+                break
+            self.remove(entry.key)
+            total -= size
+            removed += 1
+            freed += size
+        return removed, freed
+
+    def prune_if_due(self) -> None:
+        """Prune the cache, unless it was pruned less than
+        `BUILD_CACHE_PRUNE_INTERVAL` seconds ago (pruning reads all the
+        cached trees)."""
+        stamp = self.root / self.kind / PRUNE_STAMP_FILE
+        try:
+            if time.time() - stamp.stat().st_mtime < c.BUILD_CACHE_PRUNE_INTERVAL:
+                return
+        except OSError:
+            pass
+        stamp.parent.mkdir(parents=True, exist_ok=True)
+        stamp.touch()
+        self.prune()
+
+    def forget(self, app_path: Path) -> int:
+        """Forget the trees installed in an app (e.g. when it is destroyed),
+        and remove the ones no longer installed anywhere else.
+
+        Returns:
+            The number of trees removed.
+        """
+        removed = 0
+        for entry in self.entries():
+            targets = [
+                target
+                for target in entry.targets
+                if not Path(target).is_relative_to(app_path)
+            ]
+            if targets == entry.targets:
+                continue
+            if not targets:
+                self.remove(entry.key)
+                removed += 1
+            else:
+                self._write_targets(entry.key, targets)
+        return removed
+
+    def remove(self, key: str) -> None:
+        path = self.get_path(key)
+        path.with_name(key + TARGETS_SUFFIX).unlink(missing_ok=True)
+        shutil.rmtree(path, ignore_errors=True)
+
+    def clear(self) -> None:
+        shutil.rmtree(self.root / self.kind, ignore_errors=True)
+
+    def _add_target(self, key: str, target: Path) -> None:
+        """Remember where the tree was installed, and when."""
+        if not self.get_path(key).exists():
+            return
+        targets_path = self.get_path(key).with_name(key + TARGETS_SUFFIX)
+        try:
+            targets = targets_path.read_text().splitlines()
+        except OSError:
+            targets = []
+        if str(target) not in targets:
+            targets.append(str(target))
+        self._write_targets(key, targets)
+
+    def _write_targets(self, key: str, targets: list[str]) -> None:
+        targets_path = self.get_path(key).with_name(key + TARGETS_SUFFIX)
+        tmp = targets_path.with_name(f"{targets_path.name}.tmp-{uuid.uuid4().hex}")
+        tmp.write_text("".join(f"{target}\n" for target in targets))
+        tmp.replace(targets_path)
+
+
+def get_build_caches(root: Path | None = None) -> list[BuildCache]:
+    """The build caches of all kinds (which have been used)."""
+    root = root or c.BUILD_CACHE_ROOT
+    if not root.is_dir():
+        return []
+    return [
+        BuildCache(path.name, root=root)
+        for path in sorted(root.iterdir())
+        if path.is_dir()
+    ]
+
+
+def _link_tree(src: Path, dst: Path) -> None:
+    """Copy a tree using hardlinks (falling back to copies, e.g. across
+    filesystems)."""
+    shutil.copytree(src, dst, symlinks=True, copy_function=_link_or_copy)
+
+
+def _link_or_copy(src: str, dst: str) -> None:
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+# Environment variables used to point each tool to its download cache
+# (paths are relative to the package cache root)
+PACKAGE_CACHE_DIRS = {
+    "PIP_CACHE_DIR": "pip",
+    "UV_CACHE_DIR": "uv",
+    "npm_config_cache": "npm",
+    "BUNDLE_USER_CACHE": "bundler",
+    "COMPOSER_CACHE_DIR": "composer",
+    "GOMODCACHE": "go/mod",
+    "GOCACHE": "go/build",
+    "CARGO_HOME": "cargo",
+}
+
+# Parts of the cache that can safely be pruned file by file (pure download
+# caches, whose entries are checked by the tools). Other parts contain
+# extracted trees, which are only removed by `clear()`.
+PRUNABLE_DIRS = [
+    "pip",
+    "npm/_cacache",
+    "bundler",
+    "composer",
+    "go/mod/cache/download",
+    "go/build",
+    "cargo/registry/cache",
+]
+
+
+@frozen
+class CacheUsage:
+    name: str
+    size: int
+    files: int
+
+
+@frozen
+class PackageCache:
+    """Download caches of the package managers, shared by all apps."""
+
+    root: Path = field(factory=lambda: c.PACKAGE_CACHE_ROOT)
+
+    def get_env(self) -> dict[str, str]:
+        """Return the environment variables pointing to the caches."""
+        return {
+            name: str(self.root / subdir) for name, subdir in PACKAGE_CACHE_DIRS.items()
+        }
+
+    def usage(self) -> list[CacheUsage]:
+        """Return the disk usage of each tool's cache."""
+        result = []
+        for path in sorted(self.root.iterdir()) if self.root.exists() else []:
+            files = _iter_files(path)
+            size = sum(st.st_size for _, st in files)
+            result.append(CacheUsage(path.name, size, len(files)))
+        return result
+
+    def prune(self, max_size: int = 0) -> tuple[int, int]:
+        """Remove the least recently used files until the prunable part of
+        the cache fits in `max_size` bytes.
+
+        Returns:
+            The number of files and bytes removed.
+        """
+        max_size = max_size or c.PACKAGE_CACHE_MAX_SIZE
+
+        files = []
+        for subdir in PRUNABLE_DIRS:
+            files += _iter_files(self.root / subdir)
+
+        total = sum(st.st_size for _, st in files)
+        # Least recently used first (atime may not be updated on every
+        # access, depending on mount options, hence the mtime)
+        files.sort(key=lambda item: max(item[1].st_atime, item[1].st_mtime))
+
+        removed = freed = 0
+        for path, st in files:
+            if total <= max_size:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= st.st_size
+            removed += 1
+            freed += st.st_size
+        return removed, freed
+
+    def clear(self) -> None:
+        """Remove the whole cache."""
+        if self.root.exists():
+            # Some tools (e.g. go) make their cache read-only
+            shutil.rmtree(self.root, onerror=_make_writable_and_retry)
+
+
+def _iter_files(path: Path) -> list[tuple[Path, os.stat_result]]:
+    result = []
+    if not path.exists():
+        return result
+    for dirpath, _dirnames, filenames in os.walk(path):
+        for filename in filenames:
+            file_path = Path(dirpath, filename)
+            try:
+                st = file_path.lstat()
+            except OSError:
+                continue
+            if stat.S_ISREG(st.st_mode):
+                result.append((file_path, st))
+    return result
+
+
+def _make_writable_and_retry(func, path, _exc) -> None:
+    Path(path).parent.chmod(0o755)
+    Path(path).chmod(0o755)
+    func(path)
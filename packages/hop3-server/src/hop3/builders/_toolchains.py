@@ -0,0 +1,278 @@
+# Copyright (c) 2025, Abilian SAS
+#
+# SPDX-License-Identifier: Apache-2.0
+"""Store of the language toolchains, shared by all apps.
+
+Each version of a toolchain is installed once per host, in
+`TOOLCHAIN_ROOT/<kind>/<version>`, and linked into the virtualenvs of the
+apps which use it, instead of being installed again for each app:
+
+- `node` (for `NODE_VERSION`): installed with `nodeenv --prebuilt`, and
+  its binaries (`node`, `npm`, `npx`...) are symlinked in the `bin`
+  directory of the virtualenv;
+- `python`: the seed packages of `virtualenv` (pip, setuptools, wheel) are
+  extracted once per interpreter version, and symlinked in the new
+  virtualenvs (`virtualenv --app-data ... --symlink-app-data`).
+
+The toolchains used by a virtualenv are listed in its `.hop3-toolchains`
+file, so that the unused ones can be removed (`hop system toolchains gc`).
+A toolchain is locked from its install until it is recorded as used (see
+`ToolchainStore.use`), so it can't be removed in between.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from attrs import field, frozen
+
+from hop3 import config as c
+from hop3.core.capabilities import get_host_capabilities
+from hop3.lib import log, shell
+
+from ._cache import PackageCache, _iter_files, get_build_caches
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Generator
+
+__all__ = [
+    "Toolchain",
+    "ToolchainStore",
+    "get_python_version",
+    "get_used_toolchains",
+    "link_binaries",
+]
+
+# Marker of a complete install, in the toolchain directory
+INSTALLED_FILE = ".hop3-installed"
+# The toolchains used by a virtualenv ({kind: version})
+USAGE_FILE = ".hop3-toolchains"
+
+# Versions are used as directory names
+VERSION_REGEXP = re.compile(r"[\w.+-]+")
+
+
+@frozen
+class Toolchain:
+    kind: str
+    version: str
+    path: Path
+    # Time of the install
+    installed: float = 0.0
+
+    @property
+    def size(self) -> int:
+        return sum(st.st_size for _, st in _iter_files(self.path))
+
+
+@frozen
+class ToolchainStore:
+    """The toolchains installed on the host."""
+
+    root: Path = field(factory=lambda: c.TOOLCHAIN_ROOT)
+
+    def get_path(self, kind: str, version: str) -> Path:
+        if kind not in INSTALLERS:
+            msg = f"Unknown toolchain: {kind}"
+            raise ValueError(msg)
+        if not VERSION_REGEXP.fullmatch(version) or version.startswith("."):
+            msg = f"Invalid {kind} version: {version!r}"
+            raise ValueError(msg)
+        return self.root / kind / version
+
+    def is_installed(self, kind: str, version: str) -> bool:
+        return (self.get_path(kind, version) / INSTALLED_FILE).exists()
+
+    def install(self, kind: str, version: str) -> Path:
+        """Install a toolchain, unless already installed.
+
+        Concurrent installs of the same toolchain (e.g. by two builds) wait
+        for the first one.
+        """
+        path = self.get_path(kind, version)
+        if self.is_installed(kind, version):
+            return path
+
+        with self._lock(kind, version):
+            self._install(kind, version)
+        return path
+
+    @contextmanager
+    def use(self, kind: str, version: str, virtual_env: Path) -> Generator[Path]:
+        """Install a toolchain (unless already installed), and record that
+        the virtualenv uses it, after the block (e.g. linking it).
+
+        The toolchain is locked meanwhile, so that it is not removed by
+        `gc()` before it is recorded as used.
+        """
+        with self._lock(kind, version):
+            path = self._install(kind, version)
+            try:
+                yield path
+            finally:
+                # Even if the block failed: the virtualenv may already link
+                # to the toolchain
+                if virtual_env.exists():
+                    set_used_toolchain(virtual_env, kind, version)
+
+    def _install(self, kind: str, version: str) -> Path:
+        path = self.get_path(kind, version)
+        if not self.is_installed(kind, version):
+            log(f"Installing {kind} {version} in the toolchain store.", level=3)
+            # (A previous install may have been interrupted)
+            shutil.rmtree(path, ignore_errors=True)
+            INSTALLERS[kind](version, path)
+            (path / INSTALLED_FILE).write_text(f"{time.time()}\n")
+        return path
+
+    def remove(self, kind: str, version: str, *, force: bool = False) -> list[str]:
+        """Remove a toolchain, unless it is used (or if `force`).
+
+        Returns:
+        - The users of the toolchain (see `get_users`). Unless `force`, the
+          toolchain is only removed if there are none.
+        """
+        with self._lock(kind, version):
+            users = self.get_users().get((kind, version), [])
+            if force or not users:
+                shutil.rmtree(self.get_path(kind, version), ignore_errors=True)
+        return users
+
+    def list(self) -> list[Toolchain]:
+        toolchains = []
+        for path in sorted(self.root.glob(f"*/*/{INSTALLED_FILE}")):
+            toolchain_path = path.parent
+            toolchains.append(
+                Toolchain(
+                    kind=toolchain_path.parent.name,
+                    version=toolchain_path.name,
+                    path=toolchain_path,
+                    installed=path.stat().st_mtime,
+                )
+            )
+        return toolchains
+
+    def get_users(self) -> dict[tuple[str, str], list[str]]:
+        """The virtualenvs using each toolchain (the name of their app, or
+        "(build cache)")."""
+        users: dict[tuple[str, str], list[str]] = {}
+        virtual_envs = [
+            (app_path.name, app_path / "venv")
+            for app_path in sorted(c.APP_ROOT.glob("*"))
+        ]
+        # Cached virtualenvs may be restored at any time (until pruned)
+        virtual_envs += [
+            ("(build cache)", entry.path)
+            for build_cache in get_build_caches()
+            for entry in build_cache.entries()
+        ]
+        for name, virtual_env in virtual_envs:
+            for kind, version in get_used_toolchains(virtual_env).items():
+                users.setdefault((kind, version), []).append(name)
+        return users
+
+    def gc(self) -> tuple[list[Toolchain], int]:
+        """Remove the toolchains used by no app.
+
+        Returns:
+        - The removed toolchains, and the freed space (in bytes).
+        """
+        users = self.get_users()
+        removed = []
+        freed = 0
+        for toolchain in self.list():
+            if (toolchain.kind, toolchain.version) in users:
+                continue
+            # (Checked again by `remove()`, which is locked: the toolchain
+            # may have been used meanwhile)
+            size = toolchain.size
+            if not self.remove(toolchain.kind, toolchain.version):
+                removed.append(toolchain)
+                freed += size
+        return removed, freed
+
+    @contextmanager
+    def _lock(self, kind: str, version: str) -> Generator[None]:
+        lock_path = self.root / kind / f".{version}.lock"
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with lock_path.open("w") as fd:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+
+
+def get_used_toolchains(virtual_env: Path) -> dict[str, str]:
+    """The toolchains used by a virtualenv ({kind: version})."""
+    try:
+        return json.loads((virtual_env / USAGE_FILE).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def set_used_toolchain(virtual_env: Path, kind: str, version: str) -> None:
+    used = get_used_toolchains(virtual_env)
+    used[kind] = version
+    # The file may be hardlinked to a cached tree: never modify it in place
+    path = virtual_env / USAGE_FILE
+    path.unlink(missing_ok=True)
+    path.write_text(json.dumps(used, sort_keys=True))
+
+
+def link_binaries(toolchain_path: Path, virtual_env: Path) -> None:
+    """Symlink the binaries of a toolchain in the `bin` directory of a
+    virtualenv (replacing the existing ones atomically)."""
+    bin_path = virtual_env / "bin"
+    bin_path.mkdir(parents=True, exist_ok=True)
+    for binary in sorted((toolchain_path / "bin").iterdir()):
+        if binary.name.startswith(("activate", ".")):
+            continue
+        link = bin_path / binary.name
+        tmp_link = bin_path / f".{binary.name}.tmp"
+        tmp_link.unlink(missing_ok=True)
+        tmp_link.symlink_to(binary)
+        tmp_link.replace(link)
+
+
+def get_python_version(interpreter: str = "python3") -> str:
+    """The full version of a Python interpreter (e.g. "3.12.3"), or ""."""
+    output = get_host_capabilities().command_output(f"{interpreter} --version")
+    m = re.search(r"Python (\d+\.\d+\.\d+)", output)
+    return m.group(1) if m else ""
+
+
+def get_build_env() -> dict[str, str]:
+    return {**PackageCache().get_env(), **os.environ}
+
+
+def install_node(version: str, path: Path) -> None:
+    shell(
+        f"nodeenv --prebuilt --node={version} --clean-src {path}",
+        env=get_build_env(),
+    )
+
+
+def install_python(version: str, path: Path) -> None:
+    """Extract the seed packages of virtualenv, for a Python version."""
+    major_minor = ".".join(version.split(".")[:2])
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The seed packages are extracted when creating a virtualenv
+        shell(
+            f"virtualenv --app-data {path} --symlink-app-data"
+            f" -p python{major_minor} {tmp_dir}/venv",
+            env=get_build_env(),
+        )
+
+
+# Installers, by kind of toolchain: (version, path) -> None
+INSTALLERS: dict[str, Callable[[str, Path], None]] = {
+    "node": install_node,
+    "python": install_python,
+}
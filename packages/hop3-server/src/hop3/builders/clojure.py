@@ -7,7 +7,6 @@
 from __future__ import annotations
 
 import os
-from pathlib import Path
 
 from hop3.core.env import Env
 from hop3.core.events import BuildEvent, CreatingVirtualEnv, emit
@@ -80,8 +79,7 @@ class ClojureBuilder(Builder):
         path = prepend_to_path(
             [
                 self.virtual_env / "bin",
-                # FIXME: probably bad
-                Path(self.app_name) / ".bin",
+                self.src_path / ".bin",
             ],
         )
 
@@ -6,14 +6,32 @@
 
 from __future__ import annotations
 
-import os
+from typing import TYPE_CHECKING
 
 from hop3 import config as c
+from hop3.core.capabilities import get_host_capabilities
 from hop3.core.env import Env
 from hop3.core.events import InstallingVirtualEnv, emit
-from hop3.lib import Abort, chdir, check_binaries, log, prepend_to_path
+from hop3.lib import (
+    Abort,
+    check_binaries,
+    log,
+    prepend_to_path,
+)
 
 from ._base import Builder
+from ._cache import BuildCache
+from ._toolchains import (
+    ToolchainStore,
+    get_used_toolchains,
+    link_binaries,
+)
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+# Files which define the dependencies of a Node project
+LOCKFILES = ["package.json", "package-lock.json", "npm-shrinkwrap.json"]
 
 
 class NodeBuilder(Builder):
@@ -44,11 +62,14 @@ class NodeBuilder(Builder):
         """
         self.virtual_env.mkdir(parents=True, exist_ok=True)
 
-        with chdir(self.src_path):
-            env = self.get_env()
-            os.environ["PATH"] = str(env["PATH"])
-            self.install_node(env)
-            self.install_modules(env)
+        # The environment (e.g. PATH) is passed explicitly to each command,
+        # instead of being changed for the whole process.
+        env = self.get_env()
+        self.install_node(env)
+        self.install_modules(env)
+
+    def get_outputs(self) -> list[Path]:
+        return [self.virtual_env, self.src_path / "node_modules"]
 
     def get_env(self) -> Env:
         """Get the environment variables for the application.
@@ -78,12 +99,12 @@ class NodeBuilder(Builder):
         return env
 
     def install_node(self, env: Env) -> None:
-        """Install a specific version of Node.js using nodeenv.
+        """Use a specific version of Node.js (`NODE_VERSION`).
 
-        This checks if the specified Node.js version is installed in the
-        virtual environment. If not, and the `nodeenv` binary is available, it will
-        attempt to install the specified Node.js version. If the application is
-        running, it raises an exception to prevent an update during runtime.
+        Each version is installed once (with nodeenv) in the toolchain store
+        of the host, and its binaries are linked in the virtual environment
+        (see `ToolchainStore`). If the application is running, it raises an
+        exception to prevent an update during runtime.
 
         Args:
         ----
@@ -95,38 +116,27 @@ class NodeBuilder(Builder):
             Abort: If trying to update Node.js while the application is running.
         """
         version = env.get("NODE_VERSION")
-        node_binary = self.virtual_env / "bin" / "node"
-        if node_binary.exists():
-            completed_process = self.shell(f"{node_binary} -v", env=env)
-            installed = completed_process.stdout.decode("utf8").rstrip("\n")
-        else:
-            installed = ""
-
-        # Check if the specified version is different from the installed one and if nodeenv is available
-        if version and check_binaries(["nodeenv"]):
-            if not installed.endswith(version):
-                started = list(c.UWSGI_ENABLED.glob(f"{self.app_name}*.ini"))
-
-                if installed and started:
-                    # Raise an error if the app is running
-                    msg = (
-                        "Warning: Can't update node with app running. Stop the app &"
-                        " retry."
-                    )
-                    raise Abort(msg)
-
-                # Log installation of the specified node version using nodeenv
-                msg = "Installing node version '{NODE_VERSION:s}' using nodeenv".format(
-                    **env
-                )
-                log(msg, level=3, fg="green")
-                cmd = (
-                    "nodeenv --prebuilt --node={NODE_VERSION:s} --clean-src --force"
-                    " {VIRTUAL_ENV:s}".format(**env)
-                )
-                self.shell(cmd, cwd=self.virtual_env, env=env)
-            else:
-                log(f"Node is installed at {version}.", level=3, fg="green")
+        if not version or not check_binaries(["nodeenv"], path=env["PATH"]):
+            return
+
+        installed = get_used_toolchains(self.virtual_env).get("node", "")
+        if installed == version and (self.virtual_env / "bin" / "node").exists():
+            log(f"Node is installed at {version}.", level=3, fg="green")
+            return
+
+        started = list(c.UWSGI_ENABLED.glob(f"{self.app_name}*.ini"))
+        if installed and started:
+            # Raise an error if the app is running
+            msg = "Warning: Can't update node with app running. Stop the app & retry."
+            raise Abort(msg)
+
+        log(
+            f"Using node version '{version}' from the toolchain store",
+            level=3,
+            fg="green",
+        )
+        with ToolchainStore().use("node", version, self.virtual_env) as path:
+            link_binaries(path, self.virtual_env)
 
     def install_modules(self, env: Env) -> None:
         """Install necessary modules for the application using npm.
@@ -140,9 +150,24 @@ class NodeBuilder(Builder):
 
         npm_prefix = self.src_path
         package_json = self.src_path / "package.json"
+        node_modules = self.src_path / "node_modules"
 
         assert package_json.exists()
-        assert check_binaries(["npm"])
-
+        assert check_binaries(["npm"], path=env["PATH"])
+
+        # node_modules is relocatable, so it can be shared between apps
+        # with the same dependencies and node version.
+        cache = BuildCache("node")
+        node_version = env.get("NODE_VERSION")
+        if not node_version:
+            node_version = get_host_capabilities().command_output("node -v", env=env)
+        lockfiles = [self.src_path / name for name in LOCKFILES]
+        key = cache.compute_key(lockfiles, node_version)
+        if cache.reuse(key, node_modules):
+            return
+
+        # (npm may update the shared files in place)
+        cache.detach(node_modules)
         cmd = f"npm install --prefix {npm_prefix} --package-lock=false"
         self.shell(cmd, env=env)
+        cache.store(key, node_modules)
@@ -9,7 +9,6 @@ from subprocess import CalledProcessError
 from typing import TYPE_CHECKING
 
 from hop3.core.events import InstallingDependencies, PreparingBuildEnv, emit
-from hop3.lib import chdir, shell
 
 from ._base import Builder
 
@@ -37,10 +36,9 @@ class PHPBuilder(Builder):
     def build(self) -> None:
         """Build the PHP project by installing dependencies and potentially
         running custom scripts."""
-        with chdir(self.src_path):
-            env = self.get_env()
-            self.prepare_build_env(env)
-            self.install_dependencies()
+        env = self.get_env()
+        self.prepare_build_env(env)
+        self.install_dependencies()
 
     def prepare_build_env(self, env: Env) -> None:
         """Prepare the environment for building the project, if necessary.
@@ -58,7 +56,7 @@ class PHPBuilder(Builder):
         emit(InstallingDependencies(self.app_name))
 
         try:
-            shell("composer install", cwd=self.src_path)
+            self.shell("composer install")
         except CalledProcessError as e:
             msg = (
                 f"Failed to install dependencies for PHP project '{self.app_name}': {e}"
@@ -1,17 +1,45 @@
 # Copyright (c) 2023-2025, Abilian SAS
 #
 # SPDX-License-Identifier: Apache-2.0
-"""Builder for Python projects."""
+"""Builder for Python projects.
+
+The dependencies are installed either with pip (in a virtualenv), or with
+uv, which is much faster: it installs the packages from its cache (shared
+by all apps, see `PackageCache`) as hardlinks, instead of unpacking them
+again for each app. uv is used when available, unless
+`HOP3_PYTHON_INSTALLER` (or `PYTHON_INSTALLER`, for the whole server) says
+otherwise.
+"""
 
 from __future__ import annotations
 
+import os
+import tempfile
 from pathlib import Path
 
+import toml
+
+from hop3 import config as c
+from hop3.core.capabilities import get_host_capabilities
 from hop3.core.env import Env
 from hop3.core.events import CreatingVirtualEnv, InstallingVirtualEnv, emit
-from hop3.lib import chdir
+from hop3.lib import Abort, check_binaries
 
 from ._base import Builder
+from ._cache import BuildCache
+from ._toolchains import ToolchainStore, get_python_version
+
+# Files which define the dependencies of a Python project
+LOCKFILES = ["requirements.txt", "pyproject.toml", "poetry.lock", "uv.lock"]
+
+# Binaries needed by each installer
+INSTALLERS = {
+    "pip": ["pip", "virtualenv"],
+    "uv": ["uv"],
+}
+
+# Sources of locked packages which can't be pinned by version
+POETRY_DIRECT_SOURCES = {"directory", "file", "git", "url"}
 
 
 class PythonBuilder(Builder):
@@ -24,32 +52,90 @@ class PythonBuilder(Builder):
     """
 
     name = "Python"
-    requirements = ["python3", "pip", "virtualenv"]  # noqa: RUF012
+    # (and the binaries of the installer, see `INSTALLERS`)
+    requirements = ["python3"]  # noqa: RUF012
 
     def accept(self) -> bool:
         return self.check_exists(["requirements.txt", "pyproject.toml"])
 
     def build(self) -> None:
-        # Change the directory to the source path and proceed with building the project
-        with chdir(self.src_path):
-            self.make_virtual_env()
-            self.install_virtualenv()
+        # Commands are run in the source directory (see `Builder.shell`)
+        cache = BuildCache("python")
+        key = self.get_cache_key(cache)
+        if cache.reuse(key, self.virtual_env):
+            self.install_project()
+            return
+
+        self.make_virtual_env()
+        self.install_virtualenv()
+        cache.store(key, self.virtual_env)
 
     def get_env(self) -> Env:
         # Create an environment with specific settings for Python execution
         env = Env({"PYTHONUNBUFFERED": "1", "PYTHONIOENCODING": "UTF_8:replace"})
-        env.parse_settings(Path("ENV"))
+        env.parse_settings(self.env_file)
         return env
 
+    def get_installer(self) -> str:
+        """Return the installer of the dependencies ("pip" or "uv").
+
+        Raises:
+            Abort: If the installer is unknown, or not available.
+        """
+        installer = self.get_env().get("HOP3_PYTHON_INSTALLER") or c.PYTHON_INSTALLER
+        if installer == "auto":
+            return "uv" if check_binaries(INSTALLERS["uv"]) else "pip"
+        if installer not in INSTALLERS:
+            msg = f"Unknown Python installer: {installer!r} (expected: pip or uv)"
+            raise Abort(msg)
+        if not check_binaries(INSTALLERS[installer]):
+            msg = f"Python installer not available: {installer}"
+            raise Abort(msg)
+        return installer
+
+    def get_cache_key(self, cache: BuildCache) -> str:
+        """Return the build cache key for the virtualenv.
+
+        Virtualenvs are not relocatable (scripts refer to the absolute path
+        of the interpreter), so the path is part of the key.
+        """
+        python_version = get_host_capabilities().command_output("python3 --version")
+        lockfiles = [self.src_path / name for name in LOCKFILES]
+        return cache.compute_key(
+            lockfiles, python_version, str(self.virtual_env), self.get_installer()
+        )
+
     def make_virtual_env(self) -> None:
-        """Create and activate a virtual environment."""
+        """Create and activate a virtual environment.
+
+        With pip, the seed packages (pip, setuptools, wheel) are linked from
+        the toolchain store, instead of being installed in each virtualenv
+        (see `ToolchainStore`). uv installs them from its cache.
+        """
 
         if (self.virtual_env / "bin").exists():
             return
 
         emit(CreatingVirtualEnv(self.app_name))
 
-        self.shell(f"virtualenv {self.virtual_env}")
+        if self.get_installer() == "uv":
+            # Seeded, for the apps which use pip at runtime
+            self.shell(
+                f"uv venv --seed --python python3 {self.virtual_env}",
+                env=self.get_uv_env(),
+            )
+            return
+
+        version = get_python_version()
+        if not version:
+            self.shell(f"virtualenv {self.virtual_env}")
+            return
+
+        with ToolchainStore().use("python", version, self.virtual_env) as app_data:
+            self.shell(
+                f"virtualenv -p python3 --app-data {app_data} --symlink-app-data"
+                f" {self.virtual_env}"
+            )
         # TODO: consider using the built-in venv module instead of
         # (or as an alternative to) virtualenv
 
@@ -58,16 +144,87 @@ class PythonBuilder(Builder):
         application."""
         emit(InstallingVirtualEnv(self.app_name))
 
+        if self.get_installer() == "uv":
+            self.install_with_uv()
+            return
+
         python = self.virtual_env / "bin" / "python"
 
         # Install dependencies from requirements.txt if it exists
-        if Path("requirements.txt").exists():
+        if (self.src_path / "requirements.txt").exists():
             self.shell(f"{python} -m pip install -r requirements.txt")
         # Install dependencies using pyproject.toml if it exists
-        elif Path("pyproject.toml").exists():
+        elif (self.src_path / "pyproject.toml").exists():
             self.shell(f"{python} -m pip install .")
         else:
             # This should never happen as `accept` checks for the presence of
             # requirements.txt or pyproject.toml
             msg = f"requirements.txt or pyproject.toml not found for '{self.app_name}'"
             raise FileNotFoundError(msg)
+
+    def install_with_uv(self) -> None:
+        """Install the dependencies with uv, honoring the lockfile of the
+        project (`requirements.txt`, `uv.lock` or `poetry.lock`)."""
+        env = self.get_uv_env()
+        python = self.virtual_env / "bin" / "python"
+
+        if (self.src_path / "requirements.txt").exists():
+            self.shell(f"uv pip install --python {python} -r requirements.txt", env=env)
+        elif (self.src_path / "uv.lock").exists():
+            # (`--inexact`: keep the seed packages)
+            self.shell("uv sync --frozen --no-dev --no-editable --inexact", env=env)
+        elif (self.src_path / "poetry.lock").exists():
+            # uv can't read poetry.lock: the locked versions are used as
+            # constraints
+            constraints = get_poetry_constraints(self.src_path / "poetry.lock")
+            with tempfile.TemporaryDirectory(prefix="hop3-") as tmp_dir:
+                constraints_path = Path(tmp_dir) / "constraints.txt"
+                constraints_path.write_text("\n".join(constraints))
+                self.shell(
+                    f"uv pip install --python {python} -c {constraints_path} .",
+                    env=env,
+                )
+        elif (self.src_path / "pyproject.toml").exists():
+            self.shell(f"uv pip install --python {python} .", env=env)
+        else:
+            msg = f"requirements.txt or pyproject.toml not found for '{self.app_name}'"
+            raise FileNotFoundError(msg)
+
+    def install_project(self) -> None:
+        """Reinstall the project itself (but not its dependencies) in a reused
+        virtualenv, since its code may have changed."""
+        if (self.src_path / "requirements.txt").exists():
+            return
+
+        python = self.virtual_env / "bin" / "python"
+        if self.get_installer() == "uv":
+            self.shell(
+                f"uv pip install --python {python} --no-deps --reinstall .",
+                env=self.get_uv_env(),
+            )
+        else:
+            self.shell(f"{python} -m pip install --no-deps .")
+
+    def get_uv_env(self) -> dict[str, str]:
+        return {
+            "VIRTUAL_ENV": str(self.virtual_env),
+            "UV_PROJECT_ENVIRONMENT": str(self.virtual_env),
+            # Install from the shared cache as hardlinks (uv falls back to
+            # copies if the cache is on another filesystem)
+            "UV_LINK_MODE": os.environ.get("UV_LINK_MODE", "hardlink"),
+            # Use the interpreter of the host, as virtualenv does
+            "UV_PYTHON_DOWNLOADS": os.environ.get("UV_PYTHON_DOWNLOADS", "never"),
+        }
+
+
+def get_poetry_constraints(lockfile: Path) -> list[str]:
+    """Return the versions locked in a `poetry.lock` file, as requirements
+    (e.g. "flask==2.1.3")."""
+    data = toml.loads(lockfile.read_text())
+    constraints = []
+    for package in data.get("package", []):
+        source_type = package.get("source", {}).get("type", "")
+        if source_type in POETRY_DIRECT_SOURCES:
+            continue
+        constraints.append(f"{package['name']}=={package['version']}")
+    return constraints
@@ -6,11 +6,16 @@
 
 from __future__ import annotations
 
+from hop3.core.capabilities import get_host_capabilities
 from hop3.core.env import Env
 from hop3.core.events import CreatingVirtualEnv, InstallingVirtualEnv, emit
-from hop3.lib import chdir, prepend_to_path
+from hop3.lib import prepend_to_path
 
 from ._base import Builder
+from ._cache import BuildCache
+
+# Files which define the dependencies of a Ruby project
+LOCKFILES = ["Gemfile", "Gemfile.lock"]
 
 
 class RubyBuilder(Builder):
@@ -29,12 +34,23 @@ class RubyBuilder(Builder):
         return self.check_exists("Gemfile")
 
     def build(self) -> None:
-        with chdir(self.src_path):
-            env = self.get_env()
-            self.make_virtual_env(env)
+        env = self.get_env()
+
+        # Gems are installed in the virtualenv, which is reused if the
+        # dependencies didn't change.
+        cache = BuildCache("ruby")
+        ruby_version = get_host_capabilities().command_output("ruby -v")
+        lockfiles = [self.src_path / name for name in LOCKFILES]
+        key = cache.compute_key(lockfiles, ruby_version, str(self.virtual_env))
+        if cache.reuse(key, self.virtual_env):
+            self.configure_bundler(env)
+            return
 
-            emit(InstallingVirtualEnv(self.app_name))
-            self.shell("bundle install", env=env)
+        self.make_virtual_env(env)
+
+        emit(InstallingVirtualEnv(self.app_name))
+        self.shell("bundle install", env=env)
+        cache.store(key, self.virtual_env)
 
     def get_env(self) -> Env:
         path = prepend_to_path(
@@ -63,4 +79,9 @@ class RubyBuilder(Builder):
         if not self.virtual_env.exists():
             emit(CreatingVirtualEnv(self.app_name))
             self.virtual_env.mkdir(parents=True)
-            self.shell("bundle config set --local path $VIRTUAL_ENV", env=env)
+            self.configure_bundler(env)
+
+    def configure_bundler(self, env: Env) -> None:
+        """Tell bundler to use the virtual environment (for the app's source
+        directory)."""
+        self.shell("bundle config set --local path $VIRTUAL_ENV", env=env)
@@ -9,7 +9,6 @@ from subprocess import CalledProcessError
 from typing import TYPE_CHECKING
 
 from hop3.core.events import CompilingProject, CreatingBuildEnv, emit
-from hop3.lib import chdir
 
 from ._base import Builder
 
@@ -37,10 +36,9 @@ class RustBuilder(Builder):
 
     def build(self) -> None:
         """Build the Rust project using cargo."""
-        with chdir(self.src_path):
-            env = self.get_env()
-            self.prepare_build_env(env)
-            self.compile_project()
+        env = self.get_env()
+        self.prepare_build_env(env)
+        self.compile_project()
 
     def prepare_build_env(self, env: Env) -> None:
         """Prepare the environment for building the project, if necessary.
@@ -7,6 +7,21 @@ from typing import ClassVar
 class Command:
     name: ClassVar[str] = ""
 
+    # Commands that only use memory (e.g. `help`) are run directly on the
+    # event loop, instead of in the worker thread pool. Not for commands
+    # which touch the database or the filesystem: they would block it.
+    inline: ClassVar[bool] = False
+
+    @classmethod
+    def lock_key(cls, *args) -> str | None:
+        """Return the key on which concurrent calls must be serialized.
+
+        Commands that act on an app should return the app name, so that
+        two such commands (e.g. two deploys) never run at the same time
+        on the same app. `None` means no serialization.
+        """
+        return None
+
     def call(self, *args):
         if not args:
             return self.get_help()
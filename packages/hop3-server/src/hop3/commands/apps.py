@@ -6,14 +6,30 @@
 
 from __future__ import annotations
 
+import re
+from collections import Counter
 from dataclasses import dataclass
 from typing import TYPE_CHECKING
 
-from hop3.lib import echo
+from hop3 import config as c
+from hop3.lib import Abort, echo
+from hop3.lib.multi_tail import MultiTail
 from hop3.lib.registry import register
+from hop3.logs import LogStore, get_app_metrics, parse_since, parse_status
+from hop3.logs.metrics import STATUS_CLASSES, Stats
 from hop3.orm import App, AppRepository
+from hop3.project.procfile import parse_procfile
+from hop3.run.spawn import AppLauncher
+from hop3.run.uwsgi.stats import (
+    collect_stats,
+    format_saturation,
+    list_vassals,
+    parse_config_name,
+)
+from hop3.scheduler import DeployScheduler, get_app_lock
 
 from ._base import Command
+from .system import PSCmd, format_size
 
 if TYPE_CHECKING:
     from sqlalchemy.orm import Session
@@ -54,24 +70,395 @@ class AppsCmd(Command):
 @register
 @dataclass(frozen=True)
 class LogsCmd(Command):
-    """Show application logs."""
+    """Show application logs, e.g.: hop logs <app> [<process>] [-n N]
+    [--since 1h] [--until TIME] [--status 5xx] [--grep REGEXP].
+
+    With `--since`, `--until`, `--status` or `--grep`, the lines are found
+    in the log store of the app (see `hop3.logs`), instead of the end of
+    the log files.
+    """
 
     db_session: Session
 
     name = "logs"
 
     def call(self, *args):
+        options = self.parse_args(list(args))
+        app_name = options["app"]
+        process = options["process"]
+        app_repo = AppRepository(session=self.db_session)
+        app = app_repo.get_one(App.name == app_name)
+
+        logfiles = sorted(app.log_path.glob(f"{process}.*.log"))
+        if not logfiles:
+            yield {"t": "text", "text": f"No logs found for app '{app_name}'."}
+            return
+
+        if options["query"]:
+            yield from self.query(app, options)
+            return
+
+        # Lines are sent one by one, so they can be streamed to the client
+        # Only the end of the files is read
+        for line in MultiTail(logfiles, catch_up=options["lines"]).initial_tail():
+            yield {"t": "text", "text": line.rstrip("\n")}
+
+    def query(self, app: App, options: dict):
+        store = LogStore.for_app(app)
+        store.ingest()
+        entries = store.query(
+            since=options["since"],
+            until=options["until"],
+            status=options["status"],
+            grep=options["grep"],
+            workers=f"{options['process']}.*",
+            limit=options["lines"],
+        )
+        width = max((len(entry.worker) for entry in entries), default=0)
+        for entry in entries:
+            yield {"t": "text", "text": f"{entry.worker.ljust(width)} | {entry.line}"}
+
+    def parse_args(self, args: list[str]) -> dict:
+        options = {
+            "app": "",
+            "process": "*",
+            "lines": 20,
+            "since": None,
+            "until": None,
+            "status": None,
+            "grep": "",
+            "query": False,
+        }
+        positional = []
+        while args:
+            match args.pop(0):
+                case "-n" if args:
+                    options["lines"] = int(args.pop(0))
+                case "--since" if args:
+                    options["since"] = parse_since(args.pop(0))
+                    options["query"] = True
+                case "--until" if args:
+                    options["until"] = parse_since(args.pop(0))
+                    options["query"] = True
+                case "--status" if args:
+                    options["status"] = parse_status(args.pop(0))
+                    options["query"] = True
+                case "--grep" if args:
+                    options["grep"] = args.pop(0)
+                    options["query"] = True
+                    try:
+                        re.compile(options["grep"])
+                    except re.error as e:
+                        msg = f"Error: invalid regexp for --grep: {e}"
+                        raise Abort(msg) from e
+                case arg if arg.startswith("-"):
+                    msg = f"Invalid option (or missing value): {arg}"
+                    raise ValueError(msg)
+                case arg:
+                    positional.append(arg)
+        if not positional:
+            msg = "Usage: hop logs <app> [<process>] [options]"
+            raise ValueError(msg)
+        options["app"] = positional[0]
+        if len(positional) > 1:
+            options["process"] = positional[1]
+        return options
+
+
+@register
+@dataclass(frozen=True)
+class PsCmd(Command):
+    """Show the workers of an app, e.g.: hop ps <app> [--live].
+
+    With `--live`, show the state of the running workers (busy workers,
+    listen queue, requests, memory...), from their uwsgi stats sockets.
+    Without an app, list all the server processes.
+    """
+
+    db_session: Session
+
+    name = "ps"
+
+    def call(self, *args):
+        args = list(args)
+        live = "--live" in args
+        if live:
+            args.remove("--live")
+        if not args:
+            yield from PSCmd().call()
+            return
+
         app_name = args[0]
         app_repo = AppRepository(session=self.db_session)
-        app = app_repo.get(App.name == app_name)
-        # TODO: by process
-        logs = app.get_logs()
+        app = app_repo.get_one(App.name == app_name)
+
+        if live:
+            yield from self.show_live(app)
+        else:
+            yield from self.show_scaling(app)
+
+    def show_scaling(self, app: App):
+        scaling = app.virtualenv_path / "SCALING"
+        if not scaling.exists():
+            yield {"t": "text", "text": f"App '{app.name}' has not been deployed."}
+            return
+
+        running = Counter(
+            info["kind"]
+            for name in list_vassals(app.name)
+            if (info := parse_config_name(name))
+        )
+        rows = [
+            [kind, count, str(running[kind])]
+            for kind, count in parse_procfile(scaling).items()
+        ]
+        yield {"t": "table", "headers": ["Kind", "Scale", "Running"], "rows": rows}
+
+    def show_live(self, app: App):
+        vassals = collect_stats(app.name)
+        if not vassals:
+            yield {"t": "text", "text": f"No workers running for app '{app.name}'."}
+            return
+
+        rows = []
+        for vassal in vassals:
+            name = vassal.name.removeprefix(f"{app.name}_")
+            if vassal.error:
+                rows.append([name, vassal.error, *([""] * 6)])
+                continue
+            queue = (
+                f"{vassal.listen_queue}/{vassal.listen_queue_max}"
+                if vassal.listen_queue_max
+                else "-"
+            )
+            rows.append([
+                name,
+                f"{vassal.busy_workers}/{len(vassal.workers)}",
+                queue,
+                str(vassal.requests),
+                f"{vassal.avg_rt / 1000:.0f}ms",
+                format_size(vassal.rss),
+                str(vassal.harakiri_count),
+                str(vassal.respawn_count),
+            ])
+        yield {
+            "t": "table",
+            "headers": [
+                "Worker",
+                "Busy",
+                "Queue",
+                "Requests",
+                "Avg time",
+                "RSS",
+                "Harakiri",
+                "Respawns",
+            ],
+            "rows": rows,
+        }
+
+        for vassal in vassals:
+            if vassal.saturated or vassal.listen_queue_errors:
+                yield {"t": "text", "text": format_saturation(vassal)}
+
+
+@register
+@dataclass(frozen=True)
+class PsScaleCmd(Command):
+    """Set the number of workers of an app, e.g.: hop ps:scale <app> wsgi=4.
+
+    Only the added or removed workers are started or stopped (the app is
+    not redeployed).
+    """
+
+    db_session: Session
+
+    name = "ps:scale"
+
+    @classmethod
+    def lock_key(cls, *args) -> str | None:
+        return args[0] if args else None
+
+    def call(self, *args):
+        if len(args) < 2:
+            yield {"t": "text", "text": "Usage: hop ps:scale <app> <kind>=<count>..."}
+            return
+
+        app_name, *settings = args
+        app_repo = AppRepository(session=self.db_session)
+        app = app_repo.get_one(App.name == app_name)
+
+        counts = {}
+        for setting in settings:
+            kind, _, value = setting.partition("=")
+            try:
+                counts[kind.strip()] = int(value)
+            except ValueError:
+                msg = f"Invalid setting: {setting} (e.g. web=2)"
+                raise ValueError(msg) from None
+
+        # Not during a deploy of the app
+        with get_app_lock(app.name):
+            AppLauncher(app).scale(counts)
+
+        for kind, count in counts.items():
+            yield {"t": "text", "text": f"Scaled '{kind}' to {count} workers."}
+
+
+@register
+@dataclass(frozen=True)
+class MetricsCmd(Command):
+    """Show request metrics of an app, e.g.: hop metrics <app>.
+
+    Latency percentiles, throughput, statuses and bytes sent, per worker,
+    over the last `METRICS_WINDOW` seconds (from the access logs).
+    """
+
+    db_session: Session
+
+    name = "metrics"
+
+    def call(self, *args):
+        if not args:
+            yield {"t": "text", "text": "Usage: hop metrics <app>"}
+            return
+
+        app_name = args[0]
+        app_repo = AppRepository(session=self.db_session)
+        app = app_repo.get_one(App.name == app_name)
+
+        metrics = get_app_metrics(app.name, app.log_path)
+        window = metrics.snapshot()
+        if not window:
+            yield {"t": "text", "text": f"No access logs found for app '{app_name}'."}
+            return
+
+        total = Stats()
+        for stats in window.values():
+            total.merge(stats)
+        rows = [
+            self.format_row(worker, stats, metrics.window)
+            for worker, stats in [*window.items(), ("total", total)]
+        ]
+        yield {
+            "t": "table",
+            "headers": [
+                "Worker",
+                "Requests",
+                "RPS",
+                "p50",
+                "p95",
+                "p99",
+                *STATUS_CLASSES,
+                "Bytes",
+            ],
+            "rows": rows,
+        }
+
+        # Little's law: the mean number of requests being handled, to compare
+        # with the capacity of the workers (processes x threads)
+        concurrency = total.requests / metrics.window * total.latency.mean / 1000
+        yield {
+            "t": "text",
+            "text": (
+                f"Last {metrics.window}s. Mean concurrent requests:"
+                f" {concurrency:.2f} (vs UWSGI_PROCESSES x UWSGI_THREADS)"
+            ),
+        }
+
+    @staticmethod
+    def format_row(worker: str, stats: Stats, window: int) -> list[str]:
+        latency = stats.latency
         return [
-            {
+            worker,
+            str(stats.requests),
+            f"{stats.requests / window:.2f}",
+            *(f"{latency.percentile(q):.0f}ms" for q in (0.5, 0.95, 0.99)),
+            *(str(n) for n in stats.statuses),
+            format_size(stats.bytes),
+        ]
+
+
+@register
+@dataclass(frozen=True)
+class DeployCmd(Command):
+    """Deploy apps, e.g.: hop deploy <app> | --apps a,b,c | --all [--jobs N] [--force].
+
+    Unless `--force` is given, only the phases whose inputs changed since
+    the last deploy are run.
+    """
+
+    db_session: Session
+
+    name = "deploy"
+
+    @classmethod
+    def lock_key(cls, *args) -> str | None:
+        # Only for single app deploys (the scheduler also locks each app)
+        if len(args) == 1 and not args[0].startswith("-"):
+            return args[0]
+        return None
+
+    def call(self, *args):
+        app_names, max_parallel, force = self.parse_args(list(args))
+        if not app_names:
+            yield {
                 "t": "text",
-                "text": "\n".join(logs),
+                "text": (
+                    "Usage: hop deploy <app> | --apps a,b,c | --all"
+                    " [--jobs N] [--force]"
+                ),
             }
+            return
+
+        # Check that the apps exist, before deploying any of them
+        app_repo = AppRepository(session=self.db_session)
+        for app_name in app_names:
+            app_repo.get_one(App.name == app_name)
+
+        # When a single app is deployed, its output is streamed to the
+        # client (with `/rpc/stream`); otherwise see `log/deploy.log`.
+        scheduler = DeployScheduler(
+            max_parallel=max_parallel or c.DEPLOY_MAX_PARALLEL, force=force
+        )
+        results = scheduler.deploy(app_names)
+
+        rows = [
+            [
+                result.app_name,
+                "ok" if result.ok else "failed",
+                f"{result.duration:.1f}s",
+                result.error,
+            ]
+            for result in results
         ]
+        yield {
+            "t": "table",
+            "headers": ["App", "Status", "Duration", "Error"],
+            "rows": rows,
+        }
+
+    def parse_args(self, args: list[str]) -> tuple[list[str], int, bool]:
+        app_names: list[str] = []
+        max_parallel = 0
+        force = False
+        while args:
+            match args.pop(0):
+                case "--all":
+                    app_repo = AppRepository(session=self.db_session)
+                    app_names += [app.name for app in app_repo.list()]
+                case "--apps" if args:
+                    app_names += [name for name in args.pop(0).split(",") if name]
+                case "--jobs" | "-j" if args:
+                    max_parallel = int(args.pop(0))
+                case "--force" | "-f":
+                    force = True
+                case arg if arg.startswith("-"):
+                    msg = f"Invalid option (or missing value): {arg}"
+                    raise ValueError(msg)
+                case arg:
+                    app_names.append(arg)
+        # Remove duplicates, keeping the order
+        return list(dict.fromkeys(app_names)), max_parallel, force
 
 
 # # def cmd_deploy(app) -> None:
@@ -86,44 +473,6 @@ class LogsCmd(Command):
 # #     app_obj.destroy()
 # #
 # #
-# # def cmd_ps(app: str) -> None:
-# #     """Show process count, e.g: hop ps <app>."""
-# #     app_obj = get_app(app)
-# #     scaling_file = app_obj.virtualenv_path / "SCALING"
-# #
-# #     if scaling_file.exists():
-# #         echo(scaling_file.read_text().strip(), fg="white")
-# #     else:
-# #         echo(f"Error: no workers found for app '{app}'.", fg="red")
-# #
-# #
-# # def cmd_ps_scale(app: str, settings: list[str]) -> None:
-# #     """e.g.: hop ps:scale <app> <proc>=<count>."""
-# #     app_obj = get_app(app)
-# #
-# #     scaling_file = app_obj.virtualenv_path / "SCALING"
-# #     worker_count = {k: int(v) for k, v in parse_procfile(scaling_file).items()}
-# #     deltas: dict[str, int] = {}
-# #     for s in settings:
-# #         try:
-# #             key, value = s.split("=", 1)
-# #             key = key.strip()
-# #             count = int(value.strip())  # check for integer value
-# #         except Exception:
-# #             raise ValueError(f"Error: malformed setting '{s}'")
-# #
-# #         if count < 0:
-# #             raise ValueError(f"Error: cannot scale type '{key}' below 0")
-# #         if key not in worker_count:
-# #             raise ValueError(
-# #                 f"Error: worker type '{key}' not present in '{app}'",
-# #             )
-# #         deltas[key] = count - worker_count[key]
-# #
-# #     # TODO
-# #     # do_deploy(app, deltas)
-# #
-# #
 # # def cmd_run(app: str, cmd: list[str]) -> None:
 # #     """e.g.: hop run <app> ls -- -al."""
 # #     app_obj = get_app(app)
@@ -15,6 +15,7 @@ class HelpCmd(Command):
     """Display useful help messages."""
 
     name = "help"
+    inline = True
 
     def call(self, *args):
         output = [
@@ -8,8 +8,14 @@ from __future__ import annotations
 
 import importlib.metadata
 import subprocess
+import time
 
+from hop3.builders import PackageCache, ToolchainStore, get_build_caches
+from hop3.core.maintenance import get_maintenance_report, maintain_repo
 from hop3.lib.registry import register
+from hop3.lib.settings import parse_size
+from hop3.orm import App
+from hop3.run.uwsgi.stats import collect_stats, format_saturation
 
 from ._base import Command
 
@@ -27,6 +33,9 @@ class SystemCmd(Command):
             UptimeCmd(),
             PSCmd(),
             StatusCmd(),
+            CacheCmd(),
+            MaintenanceCmd(),
+            ToolchainsCmd(),
         ]
 
 
@@ -43,7 +52,6 @@ class UptimeCmd(Command):
         return [{"t": "text", "text": result}]
 
 
-@register
 class PSCmd(Command):
     """List all server processes."""
 
@@ -65,10 +73,29 @@ class StatusCmd(Command):
     def call(self, *args):
         version = importlib.metadata.version("hop3_server")
 
-        return [
+        result = [
             {"t": "text", "text": f"Hop3 version: {version}"},
         ]
 
+        vassals = collect_stats()
+        running = [vassal for vassal in vassals if not vassal.error]
+        workers = sum(len(vassal.workers) for vassal in running)
+        busy = sum(vassal.busy_workers for vassal in running)
+        apps = {vassal.app_name for vassal in vassals}
+        result.append({
+            "t": "text",
+            "text": (
+                f"Workers: {busy}/{workers} busy, in {len(running)}/{len(vassals)}"
+                f" running vassals, for {len(apps)} apps"
+            ),
+        })
+        result += [
+            {"t": "text", "text": format_saturation(vassal)}
+            for vassal in running
+            if vassal.saturated or vassal.listen_queue_errors
+        ]
+        return result
+
         # registries = result["registries"]
         # print("Configured registries:")
         # for reg in sorted(registries, key=itemgetter("priority")):
@@ -80,6 +107,226 @@ class StatusCmd(Command):
         #     print(msg)
 
 
+class CacheCmd(Command):
+    """Manage the package download cache shared by all apps."""
+
+    name = "cache"
+
+    def subcommands(self) -> list[Command]:
+        return [
+            CacheShowCmd(),
+            CachePruneCmd(),
+            CacheClearCmd(),
+        ]
+
+
+class CacheShowCmd(Command):
+    """Show the size of the package and build caches, e.g.: hop system cache
+    show."""
+
+    name = "show"
+
+    def call(self, *args):
+        package_cache = PackageCache()
+        usage = package_cache.usage()
+        rows = [[u.name, format_size(u.size), u.files] for u in usage]
+        total = sum(u.size for u in usage)
+
+        # (Only the files not shared with an installed tree take space)
+        build_rows = []
+        for build_cache in get_build_caches():
+            entries = build_cache.entries()
+            unused = [e for e in entries if not build_cache.is_live(e)]
+            size = sum(entry.size for entry in entries)
+            build_rows.append([
+                build_cache.kind,
+                len(entries),
+                len(unused),
+                format_size(size),
+            ])
+        return [
+            {"t": "text", "text": f"Package cache: {package_cache.root}"},
+            {"t": "table", "headers": ["Cache", "Size", "Files"], "rows": rows},
+            {"t": "text", "text": f"Total: {format_size(total)}"},
+            {
+                "t": "table",
+                "headers": ["Build cache", "Trees", "Unused", "Size"],
+                "rows": build_rows,
+            },
+        ]
+
+
+class CachePruneCmd(Command):
+    """Remove the least recently used packages, and the unused trees of the
+    build cache, e.g.: hop system cache prune [<max size, e.g. 5G>]."""
+
+    name = "prune"
+
+    def call(self, *args):
+        max_size = parse_size(args[0]) if args else 0
+        removed, freed = PackageCache().prune(max_size)
+        removed_trees = freed_trees = 0
+        for build_cache in get_build_caches():
+            count, size = build_cache.prune(max_size)
+            removed_trees += count
+            freed_trees += size
+        return [
+            {
+                "t": "text",
+                "text": f"Removed {removed} files ({format_size(freed)}).",
+            },
+            {
+                "t": "text",
+                "text": (
+                    f"Removed {removed_trees} unused build trees"
+                    f" ({format_size(freed_trees)})."
+                ),
+            },
+        ]
+
+
+class CacheClearCmd(Command):
+    """Remove the whole package and build caches, e.g.: hop system cache
+    clear."""
+
+    name = "clear"
+
+    def call(self, *args):
+        PackageCache().clear()
+        for build_cache in get_build_caches():
+            build_cache.clear()
+        return [{"t": "text", "text": "Package and build caches cleared."}]
+
+
+class ToolchainsCmd(Command):
+    """Manage the toolchains (e.g. node versions) shared by all apps, e.g.:
+    hop system toolchains [install <kind> <version> | remove <kind> <version>
+    [--force] | gc].
+    """
+
+    name = "toolchains"
+
+    def call(self, *args):
+        store = ToolchainStore()
+        match args:
+            case ():
+                return self.show(store)
+            case ("install", kind, version):
+                path = store.install(kind, version)
+                return [{"t": "text", "text": f"Installed {kind} {version} in {path}."}]
+            case ("remove", kind, version, *options) if options in ([], ["--force"]):
+                force = bool(options)
+                users = store.remove(kind, version, force=force)
+                if users and not force:
+                    msg = (
+                        f"Not removed: {kind} {version} is used by {', '.join(users)}"
+                        " (use --force to remove it anyway)."
+                    )
+                    return [{"t": "text", "text": msg}]
+                return [{"t": "text", "text": f"Removed {kind} {version}."}]
+            case ("gc",):
+                removed, freed = store.gc()
+                names = ", ".join(f"{t.kind} {t.version}" for t in removed) or "none"
+                return [
+                    {
+                        "t": "text",
+                        "text": f"Removed unused toolchains: {names} ({format_size(freed)}).",
+                    }
+                ]
+            case _:
+                return [{"t": "text", "text": self.__doc__}]
+
+    def show(self, store: ToolchainStore):
+        users = store.get_users()
+        rows = [
+            [
+                toolchain.kind,
+                toolchain.version,
+                format_size(toolchain.size),
+                ", ".join(users.get((toolchain.kind, toolchain.version), [])) or "-",
+            ]
+            for toolchain in store.list()
+        ]
+        return [
+            {"t": "text", "text": f"Toolchain store: {store.root}"},
+            {
+                "t": "table",
+                "headers": ["Kind", "Version", "Size", "Used by"],
+                "rows": rows,
+            },
+        ]
+
+
+class MaintenanceCmd(Command):
+    """Show the state of the git repositories of the apps, or maintain them
+    now, e.g.: hop system maintenance [run [<app>...]]."""
+
+    name = "maintenance"
+
+    def call(self, *args):
+        if args and args[0] == "run":
+            return self.run(args[1:])
+        if args:
+            return [{"t": "text", "text": self.__doc__}]
+        return self.report()
+
+    def report(self):
+        rows = []
+        for app_name, stats, state in get_maintenance_report():
+            if state is None:
+                last_run = duration = status = "-"
+            else:
+                last_run = time.strftime("%Y-%m-%d %H:%M", time.localtime(state.time))
+                duration = f"{state.duration:.1f}s"
+                status = "ok" if state.ok else f"error: {state.error}"
+            rows.append([
+                app_name,
+                format_size(stats.size),
+                stats.packs,
+                stats.loose_objects,
+                last_run,
+                duration,
+                status,
+            ])
+        headers = [
+            "App",
+            "Size",
+            "Packs",
+            "Loose objects",
+            "Last run",
+            "Duration",
+            "Status",
+        ]
+        return [{"t": "table", "headers": headers, "rows": rows}]
+
+    def run(self, app_names):
+        if not app_names:
+            app_names = [app_name for app_name, _, _ in get_maintenance_report()]
+        result = []
+        for app_name in app_names:
+            state = maintain_repo(App(name=app_name), force=True)
+            if state is None:
+                text = f"{app_name}: skipped (empty, or being deployed)."
+            elif state.ok:
+                text = (
+                    f"{app_name}: {state.before.packs} -> {state.after.packs} packs,"
+                    f" {format_size(state.before.size)} -> {format_size(state.after.size)}"
+                    f" in {state.duration:.1f}s."
+                )
+            else:
+                text = f"{app_name}: failed: {state.error}"
+            result.append({"t": "text", "text": text})
+        return result
+
+
+def format_size(size: float) -> str:
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size:.0f} B"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
 # class LogsSubcommand(Command):
 #     """Show system logs."""
 #
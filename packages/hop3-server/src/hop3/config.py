@@ -33,6 +33,80 @@ ACME_EMAIL = config.get_str("ACME_EMAIL", "fixme@example.com")
 
 HOP3_DEBUG = config.get_bool("HOP3_DEBUG", False)
 
+# Database
+DATABASE_URI = config.get_str("DATABASE_URI", f"sqlite:///{HOP3_ROOT}/hop3.db")
+# Pool settings (ignored for SQLite)
+DATABASE_POOL_SIZE = config.get_int("DATABASE_POOL_SIZE", 5)
+DATABASE_MAX_OVERFLOW = config.get_int("DATABASE_MAX_OVERFLOW", 10)
+# In milliseconds (SQLite only)
+DATABASE_BUSY_TIMEOUT = config.get_int("DATABASE_BUSY_TIMEOUT", 5000)
+
+# Reuse dependency trees (virtualenv, node_modules...) across builds
+BUILD_CACHE = config.get_bool("BUILD_CACHE", True)
+# Cached trees no longer used by an app are pruned after this number of
+# days, or (least recently used first) when they take more than this size
+# (in bytes)
+BUILD_CACHE_MAX_AGE = config.get_int("BUILD_CACHE_MAX_AGE", 30)
+BUILD_CACHE_MAX_SIZE = config.get_int("BUILD_CACHE_MAX_SIZE", 5 * 1024**3)
+# Builds prune the cache at most once per this number of seconds (it can
+# also be pruned with `hop system cache prune`)
+BUILD_CACHE_PRUNE_INTERVAL = config.get_int("BUILD_CACHE_PRUNE_INTERVAL", 3600)
+
+# Installer of the dependencies of Python apps (can be set per app with
+# `HOP3_PYTHON_INSTALLER`): "pip" (with virtualenv), "uv", or "auto" (uv
+# when available)
+PYTHON_INSTALLER = config.get_str("PYTHON_INSTALLER", "auto")
+
+# Max size (in bytes) of the shared package download cache, when pruned
+PACKAGE_CACHE_MAX_SIZE = config.get_int("PACKAGE_CACHE_MAX_SIZE", 10 * 1024**3)
+
+# Concurrent deploys (e.g. `hop deploy --all`): max number of deploys at
+# once, and of deploys in their build (CPU-bound) and IO-bound phases
+DEPLOY_MAX_PARALLEL = config.get_int("DEPLOY_MAX_PARALLEL", os.cpu_count() or 2)
+DEPLOY_BUILD_SLOTS = config.get_int(
+    "DEPLOY_BUILD_SLOTS", max(1, (os.cpu_count() or 2) // 2)
+)
+DEPLOY_IO_SLOTS = config.get_int("DEPLOY_IO_SLOTS", 4)
+
+# Blue/green redeploys (can be set per app with `HOP3_BLUE_GREEN`): timeouts
+# (in seconds) for the new workers to be ready, and for the old ones to
+# finish their requests once nginx switched to the new ones
+DEPLOY_BLUE_GREEN = config.get_bool("DEPLOY_BLUE_GREEN", False)
+DEPLOY_HEALTH_CHECK_TIMEOUT = config.get_int("DEPLOY_HEALTH_CHECK_TIMEOUT", 60)
+DEPLOY_DRAIN_TIMEOUT = config.get_int("DEPLOY_DRAIN_TIMEOUT", 10)
+
+# Number of days the log lines are kept in the log store of the apps
+LOG_RETENTION_DAYS = config.get_int("LOG_RETENTION_DAYS", 14)
+
+# Duration (in seconds) of the rolling window of the request metrics
+METRICS_WINDOW = config.get_int("METRICS_WINDOW", 300)
+
+# Autoscaling of the web workers (see `hop3.run.autoscaler`): interval between
+# checks (0 to disable), and min delays (in seconds) after a change
+AUTOSCALE_INTERVAL = config.get_int("AUTOSCALE_INTERVAL", 30)
+AUTOSCALE_UP_COOLDOWN = config.get_int("AUTOSCALE_UP_COOLDOWN", 60)
+AUTOSCALE_DOWN_COOLDOWN = config.get_int("AUTOSCALE_DOWN_COOLDOWN", 300)
+
+# nginx reloads (see `hop3.plugins.nginx._reload`): delay (in seconds) to
+# batch the config changes, command to check the configs, and command to
+# reload nginx (by default, a file watched by the `hop3-nginx.path` unit is
+# touched)
+NGINX_RELOAD_DELAY = config.get_int("NGINX_RELOAD_DELAY", 2)
+NGINX_CHECK_COMMAND = config.get_str("NGINX_CHECK_COMMAND", "sudo -n nginx -t")
+NGINX_RELOAD_COMMAND = config.get_str("NGINX_RELOAD_COMMAND", "")
+
+# Number of submodules of an app fetched at once
+GIT_SUBMODULE_JOBS = config.get_int("GIT_SUBMODULE_JOBS", 4)
+
+# Maintenance of the git repositories of the apps (see
+# `hop3.core.maintenance`): interval between checks (0 to disable), and max
+# load average (per CPU) for it to run
+GIT_MAINTENANCE_INTERVAL = config.get_int("GIT_MAINTENANCE_INTERVAL", 3600)
+GIT_MAINTENANCE_MAX_LOAD = config.get_float("GIT_MAINTENANCE_MAX_LOAD", 0.5)
+
+# Size of the thread pool used to run (blocking) RPC commands
+RPC_WORKERS = config.get_int("RPC_WORKERS", os.cpu_count() or 4)
+
 # Computed paths
 HOP3_BIN = HOP3_ROOT / "bin"
 HOP3_SCRIPT = str(HOP3_ROOT / "venv" / "bin" / "hop-agent")
@@ -41,22 +115,33 @@ APP_ROOT = HOP3_ROOT / "apps"
 
 NGINX_ROOT = HOP3_ROOT / "nginx"
 CACHE_ROOT = HOP3_ROOT / "cache"
+BUILD_CACHE_ROOT = HOP3_ROOT / "build-cache"
+PACKAGE_CACHE_ROOT = HOP3_ROOT / "package-cache"
+TOOLCHAIN_ROOT = HOP3_ROOT / "toolchains"
 CADDY_ROOT = HOP3_ROOT / "caddy"
 TRAEFIK_ROOT = HOP3_ROOT / "traefik"
 
 UWSGI_ROOT = HOP3_ROOT / "uwsgi"
 UWSGI_AVAILABLE = HOP3_ROOT / "uwsgi-available"
 UWSGI_ENABLED = HOP3_ROOT / "uwsgi-enabled"
+UWSGI_STATS = HOP3_ROOT / "uwsgi-stats"
 UWSGI_LOG_MAXSIZE = "1048576"
 
 ACME_WWW = HOP3_ROOT / "acme"
 
+# Cache of the host probes (see `hop3.core.capabilities`)
+HOST_CAPABILITIES = HOP3_ROOT / "host-capabilities.json"
+
 ROOT_DIRS = [
     APP_ROOT,
     CACHE_ROOT,
+    BUILD_CACHE_ROOT,
+    PACKAGE_CACHE_ROOT,
+    TOOLCHAIN_ROOT,
     UWSGI_ROOT,
     UWSGI_AVAILABLE,
     UWSGI_ENABLED,
+    UWSGI_STATS,
     NGINX_ROOT,
 ]
 
@@ -0,0 +1,232 @@
+# Copyright (c) 2025, Abilian SAS
+#
+# SPDX-License-Identifier: Apache-2.0
+"""Persistent cache of the capabilities of the host.
+
+Some facts about the host are needed on each deploy, but only change when
+a package is upgraded: the modules of nginx (`nginx -V`), the versions of
+the runtimes (`python3 --version`, `ruby -v`...), the OS release, the
+hardware... Probing them forks a process each time.
+
+They are cached in `HOST_CAPABILITIES` (a JSON file), with a stamp of what
+they depend on:
+
+- the binary which is run (its path, mtime and size, so an upgrade of the
+  package invalidates the entry);
+- optional extra files (e.g. `/etc/os-release`);
+- optionally, the boot id (for hardware facts).
+
+The cache is warmed when the server starts (`warm_host_capabilities`).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shlex
+import shutil
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from hop3 import config as c
+from hop3.lib import command_output, log
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Mapping
+
+__all__ = ["HostCapabilities", "get_host_capabilities", "warm_host_capabilities"]
+
+BOOT_ID_FILE = Path("/proc/sys/kernel/random/boot_id")
+
+# Probed when the server starts
+WARM_UP_COMMANDS = [
+    "nginx -V",
+    "python3 --version",
+    "ruby -v",
+    "node -v",
+]
+
+
+@dataclass
+class HostCapabilities:
+    """The cache of the host probes, persisted in a JSON file."""
+
+    path: Path
+    # key -> {"stamp": ..., "value": ...}
+    entries: dict[str, dict[str, Any]] = field(default_factory=dict)
+    hits: int = 0
+    misses: int = 0
+
+    _loaded: bool = False
+    _lock: threading.RLock = field(default_factory=threading.RLock)
+
+    def probe(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        *,
+        binary: str = "",
+        search_path: str | None = None,
+        depends: Iterable[Path | str] = (),
+        per_boot: bool = False,
+    ) -> Any:
+        """Return the cached value of a probe, or compute it (and cache it)
+        if what it depends on changed.
+
+        Input:
+        - key: The key of the probe.
+        - compute: Computes the value (must return a JSON-serializable value).
+        - binary: The binary run by the probe (looked up in `search_path`).
+        - depends: Other files the value depends on.
+        - per_boot: If the value can change after a reboot (e.g. hardware).
+        """
+        stamp = get_stamp(binary, search_path, depends, per_boot=per_boot)
+        with self._lock:
+            self.load()
+            entry = self.entries.get(key)
+            if entry is not None and entry["stamp"] == stamp:
+                self.hits += 1
+                return entry["value"]
+
+            self.misses += 1
+            value = compute()
+            self.entries[key] = {"stamp": stamp, "value": value}
+            self.save()
+            return value
+
+    def command_output(
+        self,
+        cmd: str,
+        env: Mapping[str, str] | None = None,
+        depends: Iterable[Path | str] = (),
+    ) -> str:
+        """Cached `command_output()`, for commands whose output only depends
+        on the binary they run (e.g. `nginx -V`)."""
+        search_path = env.get("PATH") if env is not None else None
+        key = f"command:{cmd}"
+        if search_path is not None:
+            key += f":{search_path}"
+        return self.probe(
+            key,
+            lambda: command_output(cmd, env=env),
+            binary=get_binary(cmd),
+            search_path=search_path,
+            depends=depends,
+        )
+
+    def which(self, binary: str) -> str | None:
+        """Cached `shutil.which()` (on the PATH of the process)."""
+        with self._lock:
+            self.load()
+            entry = self.entries.get(f"which:{binary}")
+            if entry and os.access(entry["value"], os.X_OK):
+                self.hits += 1
+                return entry["value"]
+
+            self.misses += 1
+            path = shutil.which(binary)
+            if path:
+                self.entries[f"which:{binary}"] = {"stamp": "", "value": path}
+                self.save()
+            return path
+
+    def load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            self.entries = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self) -> None:
+        """Save the cache (atomically, as several processes may use it)."""
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        try:
+            tmp_path.write_text(json.dumps(self.entries, indent=2, sort_keys=True))
+            tmp_path.replace(self.path)
+        except OSError as e:
+            log(f"Can't save the host capabilities: {e}", level=2, fg="yellow")
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries = {}
+            self._loaded = True
+            self.path.unlink(missing_ok=True)
+
+
+def get_binary(cmd: str) -> str:
+    """The binary run by a command, e.g. "lshw" for "sudo lshw -short"."""
+    try:
+        words = shlex.split(cmd)
+    except ValueError:
+        words = cmd.split()
+    if words and words[0] == "sudo":
+        words = [word for word in words[1:] if not word.startswith("-")]
+    return words[0] if words else ""
+
+
+def get_stamp(
+    binary: str,
+    search_path: str | None,
+    depends: Iterable[Path | str],
+    *,
+    per_boot: bool = False,
+) -> str:
+    """A stamp of the files a probe depends on (changes when one of them is
+    changed, added or removed)."""
+    paths: list[Path | str] = []
+    if binary:
+        paths.append(shutil.which(binary, path=search_path) or binary)
+    paths += list(depends)
+
+    parts = [get_file_stamp(path) for path in paths]
+    if per_boot:
+        try:
+            parts.append(f"boot:{BOOT_ID_FILE.read_text().strip()}")
+        except OSError:
+            parts.append("boot:-")
+    return "|".join(parts)
+
+
+def get_file_stamp(path: Path | str) -> str:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return f"{path}:-"
+    return f"{path}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+# The cache of the process
+_capabilities: HostCapabilities | None = None
+_capabilities_lock = threading.Lock()
+
+
+def get_host_capabilities() -> HostCapabilities:
+    global _capabilities  # noqa: PLW0603
+
+    with _capabilities_lock:
+        if _capabilities is None or _capabilities.path != c.HOST_CAPABILITIES:
+            _capabilities = HostCapabilities(c.HOST_CAPABILITIES)
+        return _capabilities
+
+
+def warm_host_capabilities() -> None:
+    """Probe the host in a background thread, so that the first deploys
+    don't have to."""
+    from hop3.lib.sysinfo import SysInfo
+
+    def warm() -> None:
+        capabilities = get_host_capabilities()
+        for cmd in WARM_UP_COMMANDS:
+            if capabilities.which(get_binary(cmd)):
+                capabilities.command_output(cmd)
+        sysinfo = SysInfo()
+        sysinfo.system_arch()
+        sysinfo.distrib_codename()
+        sysinfo.distrib_version()
+
+    thread = threading.Thread(target=warm, name="hop3-capabilities", daemon=True)
+    thread.start()
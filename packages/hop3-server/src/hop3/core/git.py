@@ -7,21 +7,27 @@ server side.
 
 from __future__ import annotations
 
+import os
+import re
 import stat
 import subprocess
+from pathlib import Path
 from textwrap import dedent
 from typing import TYPE_CHECKING
 
 from attrs import frozen
 
 from hop3 import config as c
-from hop3.lib import log
+from hop3.core.env import Env
+from hop3.lib import log, shell
+from hop3.lib.settings import parse_settings_text, parse_size
 
 if TYPE_CHECKING:
-    from pathlib import Path
-
     from hop3.orm import App
 
+# Checkout options shipped with the app (see `CheckoutOptions`)
+CHECKOUT_FILE = "checkout.env"
+
 
 @frozen
 class GitManager:
@@ -81,28 +87,269 @@ class GitManager:
             make_executable(hook_path)
 
     def clone(self) -> None:
-        """Clone the git repository to the source directory.
+        """Check out the sources of the app in the source directory.
 
-        This checks if the source path for the application exists. If it
-        does not exist, it creates the application directory and clones
-        the specified git repository into it.
+        The sources are a worktree of the bare repository of the app: they
+        share its objects (there is no second copy of the history), and are
+        updated in place by `checkout()`.
         """
         if not self.app.src_path.exists():
             log(f"Creating app '{self.app_name}'", level=2, fg="green")
             self.app.create()
+            # (Nothing to check out if nothing was pushed yet)
+            options = self.get_checkout_options("HEAD")
+            if self.add_worktree("HEAD", options):
+                self.update_submodules("", options)
 
-            # Prepare the git clone command with the repository path and source path
-            cmd = [
-                "git",
-                "clone",
-                "--quiet",
-                str(self.repo_path),
-                str(self.app.src_path),
-            ]
-            cwd = self.app.repo_path
+    @property
+    def is_worktree(self) -> bool:
+        # The `.git` of a worktree is a file, pointing to the repository
+        return (self.app.src_path / ".git").is_file()
 
-            # Execute the git clone command in the specified working directory
-            subprocess.run(cmd, cwd=cwd, check=True)
+    def add_worktree(self, rev: str, options: CheckoutOptions) -> bool:
+        """Create the worktree of the sources, at `rev`.
+
+        Returns:
+        - False if there is no such commit (e.g. the repository is empty).
+        """
+        if not git_output(
+            ["rev-parse", "--verify", "--quiet", f"{rev}^{{commit}}"], self.repo_path
+        ):
+            return False
+        # Forget the worktree of a previous source directory, if removed
+        subprocess.run(["git", "worktree", "prune"], cwd=self.repo_path, check=True)
+        cmd = ["git", "worktree", "add", "--quiet", "--detach"]
+        if options.is_sparse:
+            # Only the selected files are checked out, below
+            cmd.append("--no-checkout")
+        cmd += [str(self.app.src_path), rev]
+        subprocess.run(cmd, cwd=self.repo_path, env=options.get_env(), check=True)
+
+        if options.is_sparse:
+            self.apply_checkout_options(rev, options)
+            shell(
+                "git reset --quiet --hard", cwd=self.app.src_path, env=options.get_env()
+            )
+        return True
+
+    def checkout(self, newrev: str) -> None:
+        """Update the sources to the `newrev` commit (or keep the current one,
+        if empty), and their submodules.
+
+        Only the files which changed between the two commits are written.
+        """
+        src_path = self.app.src_path
+        if not (src_path / ".git").exists():
+            # E.g. the first push to an empty repository
+            options = self.get_checkout_options(newrev or "HEAD")
+            if self.add_worktree(newrev or "HEAD", options):
+                self.update_submodules("", options)
+            return
+
+        previous = git_output(["rev-parse", "HEAD"], src_path)
+        rev = newrev or previous
+        options = self.get_checkout_options(rev)
+        env = options.get_env()
+        if not self.is_worktree:
+            # A clone made by a previous version of Hop3
+            shell("git fetch --quiet", cwd=src_path, env=env)
+
+        self.apply_checkout_options(rev, options)
+        if newrev and newrev != previous:
+            shell(f"git reset --quiet --hard {newrev}", cwd=src_path, env=env)
+        self.update_submodules(previous, options)
+
+    def update_submodules(self, previous: str, options: CheckoutOptions) -> None:
+        """Update the submodules (in parallel), unless neither `.gitmodules`
+        nor the commits of the submodules changed since the `previous`
+        commit."""
+        src_path = self.app.src_path
+        if not (src_path / ".gitmodules").exists():
+            return
+
+        sync = True
+        if previous:
+            diff = ["diff", "--raw", "--no-renames", previous, "HEAD"]
+            # E.g. ":160000 160000 4c3d2a1 8e7f6b5 M\tvendor/lib"
+            changes = [line.split() for line in git_output(diff, src_path).splitlines()]
+            sync = any(change[-1] == ".gitmodules" for change in changes)
+            # Submodules are the entries of mode 160000
+            if not sync and not any("160000" in change[1] for change in changes):
+                log("Submodules unchanged, skipping update.", level=2, fg="green")
+                return
+
+        env = options.get_env()
+        if sync:
+            # Their URLs may have changed
+            shell("git submodule sync --quiet", cwd=src_path, env=env)
+        shell(
+            f"git submodule update --init --jobs {c.GIT_SUBMODULE_JOBS}",
+            cwd=src_path,
+            env=env,
+        )
+
+    def get_checkout_options(self, rev: str) -> CheckoutOptions:
+        """The checkout options of the app, from its settings (which override
+        the ones of the `checkout.env` file of the repository, at `rev`)."""
+        env = Env()
+        if settings := self.get_file(rev, CHECKOUT_FILE):
+            env.update(parse_settings_text(settings))
+        env.parse_settings(self.app.app_path / "ENV")
+        env.update(self.app.get_runtime_env())
+        return CheckoutOptions.from_env(env)
+
+    def get_file(self, rev: str, filename: str) -> str:
+        """Return the content of a file of the repository at `rev` ("" if not
+        found), searched like `AppConfig.get_file` (first in the "hop3"
+        subdirectory, then in the root)."""
+        for path in [f"hop3/{filename}", filename]:
+            if content := git_output(["show", f"{rev}:{path}"], self.repo_path):
+                return content
+        return ""
+
+    def apply_checkout_options(self, rev: str, options: CheckoutOptions) -> None:
+        """Configure the sparse checkout of the sources for `rev`, if its
+        settings changed.
+
+        The files outside of the sparse checkout are removed from the
+        sources (or checked out, if they are added back to it).
+        """
+        src_path = self.app.src_path
+        if options.blob_limit:
+            large_files = self.get_large_files(rev, options.blob_limit)
+            patterns = options.get_patterns(large_files)
+            state = "\n".join(["no-cone", *patterns])
+        elif options.sparse_paths:
+            state = "\n".join(["cone", *options.sparse_paths])
+        else:
+            state = ""
+
+        # The settings currently applied
+        state_path = get_git_dir(src_path) / "hop3-sparse-checkout"
+        if state == (state_path.read_text() if state_path.exists() else ""):
+            return
+
+        env = options.get_env()
+        if options.blob_limit:
+            log(f"Skipping {len(large_files)} large file(s).", level=2, fg="blue")
+            cmd = ["git", "sparse-checkout", "set", "--no-cone", "--stdin"]
+            subprocess.run(
+                cmd,
+                cwd=src_path,
+                env=env,
+                input="\n".join(patterns) + "\n",
+                text=True,
+                check=True,
+            )
+        elif options.sparse_paths:
+            cmd = ["git", "sparse-checkout", "set", "--cone", "--"]
+            subprocess.run(
+                [*cmd, *options.sparse_paths], cwd=src_path, env=env, check=True
+            )
+        else:
+            shell("git sparse-checkout disable", cwd=src_path, env=env)
+
+        if state:
+            state_path.write_text(state)
+        else:
+            state_path.unlink(missing_ok=True)
+
+    def get_large_files(self, rev: str, limit: int) -> list[str]:
+        """The files of `rev` larger than `limit` (in bytes)."""
+        output = git_output(
+            ["ls-tree", "-r", "-l", "-z", "--full-tree", rev], self.repo_path
+        )
+        large_files = []
+        # E.g. "100644 blob 8e7f6b5 1048576\tdata/dump.sql"
+        for entry in output.split("\0"):
+            if not entry:
+                continue
+            meta, path = entry.split("\t", 1)
+            size = meta.split()[3]
+            if size != "-" and int(size) > limit:
+                large_files.append(path)
+        return large_files
+
+
+@frozen
+class CheckoutOptions:
+    """Options of the checkout of the sources, for large repositories.
+
+    They are read from the settings of the app, or from a `checkout.env`
+    file in the repository (see `GitManager.get_checkout_options`):
+
+    - `HOP3_GIT_SPARSE_PATHS`: only check out these directories (and the
+      files at the root), separated by spaces or commas;
+    - `HOP3_GIT_BLOB_LIMIT`: don't check out the files larger than this
+      size (e.g. `10M`);
+    - `HOP3_GIT_LFS_SKIP_SMUDGE`: don't download the Git LFS files (only
+      their pointers are checked out).
+    """
+
+    sparse_paths: tuple[str, ...] = ()
+    blob_limit: int = 0
+    lfs_skip_smudge: bool = False
+
+    @classmethod
+    def from_env(cls, env: Env) -> CheckoutOptions:
+        sparse_paths = env.get("HOP3_GIT_SPARSE_PATHS", "").replace(",", " ").split()
+        blob_limit = env.get("HOP3_GIT_BLOB_LIMIT", "")
+        return cls(
+            sparse_paths=tuple(path.strip("/") for path in sparse_paths),
+            blob_limit=parse_size(blob_limit) if blob_limit else 0,
+            lfs_skip_smudge=env.get_bool("HOP3_GIT_LFS_SKIP_SMUDGE"),
+        )
+
+    @property
+    def is_sparse(self) -> bool:
+        return bool(self.sparse_paths or self.blob_limit)
+
+    def get_env(self) -> dict[str, str] | None:
+        """The environment of the git commands (None to inherit it)."""
+        if not self.lfs_skip_smudge:
+            return None
+        return {**os.environ, "GIT_LFS_SKIP_SMUDGE": "1"}
+
+    def get_patterns(self, excluded: list[str]) -> list[str]:
+        """The (non-cone) sparse checkout patterns, for the sparse paths and
+        without the `excluded` files."""
+        patterns = ["/*"]
+        if self.sparse_paths:
+            # Like the cone mode: the files at the root, and the directories
+            patterns.append("!/*/")
+            patterns += [f"/{escape_pattern(path)}/" for path in self.sparse_paths]
+        patterns += [f"!/{escape_pattern(path)}" for path in excluded]
+        return patterns
+
+
+def escape_pattern(path: str) -> str:
+    """Escape the special characters of a path, in a sparse checkout
+    pattern."""
+    return re.sub(r"([\\*?\[\]!#])", r"\\\1", path)
+
+
+def get_git_dir(src_path: Path) -> Path:
+    """The git directory of a checkout (a clone or a worktree)."""
+    dot_git = src_path / ".git"
+    if not dot_git.is_file():
+        return dot_git
+    # E.g. "gitdir: /home/hop3/apps/myapp/git/worktrees/src"
+    git_dir = Path(dot_git.read_text().removeprefix("gitdir:").strip())
+    return src_path / git_dir
+
+
+def git_output(args: list[str], cwd: Path) -> str:
+    """Return the output of a git command ("" if it fails)."""
+    result = subprocess.run(
+        ["git", *args],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if result.returncode:
+        return ""
+    return result.stdout.strip()
 
 
 def make_executable(path: Path) -> None:
@@ -0,0 +1,265 @@
+# Copyright (c) 2025, Abilian SAS
+#
+# SPDX-License-Identifier: Apache-2.0
+"""Background maintenance of the git repositories of the apps.
+
+Each push adds loose objects or a new pack to the bare repository of the
+app, so pushes (and checkouts) get slower over time. Every
+`GIT_MAINTENANCE_INTERVAL` seconds, the repositories which changed since
+their last maintenance are maintained with `git maintenance run`, one at a
+time:
+
+- `loose-objects`: pack the loose objects;
+- `incremental-repack`: repack the small packs together, and write the
+  multi-pack-index;
+- `commit-graph`: update the commit-graph (faster history walks);
+- `pack-refs`: pack the refs.
+
+Maintenance only runs when the host is idle (load average below
+`GIT_MAINTENANCE_MAX_LOAD` per CPU), never during a deploy of the app, and
+with the lowest IO and CPU priorities (`ionice -c 3`, `nice -n 19`).
+
+The result of the last maintenance of a repository is kept in its
+`hop3-maintenance.json` file (see `hop system maintenance`).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING
+
+from hop3 import config as c
+from hop3.lib import log
+from hop3.orm import App
+from hop3.scheduler import get_app_lock
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+__all__ = [
+    "GitMaintainer",
+    "MaintenanceState",
+    "RepoStats",
+    "get_maintenance_report",
+    "maintain_repo",
+    "start_git_maintenance",
+    "stop_git_maintenance",
+]
+
+STATE_FILE = "hop3-maintenance.json"
+
+# Run once there is a pack (`incremental-repack` fails otherwise), after
+# removing the loose objects packed by the first `loose-objects`
+PACK_TASKS = ["loose-objects", "incremental-repack", "commit-graph", "pack-refs"]
+
+
+@dataclass(frozen=True)
+class RepoStats:
+    """The objects of a repository."""
+
+    loose_objects: int = 0
+    packs: int = 0
+    # Of the objects (in bytes)
+    size: int = 0
+
+    @classmethod
+    def collect(cls, repo_path: Path) -> RepoStats:
+        objects_path = repo_path / "objects"
+        loose_objects = packs = size = 0
+        for path in objects_path.glob("??/*"):
+            loose_objects += 1
+            size += path.stat().st_size
+        for path in objects_path.glob("pack/*"):
+            packs += path.suffix == ".pack"
+            size += path.stat().st_size
+        return cls(loose_objects, packs, size)
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.loose_objects and not self.packs
+
+
+@dataclass(frozen=True)
+class MaintenanceState:
+    """The result of the last maintenance of a repository."""
+
+    time: float
+    duration: float
+    before: RepoStats
+    after: RepoStats
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return not self.error
+
+    @classmethod
+    def load(cls, repo_path: Path) -> MaintenanceState | None:
+        try:
+            data = json.loads((repo_path / STATE_FILE).read_text())
+            data["before"] = RepoStats(**data["before"])
+            data["after"] = RepoStats(**data["after"])
+            return cls(**data)
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+
+    def save(self, repo_path: Path) -> None:
+        (repo_path / STATE_FILE).write_text(json.dumps(asdict(self), indent=2))
+
+
+def maintain_repo(app: App, *, force: bool = False) -> MaintenanceState | None:
+    """Run the maintenance of the repository of an app, if it changed since
+    its last maintenance (or if `force`).
+
+    Returns:
+    - The result, or None if skipped (unchanged, or being deployed).
+    """
+    repo_path = app.repo_path
+    if not (repo_path / "objects").is_dir():
+        return None
+    before = RepoStats.collect(repo_path)
+    previous = MaintenanceState.load(repo_path)
+    if before.is_empty:
+        return None
+    if not force and previous and previous.after == before:
+        return None
+
+    # Not during a deploy
+    lock = get_app_lock(app.name)
+    if not lock.acquire(blocking=False):
+        return None
+    try:
+        start = time.time()
+        error = run_maintenance(repo_path, ["loose-objects"])
+        if not error and RepoStats.collect(repo_path).packs:
+            error = run_maintenance(repo_path, PACK_TASKS)
+        state = MaintenanceState(
+            time=start,
+            duration=time.time() - start,
+            before=before,
+            after=RepoStats.collect(repo_path),
+            error=error,
+        )
+        state.save(repo_path)
+    finally:
+        lock.release()
+
+    if state.ok:
+        log(
+            f"{app.name}: git maintenance done in {state.duration:.1f}s"
+            f" ({before.packs} -> {state.after.packs} packs)",
+            level=3,
+        )
+    else:
+        log(f"{app.name}: git maintenance failed: {error}", level=1, fg="red")
+    return state
+
+
+def run_maintenance(repo_path: Path, tasks: list[str]) -> str:
+    """Run maintenance tasks, throttled.
+
+    Returns:
+    - The error ("" if none).
+    """
+    cmd = [*get_throttle_command(), "git", "maintenance", "run", "--quiet"]
+    cmd += [f"--task={task}" for task in tasks]
+    result = subprocess.run(
+        cmd, cwd=repo_path, capture_output=True, text=True, check=False
+    )
+    if result.returncode:
+        return (result.stderr or result.stdout).strip() or f"exit {result.returncode}"
+    return ""
+
+
+def get_throttle_command() -> list[str]:
+    """The prefix of a command run with the lowest IO and CPU priorities."""
+    cmd = []
+    if shutil.which("ionice"):
+        cmd += ["ionice", "-c", "3"]
+    if shutil.which("nice"):
+        cmd += ["nice", "-n", "19"]
+    return cmd
+
+
+def is_idle() -> bool:
+    load = os.getloadavg()[0] / (os.cpu_count() or 1)
+    return load <= c.GIT_MAINTENANCE_MAX_LOAD
+
+
+def get_maintenance_report() -> list[tuple[str, RepoStats, MaintenanceState | None]]:
+    """The objects of the repositories of the apps, and the result of their
+    last maintenance."""
+    report = []
+    if not c.APP_ROOT.exists():
+        return report
+    for app_path in sorted(c.APP_ROOT.iterdir()):
+        repo_path = App(name=app_path.name).repo_path
+        if (repo_path / "objects").is_dir():
+            stats = RepoStats.collect(repo_path)
+            report.append((app_path.name, stats, MaintenanceState.load(repo_path)))
+    return report
+
+
+@dataclass
+class GitMaintainer:
+    """Maintain the repositories of the apps, when the host is idle."""
+
+    interval: int = c.GIT_MAINTENANCE_INTERVAL
+
+    _stop: threading.Event = field(default_factory=threading.Event)
+
+    def run(self) -> None:
+        """Check the repositories every `interval` seconds, until stopped."""
+        while not self._stop.wait(self.interval):
+            self.run_safely()
+
+    def run_safely(self) -> None:
+        try:
+            self.run_once()
+        except Exception as e:
+            log(f"Git maintenance error: {e}", level=1, fg="red")
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run_once(self) -> None:
+        if not c.APP_ROOT.exists():
+            return
+        for app_path in sorted(c.APP_ROOT.iterdir()):
+            # Check again before each repository (maintenance may take a
+            # while)
+            if self._stop.is_set() or not is_idle():
+                return
+            maintain_repo(App(name=app_path.name))
+
+
+# The maintainer of the server process (if enabled)
+_maintainer: GitMaintainer | None = None
+
+
+def start_git_maintenance() -> None:
+    """Start the maintenance of the repositories in a background thread
+    (unless disabled, with `GIT_MAINTENANCE_INTERVAL=0`)."""
+    global _maintainer  # noqa: PLW0603
+
+    if c.GIT_MAINTENANCE_INTERVAL <= 0 or _maintainer is not None:
+        return
+    _maintainer = GitMaintainer()
+    thread = threading.Thread(
+        target=_maintainer.run, name="hop3-git-maintenance", daemon=True
+    )
+    thread.start()
+
+
+def stop_git_maintenance() -> None:
+    global _maintainer  # noqa: PLW0603
+
+    if _maintainer is not None:
+        _maintainer.stop()
+        _maintainer = None
@@ -5,12 +5,17 @@
 
 from __future__ import annotations
 
+import threading
+from contextlib import AbstractContextManager, nullcontext
 from typing import TYPE_CHECKING
 
-from attrs import field, mutable
+from attrs import field, frozen, mutable
 
+from hop3 import config as c
 from hop3.builders import BUILDER_CLASSES
-from hop3.lib import Abort, chdir, check_binaries, log, shell
+from hop3.core.git import GitManager
+from hop3.deploy_manifest import DeployManifest, get_commit, hash_inputs
+from hop3.lib import Abort, check_binaries, log, shell
 from hop3.project.config import AppConfig
 from hop3.run.spawn import spawn_app
 
@@ -20,11 +25,15 @@ if TYPE_CHECKING:
     from hop3.orm.app import App
 
 
-__all__ = ["do_deploy"]
+__all__ = ["DeploySlots", "do_deploy"]
 
 
 def do_deploy(
-    app: App, *, deltas: dict[str, int] | None = None, newrev: str = ""
+    app: App,
+    *,
+    deltas: dict[str, int] | None = None,
+    newrev: str = "",
+    force: bool = False,
 ) -> None:
     """Deploy an application with optional configuration changes and revision
     update.
@@ -35,18 +44,46 @@ def do_deploy(
               and values are integers representing the changes in configuration or scaling.
     - newrev: An optional string representing the new revision or version identifier to
               be deployed. Defaults to an empty string, indicating no revision change.
+    - force: Run all the phases of the deploy, even if their inputs didn't change.
     """
-    deployer = Deployer(app)
+    deployer = Deployer(app, force=force)
     deployer.deploy(deltas=deltas, newrev=newrev)
 
 
+@frozen
+class DeploySlots:
+    """Limits on the number of deploys in a given phase, shared by concurrent
+    deploys.
+
+    - `build`: CPU-bound phase (prebuild, build, postbuild).
+    - `io`: IO-bound phases (source update, spawning the workers).
+    """
+
+    build: threading.BoundedSemaphore
+    io: threading.BoundedSemaphore
+
+    @classmethod
+    def create(cls, build_slots: int = 0, io_slots: int = 0) -> DeploySlots:
+        return cls(
+            build=threading.BoundedSemaphore(build_slots or c.DEPLOY_BUILD_SLOTS),
+            io=threading.BoundedSemaphore(io_slots or c.DEPLOY_IO_SLOTS),
+        )
+
+
 @mutable
 class Deployer:
     app: App
 
+    # Set when the deploy runs concurrently with others
+    slots: DeploySlots | None = None
+
+    # Run all the phases, even those whose inputs didn't change
+    force: bool = False
+
     # Parsed and set during deployment
     workers: dict = field(factory=dict)
     config: AppConfig | None = None
+    manifest: DeployManifest = field(factory=DeployManifest)
 
     #
     # Properties
@@ -67,19 +104,55 @@ class Deployer:
     # Lifecycle
     #
     def deploy(self, *, deltas: dict[str, int] | None = None, newrev: str = "") -> None:
-        """Deploy an app by resetting the work directory."""
-        deltas = deltas or {}
-
-        self.update(newrev)
+        """Deploy an app by resetting the work directory.
 
-        # Lifecycle of a build
-        self.run_prebuild()
-        self.run_build()
-        self.run_postbuild()
-
-        spawn_app(self.app, deltas)
+        Only the phases whose inputs changed since the last deploy are run
+        (see `hop3.deploy_manifest`), unless `force` is set.
+        """
+        deltas = deltas or {}
 
-    def update(self, newrev: str) -> None:
+        previous = (
+            DeployManifest() if self.force else DeployManifest.load(self.app_path)
+        )
+
+        with self.io_slot():
+            self.update(newrev, previous)
+
+        manifest = self.manifest
+        manifest.commit = get_commit(self.src_path)
+        manifest.inputs = hash_inputs(self.app_path)
+        manifest.build_key = manifest.compute_build_key(self.workers)
+
+        # Restart all the workers only if the code they run changed
+        restart = True
+        if previous.is_built(manifest.build_key, self.app_path):
+            log(
+                "Sources and dependencies unchanged, skipping build.",
+                level=2,
+                fg="green",
+            )
+            manifest.outputs = previous.outputs
+            # (Unless the sources are not a git checkout: can't tell)
+            restart = not manifest.commit
+        else:
+            # Lifecycle of a build
+            with self.build_slot():
+                self.run_prebuild()
+                self.run_build()
+                self.run_postbuild()
+
+        with self.io_slot():
+            spawn_app(self.app, deltas, restart=restart)
+
+        manifest.save(self.app_path)
+
+    def io_slot(self) -> AbstractContextManager:
+        return self.slots.io if self.slots else nullcontext()
+
+    def build_slot(self) -> AbstractContextManager:
+        return self.slots.build if self.slots else nullcontext()
+
+    def update(self, newrev: str, previous: DeployManifest | None = None) -> None:
         app_name = self.app_name
         app_path = self.app_path
 
@@ -87,7 +160,11 @@ class Deployer:
 
         log(f"Deploying app '{app_name}'", level=0, fg="green")
 
-        self._git_update(newrev)
+        if previous and not previous.is_empty and newrev in {"", previous.commit}:
+            # E.g. a redeploy after a config change
+            log("Sources unchanged, skipping update.", level=2, fg="green")
+        else:
+            self._git_update(newrev)
 
         config = AppConfig.from_dir(app_path)
         self.config = config
@@ -148,6 +225,11 @@ class Deployer:
                 log(f"{builder.name} app detected.", level=3, fg="green")
                 builder.build()
                 builder_detected = True
+                self.manifest.outputs += [
+                    str(path.relative_to(self.app_path))
+                    for path in builder.get_outputs()
+                    if path.exists()
+                ]
 
         # Check if specific worker combinations imply a generic or static app
         if "release" in workers and "web" in workers:
@@ -180,25 +262,14 @@ class Deployer:
             raise Abort(msg)
 
     def _git_update(self, newrev: str) -> None:
-        """Perform a git update by fetching the latest changes and resetting
-        the repository to a specified revision.
+        """Update the sources to a specified revision (see
+        `GitManager.checkout`).
 
         Input:
-            newrev (str): The new revision hash to reset the git repository to.
-            If empty, the reset step is skipped.
+            newrev (str): The new revision hash to check out.
+            If empty, the current revision is kept.
 
         Raises:
-            RuntimeError: If any of the git commands fail, this will raise an exception
-                          through the shell function which is expected to handle such errors.
+            CalledProcessError: If any of the git commands fail.
         """
-        env: dict[str, str] = {}  # Environment variables dictionary, currently empty
-        with chdir(self.src_path):
-            # Fetch the latest changes from the remote repository quietly
-            shell("git fetch --quiet", env=env)
-            if newrev:
-                # Reset the repository to the specified revision
-                shell(f"git reset --hard {newrev}", env=env)
-            # Initialize the submodules
-            shell("git submodule init", env=env)
-            # Update the submodules to match the current commit
-            shell("git submodule update", env=env)
+        GitManager(self.app).checkout(newrev)
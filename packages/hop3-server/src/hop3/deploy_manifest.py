@@ -0,0 +1,186 @@
+# Copyright (c) 2025, Abilian SAS
+#
+# SPDX-License-Identifier: Apache-2.0
+"""Deploy manifests, used to skip the phases of a deploy whose inputs didn't
+change.
+
+The manifest of an app records, for its last successful deploy, the deployed
+commit, the hashes of the inputs of the build (lockfiles, and the settings
+of the ENV file read by the builders) and the trees produced by the build
+(virtualenv, `node_modules`...).
+
+A redeploy then only runs the phases that need to run:
+
+- the source update, when a new commit was pushed;
+- the build (prebuild, build, postbuild), when the commit, the build
+  inputs or the build commands changed, or when an output is missing;
+- spawning the workers (which regenerates the uwsgi / nginx configs) is
+  always done, since it is cheap and depends on the runtime settings. But
+  when the build was skipped, only the workers whose config changed are
+  restarted.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import subprocess
+from typing import TYPE_CHECKING
+
+from attrs import asdict, field, mutable
+
+from hop3.lib.settings import parse_settings
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+    from pathlib import Path
+
+__all__ = ["DeployManifest", "get_commit", "hash_inputs"]
+
+MANIFEST_FILE = "DEPLOY_MANIFEST.json"
+
+# Files (relative to the source directory) which are inputs of the build
+BUILD_INPUT_FILES = [
+    # Python
+    "requirements.txt",
+    "pyproject.toml",
+    "uv.lock",
+    "poetry.lock",
+    # Node
+    "package.json",
+    "package-lock.json",
+    "npm-shrinkwrap.json",
+    "yarn.lock",
+    # Ruby
+    "Gemfile",
+    "Gemfile.lock",
+    # PHP
+    "composer.json",
+    "composer.lock",
+    # Go
+    "go.mod",
+    "go.sum",
+    # Rust
+    "Cargo.toml",
+    "Cargo.lock",
+    # Clojure
+    "project.clj",
+    "deps.edn",
+]
+
+# Settings (of the ENV file) read by the builders: changing another setting
+# only regenerates the configs of the workers
+BUILD_ENV_KEYS = [
+    "PATH",
+    "NODE_VERSION",
+    "HOP3_PYTHON_INSTALLER",
+    "CLJ_CONFIG",
+    # Checkout options (see `hop3.core.git.CheckoutOptions`)
+    "HOP3_GIT_SPARSE_PATHS",
+    "HOP3_GIT_BLOB_LIMIT",
+    "HOP3_GIT_LFS_SKIP_SMUDGE",
+]
+
+# Setting listing the other settings read by the build commands of the app
+# (e.g. "NODE_ENV")
+BUILD_ENV_SETTING = "HOP3_BUILD_ENV"
+
+# Procfile entries which are part of the build
+BUILD_WORKERS = ["prebuild", "build", "postbuild"]
+
+
+@mutable
+class DeployManifest:
+    """The state of the last successful deploy of an app.
+
+    Attributes:
+        commit: The deployed commit (empty if the sources are not a git
+            checkout).
+        inputs: The hashes of the build inputs, by file name.
+        build_key: The key of the build, computed from the commit, the
+            inputs and the build commands.
+        outputs: The trees produced by the build (relative to the app
+            directory).
+    """
+
+    commit: str = ""
+    inputs: dict[str, str] = field(factory=dict)
+    build_key: str = ""
+    outputs: list[str] = field(factory=list)
+
+    @classmethod
+    def load(cls, app_path: Path) -> DeployManifest:
+        """Load the manifest of the app (an empty one if the app was never
+        deployed, or if the manifest can't be read)."""
+        path = app_path / MANIFEST_FILE
+        try:
+            data = json.loads(path.read_text())
+            return cls(**data)
+        except (OSError, TypeError, ValueError):
+            return cls()
+
+    def save(self, app_path: Path) -> None:
+        """Save the manifest (atomically, so a failed deploy never leaves a
+        truncated one)."""
+        path = app_path / MANIFEST_FILE
+        tmp = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+        tmp.write_text(json.dumps(asdict(self), indent=2, sort_keys=True))
+        tmp.replace(path)
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.build_key
+
+    def compute_build_key(self, workers: Mapping[str, str]) -> str:
+        """Compute the key of the build from the commit, the build inputs
+        and the build commands of the Procfile."""
+        digest = hashlib.sha256(self.commit.encode())
+        for name, value in sorted(self.inputs.items()):
+            digest.update(f"\0{name}\0{value}".encode())
+        for name in BUILD_WORKERS:
+            digest.update(f"\0{name}\0{workers.get(name, '')}".encode())
+        return digest.hexdigest()
+
+    def is_built(self, build_key: str, app_path: Path) -> bool:
+        """Check if the last build had this key, and its outputs are still
+        there."""
+        if not self.build_key or build_key != self.build_key:
+            return False
+        return all((app_path / output).exists() for output in self.outputs)
+
+
+def hash_inputs(app_path: Path) -> dict[str, str]:
+    """Hash the build inputs of the app (the lockfiles found in its sources,
+    and the settings of its ENV file read by the build)."""
+    src_path = app_path / "src"
+    result = {}
+    for name in BUILD_INPUT_FILES:
+        path = src_path / name
+        if path.is_file():
+            result[f"src/{name}"] = hashlib.sha256(path.read_bytes()).hexdigest()
+
+    env = parse_settings(app_path / "ENV")
+    keys = [*BUILD_ENV_KEYS, BUILD_ENV_SETTING]
+    keys += env.get(BUILD_ENV_SETTING, "").replace(",", " ").split()
+    settings = {key: env[key] for key in keys if key in env}
+    if settings:
+        data = json.dumps(settings, sort_keys=True).encode()
+        result["ENV"] = hashlib.sha256(data).hexdigest()
+    return result
+
+
+def get_commit(src_path: Path) -> str:
+    """Return the commit checked out in the sources ("" if not a git
+    checkout)."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=src_path,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+    return result.stdout.strip()
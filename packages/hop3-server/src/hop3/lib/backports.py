@@ -6,13 +6,22 @@
 from __future__ import annotations
 
 import os
+import threading
 from contextlib import AbstractContextManager
 from pathlib import Path
 
+# The working directory is process-wide: concurrent users of `chdir` (e.g.
+# builds running in parallel threads) are serialized.
+_chdir_lock = threading.RLock()
+
 
 class chdir(AbstractContextManager):  # noqa: N801
     """Non thread-safe context manager to change the current working directory.
 
+    Threads using it are serialized, but other threads still see the changed
+    directory: code which can run concurrently should pass an explicit `cwd`
+    to subprocesses instead.
+
     This context manager is used to temporarily change the current working
     directory to a specified path and then revert back to the original
     directory upon exiting the context.
@@ -38,6 +47,7 @@ class chdir(AbstractContextManager):  # noqa: N801
         self._old_cwd: list[Path] = []
 
     def __enter__(self) -> None:
+        _chdir_lock.acquire()
         try:
             # Save the current working directory to revert back later
             self._old_cwd.append(Path().absolute())
@@ -45,7 +55,13 @@ class chdir(AbstractContextManager):  # noqa: N801
             # Handle any OS-related errors gracefully
             print(f"Ignoring error in chdir() enter:\n{e}")
         # Change to the new directory
-        os.chdir(self.path)
+        try:
+            os.chdir(self.path)
+        except BaseException:
+            if self._old_cwd:
+                self._old_cwd.pop()
+            _chdir_lock.release()
+            raise
 
     def __exit__(self, *_excinfo) -> None:
         try:
@@ -54,3 +70,5 @@ class chdir(AbstractContextManager):  # noqa: N801
         except (OSError, IndexError) as e:
             # Handle errors during the directory change or list pop operation
             print(f"Ignoring error in chdir() exit:\n{e}")
+        finally:
+            _chdir_lock.release()
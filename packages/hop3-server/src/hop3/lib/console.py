@@ -18,23 +18,31 @@ __all__ = [
     "dim",
     "echo",
     "error",
+    "get_output_sink",
     "green",
     "info",
     "log",
     "magenta",
     "panic",
     "red",
+    "redirect_output",
     "success",
     "warning",
     "yellow",
 ]
 
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
 from os import environ
+from typing import TYPE_CHECKING
 
 from attrs import field, frozen
 from termcolor import colored
 
+if TYPE_CHECKING:
+    from collections.abc import Callable, Generator
+
 # TODO ?
 # "light_grey": 37,
 # "dark_grey": 90,
@@ -162,7 +170,36 @@ def get_console() -> Console:
 
 
 console = get_console()
-echo = console.echo
+
+# When set, console output is sent to this callable instead of the console
+# (e.g. to stream the output of a command to the client).
+_output_sink: ContextVar[Callable[[str], None] | None] = ContextVar(
+    "output_sink", default=None
+)
+
+
+@contextmanager
+def redirect_output(sink: Callable[[str], None]) -> Generator[None]:
+    """Send the console output of the current thread (or task) to `sink`."""
+    token = _output_sink.set(sink)
+    try:
+        yield
+    finally:
+        _output_sink.reset(token)
+
+
+def get_output_sink() -> Callable[[str], None] | None:
+    """Return the current output sink, if the output is redirected."""
+    return _output_sink.get()
+
+
+def echo(msg, fg: str = "") -> None:
+    """Print message to the console (or to the current output sink)."""
+    sink = _output_sink.get()
+    if sink is not None:
+        sink(str(msg))
+    else:
+        console.echo(msg, fg=fg)
 
 
 def log(msg: str, level=0, fg="green") -> None:
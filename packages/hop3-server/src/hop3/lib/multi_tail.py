@@ -2,15 +2,80 @@
 # Cf. https://stackoverflow.com/questions/5725051/tail-multiple-logfiles-in-python
 from __future__ import annotations
 
+import os
 import time
-from collections import deque
 from dataclasses import dataclass, field
+from functools import cached_property
 from pathlib import Path
 from typing import TYPE_CHECKING, TextIO
 
+from .inotify import (
+    IN_CREATE,
+    IN_DELETE_SELF,
+    IN_IGNORED,
+    IN_MODIFY,
+    IN_MOVE_SELF,
+    IN_MOVED_TO,
+    IN_Q_OVERFLOW,
+    Inotify,
+)
+
 if TYPE_CHECKING:
     from collections.abc import Iterator
 
+# Events watched on the files, and on their directories (to detect the
+# creation of a new file after a rotation)
+FILE_EVENTS = IN_MODIFY | IN_MOVE_SELF | IN_DELETE_SELF
+DIR_EVENTS = IN_CREATE | IN_MOVED_TO
+
+# Size of the blocks read backwards from the end of the files
+BLOCK_SIZE = 64 * 1024
+
+
+def tail_lines(path: str | Path, n: int, block_size: int = BLOCK_SIZE) -> list[str]:
+    """Return the last `n` lines of a file.
+
+    The file is read backwards, block by block, from its end until enough
+    lines are found, so the cost depends on the number of lines, not on the
+    size of the file.
+
+    Input:
+    - path: The path of the file.
+    - n: The number of lines to return.
+    - block_size: The size of the blocks read from the file.
+
+    Returns:
+    - The lines (with their line endings, and invalid characters ignored).
+    """
+    if n <= 0:
+        return []
+
+    with Path(path).open("rb") as fd:
+        end = fd.seek(0, os.SEEK_END)
+        pos = end
+        blocks: list[bytes] = []
+        newlines = 0
+        # As many newlines as lines are needed (the last one ending the line
+        # before them), unless the start of the file is reached. A final
+        # newline doesn't start a new line.
+        while pos > 0 and newlines < n:
+            size = min(block_size, pos)
+            pos -= size
+            fd.seek(pos)
+            block = fd.read(size)
+            if pos + size == end and block.endswith(b"\n"):
+                newlines -= 1
+            newlines += block.count(b"\n")
+            blocks.append(block)
+
+    text = b"".join(reversed(blocks)).decode(errors="ignore")
+    lines = [line + "\n" for line in text.split("\n")]
+    # Without its final newline (if any)
+    last = lines.pop()[:-1]
+    if last:
+        lines.append(last)
+    return lines[-n:]
+
 
 @dataclass(frozen=True)
 class MultiTail:
@@ -29,6 +94,15 @@ class MultiTail:
     # Open file handles
     handles: dict[Path, TextIO] = field(default_factory=dict)
 
+    # Incomplete last lines, by path
+    partial: dict[Path, str] = field(default_factory=dict)
+
+    # Use inotify if available (polling otherwise)
+    use_inotify: bool = True
+
+    # Delay between two checks, when polling
+    poll_interval: float = 1
+
     def __post_init__(self):
         for filename in self.filenames:
             path = Path(filename)
@@ -54,41 +128,131 @@ class MultiTail:
         """Generate an iterator of formatted lines from multiple file paths.
 
         Iterates over each file path specified in the self.paths attribute,
-        reads lines using a deque to handle a fixed number of recent lines (specified by self.catch_up),
+        reads the last lines of each file (at most self.catch_up),
         and yields formatted lines using the self.format_line() method.
 
         Returns:
         - An iterator that yields formatted lines from the files.
         """
         for path in self.paths:
-            # Open the file, ignoring errors, and use a deque to process the last 'catch_up' lines
-            for line in deque(path.open(errors="ignore"), self.catch_up):
+            # Only the end of the file is read
+            for line in tail_lines(path, self.catch_up):
                 yield self.format_line(path, line)
 
     def follow(self) -> Iterator:
         """Continuously monitor log files for new entries and yields formatted
         lines.
 
+        Files are watched with inotify when available: the cost is then
+        close to zero while no line is written. Otherwise, they are polled.
+
         Returns:
         - An iterator that yields formatted lines from updated log files.
         """
+        inotify = Inotify.create() if self.use_inotify else None
+        if inotify is None:
+            yield from self._poll()
+            return
+
+        try:
+            yield from self._follow_inotify(inotify)
+        finally:
+            inotify.close()
+
+    def _follow_inotify(self, inotify: Inotify) -> Iterator:
+        watches: dict[int, Path] = {}
+        dir_watches: dict[int, Path] = {}
+        for path in self.paths:
+            watches[inotify.add_watch(path, FILE_EVENTS)] = path
+            dir_wd = inotify.add_watch(path.parent, DIR_EVENTS)
+            dir_watches[dir_wd] = path.parent
+
+        # Lines written before the watches were added
+        for path in self.paths:
+            yield from self._read_lines(path)
+
+        while self.paths:
+            changed: list[Path] = []
+            for event in inotify.read():
+                if event.mask & IN_Q_OVERFLOW:
+                    # Events were lost: check all the files
+                    changed += self.paths
+                elif event.wd in dir_watches:
+                    path = dir_watches[event.wd] / event.name
+                    if path in self.handles and self._is_rotated(path):
+                        # New file after a rotation: read the end of the old
+                        # one, then follow the new one from its start
+                        yield from self._read_lines(path)
+                        for wd in [wd for wd, p in watches.items() if p == path]:
+                            inotify.remove_watch(wd)
+                            del watches[wd]
+                        self._reopen(path)
+                        watches[inotify.add_watch(path, FILE_EVENTS)] = path
+                        changed.append(path)
+                elif event.wd in watches:
+                    path = watches[event.wd]
+                    if event.mask & IN_IGNORED:
+                        del watches[event.wd]
+                    elif event.mask & IN_DELETE_SELF:
+                        yield from self._read_lines(path)
+                        self.paths.remove(path)
+                        self.handles.pop(path).close()
+                    elif event.mask & IN_MODIFY:
+                        changed.append(path)
+                    # IN_MOVE_SELF: the file keeps being read until a new
+                    # one is created
+
+            # All the lines available in each file are read at once
+            for path in dict.fromkeys(changed):
+                if path in self.handles:
+                    yield from self._read_lines(path)
+
+    def _poll(self) -> Iterator:
         while True:
             for path in self.paths:
-                line = self._peek(self.handles[path])
-                if line:
-                    yield self.format_line(path, line)
+                yield from self._read_lines(path)
 
             # Pause iteration to avoid busy-waiting
-            time.sleep(1)
+            time.sleep(self.poll_interval)
             # Check and handle log file rotation
             self._check_log_rotation()
 
+    def _read_lines(self, path: Path) -> Iterator:
+        """Yield the complete lines appended to the file since the last
+        read."""
+        data = self.handles[path].read()
+        if not data:
+            return
+        lines = (self.partial.pop(path, "") + data).splitlines(keepends=True)
+        if not lines[-1].endswith("\n"):
+            self.partial[path] = lines.pop()
+        for line in lines:
+            yield self.format_line(path, line)
+
+    def _is_rotated(self, path: Path) -> bool:
+        try:
+            return path.stat().st_ino != self.inodes[path]
+        except OSError:
+            return False
+
+    def _reopen(self, path: Path) -> None:
+        """Reopen the file (from its start), e.g. after a rotation."""
+        self.handles[path].close()
+        self.handles[path] = path.open()
+        self.inodes[path] = path.stat().st_ino
+        self.partial.pop(path, None)
+
     def longest_stem(self) -> int:
         """Calculate the length of the longest stem in a list of paths.
 
         Returns:
             int: The length of the longest stem found in the paths.
         """
+        return self._stem_width
+
+    @cached_property
+    def _stem_width(self) -> int:
+        # Computed once (the set of files can only shrink)
         return max(len(path.stem) for path in self.paths)
 
     def format_line(self, path: Path, line: str) -> str:
@@ -105,15 +269,6 @@ class MultiTail:
         # and appending the line with a separator.
         return f"{path.stem.ljust(self.longest_stem())} | {line}"
 
-    @staticmethod
-    def _peek(handle):
-        where = handle.tell()
-        line = handle.readline()
-        if not line:
-            handle.seek(where)
-            return None
-        return line
-
     def _check_log_rotation(self):
         """Checks and handles log file rotation by reopening files if their
         inode has changed.
@@ -124,13 +279,12 @@ class MultiTail:
         If the path no longer exists, it removes the path from the list
         of monitored paths.
         """
-        for path in self.paths:
+        for path in list(self.paths):
             if path.exists():
                 # Check if the inode of the path has changed
                 if path.stat().st_ino != self.inodes[path]:
                     # Reopen the file and update the inode information
-                    self.handles[path] = path.open()
-                    self.inodes[path] = path.stat().st_ino
+                    self._reopen(path)
             else:
                 # Remove path from monitored list if it no longer exists
                 self.paths.remove(path)
@@ -5,10 +5,9 @@
 from __future__ import annotations
 
 import os
-from typing import TYPE_CHECKING
+from pathlib import Path
 
-if TYPE_CHECKING:
-    from pathlib import Path
+__all__ = ["prepend_to_path", "write_if_changed"]
 
 
 def prepend_to_path(directories: list[Path | str], path: str = "") -> str:
@@ -33,3 +32,27 @@ def prepend_to_path(directories: list[Path | str], path: str = "") -> str:
         new_path.append(directory)
     new_path.extend(current_path)
     return ":".join(new_path)
+
+
+def write_if_changed(path: Path | str, content: str) -> bool:
+    """Write a file, unless it already has the given content.
+
+    The file is replaced atomically (temp file, then rename), so that a
+    watcher (the uwsgi emperor, nginx) never sees it half written, and it is
+    not touched at all when unchanged, so that the watcher doesn't reload it.
+
+    Returns:
+    - True if the file was written.
+    """
+    path = Path(path)
+    data = content.encode()
+    try:
+        if path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        pass
+
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_bytes(data)
+    tmp_path.replace(path)
+    return True
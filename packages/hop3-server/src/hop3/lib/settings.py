@@ -6,6 +6,7 @@
 
 from __future__ import annotations
 
+import re
 from pathlib import Path
 from typing import TYPE_CHECKING
 
@@ -38,14 +39,20 @@ def parse_settings(
     Returns:
     - A dictionary containing the environment variables parsed from the file.
     """
-    if env is None:
-        env = {}
-
     path = Path(filename)
     if not path.exists():
         return {}
 
-    settings = path.read_text()
+    return parse_settings_text(path.read_text(), env)
+
+
+def parse_settings_text(
+    settings: str,
+    env: dict[str, str] | None = None,
+) -> dict[str, str]:
+    """Parse the content of a settings file (see `parse_settings`)."""
+    if env is None:
+        env = {}
 
     for line in settings.split("\n"):
         # Ignore comments and newlines
@@ -65,3 +72,15 @@ def parse_settings(
             return {}
 
     return env
+
+
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+
+
+def parse_size(value: str) -> int:
+    """Parse a size such as "500M" or "5G" (in bytes)."""
+    m = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)B?\s*", value.upper())
+    if not m:
+        msg = f"Invalid size: {value!r}"
+        raise ValueError(msg)
+    return int(float(m.group(1)) * SIZE_UNITS[m.group(2)])
@@ -12,6 +12,11 @@ from typing import Any
 
 import attr
 
+from hop3.core.capabilities import get_binary, get_host_capabilities
+
+# The OS release (for `lsb_release`)
+OS_RELEASE = "/etc/os-release"
+
 
 def cache(timeout):
     """Decorator to cache the result of a function with a specified timeout.
@@ -91,11 +96,11 @@ class SysInfo:
 
     @cache(60)
     def system_arch(self) -> str:
-        return self._run_command("dpkg --print-architecture")
+        return self._probe("dpkg --print-architecture")
 
     @cache(60)
     def system_virt(self) -> str:
-        return self._run_command("systemd-detect-virt || true")
+        return self._probe("systemd-detect-virt || true", per_boot=True)
 
     @cache(60)
     def distrib_codename(self) -> str:
@@ -161,7 +166,7 @@ class SysInfo:
     @cache(3600)
     def get_cpu_core(self) -> str:
         try:
-            result = self._run_command("lscpu | grep socket:")
+            result = self._probe("lscpu | grep socket:", per_boot=True)
             return result.split(":")[1].strip(" ").strip("\\n'") if result else ""
         except Exception:
             return ""
@@ -172,7 +177,7 @@ class SysInfo:
     @cache(3600)
     def get_hd_size(self) -> str:
         try:
-            result = self._run_command("sudo lshw -class disk | grep size")
+            result = self._probe("sudo lshw -class disk | grep size", per_boot=True)
             return result.split("(", 1)[1].split(")")[0] if result else ""
         except Exception:
             return ""
@@ -180,8 +185,9 @@ class SysInfo:
     @cache(3600)
     def get_hd_type(self) -> str:
         try:
-            result = self._run_command(
-                "sudo lshw -class disk -class storage | grep description"
+            result = self._probe(
+                "sudo lshw -class disk -class storage | grep description",
+                per_boot=True,
             )
             return result.split("\\n")[0].split(":")[1].strip(" ") if result else ""
         except Exception:
@@ -192,15 +198,17 @@ class SysInfo:
     #
     @cache(3600)
     def get_manufacturer(self) -> str:
-        return self._run_command("sudo dmidecode -s system-manufacturer")[2:-3]
+        return self._probe("sudo dmidecode -s system-manufacturer", per_boot=True)[2:-3]
 
     @cache(3600)
     def get_model(self) -> str:
-        return self._run_command("sudo dmidecode -s system-product-name")[2:-3]
+        return self._probe("sudo dmidecode -s system-product-name", per_boot=True)[2:-3]
 
     @cache(3600)
     def get_serial_number(self) -> str:
-        return self._run_command("sudo dmidecode -s system-serial-number")[2:-3]
+        return self._probe("sudo dmidecode -s system-serial-number", per_boot=True)[
+            2:-3
+        ]
 
     #
     # RAM
@@ -209,7 +217,7 @@ class SysInfo:
     def get_ram_type(self) -> str:
         try:
             cmd = 'sudo dmidecode --type 17 | grep -B 2 "Type Detail: Synchronous" | grep -w "Type:"'
-            result = self._run_command(cmd)
+            result = self._probe(cmd, per_boot=True)
             return result.split("\tType:")[1].strip(" ").strip("\n") if result else ""
         except Exception:
             return ""
@@ -238,7 +246,18 @@ class SysInfo:
         - A string containing the LSB release information corresponding to the given key.
         """
         # Executes the 'lsb_release' command with specified key and returns its output
-        return self._run_command(f"lsb_release -s{key}")
+        return self._probe(f"lsb_release -s{key}", depends=[OS_RELEASE])
+
+    def _probe(self, cmd, depends=(), *, per_boot=False) -> str:
+        """Run a command whose output only changes with the host (see
+        `hop3.core.capabilities`), or return its cached output."""
+        return get_host_capabilities().probe(
+            f"sysinfo:{cmd}",
+            lambda: self._run_command(cmd),
+            binary=get_binary(cmd),
+            depends=depends,
+            per_boot=per_boot,
+        )
 
     def _run_command(self, cmd) -> str:
         """Executes a shell command and returns its standard output.
@@ -13,10 +13,13 @@ if TYPE_CHECKING:
     from collections.abc import Mapping
 
 PATTERN = r"\$(\w+|\{([^}]*)\})"
+PATTERN_RE = re.compile(PATTERN)
 
 
 def expand_vars(template, env: Mapping[str, Any], default=None):
     """Simple shell-style string interpolation."""
+    if "$" not in template:
+        return template
 
     def replace_var(match):
         return env.get(
@@ -24,4 +27,4 @@ def expand_vars(template, env: Mapping[str, Any], default=None):
             match.group(0) if default is None else default,
         )
 
-    return re.sub(PATTERN, replace_var, template)
+    return PATTERN_RE.sub(replace_var, template)
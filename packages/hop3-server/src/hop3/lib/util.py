@@ -5,21 +5,24 @@
 
 from __future__ import annotations
 
+import http.client
 import os
 import shutil
+import struct
 import subprocess
 import sys
+import time
 from pathlib import Path
-from socket import AF_INET, SOCK_STREAM, socket
+from socket import AF_INET, AF_UNIX, SOCK_STREAM, socket
 from subprocess import STDOUT, check_output
 from typing import TYPE_CHECKING
 
 from hop3.lib.multi_tail import MultiTail
 
-from .console import dim, log
+from .console import dim, echo, get_output_sink, log
 
 if TYPE_CHECKING:
-    from collections.abc import Iterator
+    from collections.abc import Iterator, Mapping
 
 
 def shell(command: str, cwd: Path | str = "", **kwargs) -> subprocess.CompletedProcess:
@@ -29,20 +32,45 @@ def shell(command: str, cwd: Path | str = "", **kwargs) -> subprocess.CompletedP
     else:
         cwd = Path.cwd()
 
-    print(dim(f"Calling: '{command}' in directory: '{cwd}'"))
-    sys.stdout.flush()
+    sink = get_output_sink()
+    if sink is None:
+        print(dim(f"Calling: '{command}' in directory: '{cwd}'"))
+        sys.stdout.flush()
+    else:
+        echo(f"Calling: '{command}' in directory: '{cwd}'")
 
     kwargs["shell"] = True
     if cwd:
         kwargs["cwd"] = str(cwd)
-    return subprocess.run(command, **kwargs, check=True)
-
 
-def check_binaries(binaries) -> bool:
+    if sink is None or "stdout" in kwargs or "capture_output" in kwargs:
+        return subprocess.run(command, **kwargs, check=True)
+
+    # The output is redirected (e.g. streamed to the client): forward it
+    # line by line, as it is produced.
+    with subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        errors="replace",
+        **kwargs,
+    ) as process:
+        assert process.stdout
+        for line in process.stdout:
+            sink(line.rstrip("\n"))
+
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, command)
+    return subprocess.CompletedProcess(command, process.returncode)
+
+
+def check_binaries(binaries, path: str | None = None) -> bool:
     """Check if all the binaries exist and are executable.
 
     Args:
         binaries (list of str): A list of binary names to check for existence and executability.
+        path (str, optional): The search path (defaults to the PATH of the process).
 
     Returns:
         bool: True if all binaries are found and executable, False otherwise.
@@ -50,7 +78,13 @@ def check_binaries(binaries) -> bool:
     log(f"Checking requirements: {binaries}", level=3, fg="green")
 
     # Use shutil.which to determine if the binary exists and is executable
-    requirements = [shutil.which(b) for b in binaries]
+    # (cached, for the PATH of the process)
+    if path is None:
+        from hop3.core.capabilities import get_host_capabilities
+
+        requirements = [get_host_capabilities().which(b) for b in binaries]
+    else:
+        requirements = [shutil.which(b, path=path) for b in binaries]
 
     # Return True if all binaries are found, otherwise False
     return all(requirements)
@@ -94,19 +128,154 @@ def get_free_port(address="") -> int:
     return port
 
 
-def command_output(cmd) -> str:
+def wait_for_listener(address: str, timeout: float = 60) -> bool:
+    """Wait until a server accepts connections on the given address.
+
+    Input:
+    - address (str): "host:port", or "unix://<path>" for a Unix socket (the
+      format used by nginx for upstream servers).
+    - timeout (float): How long to wait, in seconds.
+
+    Returns:
+    - bool: True if a connection could be made before the timeout.
+    """
+    if address.startswith("unix://"):
+        family, target = AF_UNIX, address.removeprefix("unix://")
+    else:
+        host, _, port = address.rpartition(":")
+        family, target = AF_INET, (host.strip("[]") or "127.0.0.1", int(port))
+
+    deadline = time.monotonic() + timeout
+    while True:
+        with socket(family, SOCK_STREAM) as s:
+            s.settimeout(1)
+            try:
+                s.connect(target)
+            except OSError:
+                pass
+            else:
+                return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.1)
+
+
+def get_http_status(address: str, path: str = "/", timeout: float = 5) -> int:
+    """Send a GET request to a server, and return the status of its
+    response.
+
+    Input:
+    - address (str): "host:port" (HTTP), or "unix://<path>" (a uwsgi socket,
+      spoken to with the uwsgi protocol).
+    - path (str): The path of the request.
+    - timeout (float): How long to wait for the response, in seconds.
+
+    Returns:
+    - int: The HTTP status, or 0 if the request failed.
+    """
+    if address.startswith("unix://"):
+        get_status = _get_uwsgi_status
+        address = address.removeprefix("unix://")
+    else:
+        get_status = _get_http_status
+    try:
+        return get_status(address, path, timeout)
+    except (OSError, ValueError, http.client.HTTPException):
+        return 0
+
+
+def _get_http_status(address: str, path: str, timeout: float) -> int:
+    host, _, port = address.rpartition(":")
+    connection = http.client.HTTPConnection(
+        host.strip("[]") or "127.0.0.1", int(port), timeout=timeout
+    )
+    try:
+        connection.request("GET", path, headers={"Host": "localhost"})
+        return connection.getresponse().status
+    finally:
+        connection.close()
+
+
+def _get_uwsgi_status(socket_path: str, path: str, timeout: float) -> int:
+    uri, _, query = path.partition("?")
+    variables = {
+        "REQUEST_METHOD": "GET",
+        "REQUEST_URI": path,
+        "PATH_INFO": uri,
+        "QUERY_STRING": query,
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80",
+        "HTTP_HOST": "localhost",
+        "REMOTE_ADDR": "127.0.0.1",
+    }
+    body = b""
+    for key, value in variables.items():
+        for item in (key.encode(), value.encode()):
+            body += struct.pack("<H", len(item)) + item
+    # Header: modifier1 (0: WSGI request), size of the variables, modifier2
+    packet = struct.pack("<BHB", 0, len(body), 0) + body
+
+    with socket(AF_UNIX, SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(socket_path)
+        s.sendall(packet)
+        response = b""
+        while b"\n" not in response:
+            chunk = s.recv(4096)
+            if not chunk:
+                break
+            response += chunk
+    # E.g. "HTTP/1.1 200 OK"
+    status_line = response.split(b"\n", 1)[0].split()
+    if len(status_line) < 2 or not status_line[1].isdigit():
+        return 0
+    return int(status_line[1])
+
+
+def wait_until_healthy(address: str, timeout: float = 60, path: str = "") -> bool:
+    """Wait until a server answers requests.
+
+    Input:
+    - address (str): The address of the server (see `get_http_status`).
+    - timeout (float): How long to wait, in seconds.
+    - path (str): The path of a health check, which must answer with a
+      success (or a redirect). If not set, any response to "/" which is
+      not a server error will do.
+
+    Returns:
+    - bool: True if the server answered before the timeout.
+    """
+    deadline = time.monotonic() + timeout
+    if not wait_for_listener(address, timeout):
+        return False
+    while True:
+        remaining = max(deadline - time.monotonic(), 0.1)
+        status = get_http_status(address, path or "/", min(remaining, 5))
+        if path and 200 <= status < 400:
+            return True
+        if not path and 0 < status < 500:
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.5)
+
+
+def command_output(cmd, env: Mapping[str, str] | None = None) -> str:
     """Execute a shell command and retrieve its output as a string.
 
     Input:
         cmd: A string representing the shell command to execute.
+        env: The environment of the command (defaults to the environment of
+            the process).
 
     Returns:
         A string containing the output from the executed command.
         If the command fails or there is no output, an empty string is returned.
     """
     try:
-        # Capture the current environment variables
-        env = os.environ
+        if env is None:
+            env = os.environ
         return str(check_output(cmd, stderr=STDOUT, env=env, shell=True))
     except Exception:
         return ""
@@ -0,0 +1,29 @@
+# Copyright (c) 2025, Abilian SAS
+#
+# SPDX-License-Identifier: Apache-2.0
+"""Log ingestion and queries.
+
+The logs written by the uwsgi workers of an app (`log/<kind>.<n>.log`, or
+`log/<kind>.<n>.<generation>.log` for blue/green deploys) are parsed (see
+`parser`) and stored in compact columnar segments, indexed by time (see
+`store`), so they can be queried by time range, status or text without
+scanning the (rotated) text files. They are also aggregated into
+request metrics (latency, throughput, statuses; see `metrics`).
+"""
+
+from __future__ import annotations
+
+from .metrics import AppMetrics, format_prometheus, get_app_metrics
+from .parser import AccessRecord, parse_access_line, parse_since, parse_status
+from .store import LogStore
+
+__all__ = [
+    "AccessRecord",
+    "AppMetrics",
+    "LogStore",
+    "format_prometheus",
+    "get_app_metrics",
+    "parse_access_line",
+    "parse_since",
+    "parse_status",
+]
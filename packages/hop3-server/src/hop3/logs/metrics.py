@@ -0,0 +1,301 @@
+# Copyright (c) 2025, Abilian SAS
+#
+# SPDX-License-Identifier: Apache-2.0
+"""Request metrics of the apps, from the access logs of their workers.
+
+The new lines of the logs are read incrementally (see `AppMetrics.update()`)
+and aggregated, per worker, in a rolling window made of fixed time slots.
+Durations are counted in log-linear histograms (HDR-style), so memory use
+is constant, whatever the traffic.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from hop3 import config as c
+
+from .parser import parse_access_line
+from .reader import read_new_lines, seek_tail
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+__all__ = [
+    "STATUS_CLASSES",
+    "AppMetrics",
+    "LatencyHistogram",
+    "RollingStats",
+    "Stats",
+    "format_prometheus",
+    "get_app_metrics",
+]
+
+# Buckets per power of 2 (i.e. a relative error below 1/16)
+SUB_BUCKETS = 16
+MAX_VALUE = 2**32 - 1
+
+# Bytes read from the end of a log file seen for the first time
+INITIAL_READ = 4 * 1024 * 1024
+READ_CHUNK = 16 * 1024 * 1024
+
+STATUS_CLASSES = ["1xx", "2xx", "3xx", "4xx", "5xx"]
+
+
+class LatencyHistogram:
+    """Histogram of durations (in ms), with a constant size.
+
+    Values below `SUB_BUCKETS` are counted exactly, then each power of 2
+    is split in `SUB_BUCKETS` buckets.
+    """
+
+    __slots__ = ("count", "counts", "sum")
+
+    def __init__(self) -> None:
+        self.counts = [0] * NUM_BUCKETS
+        self.count = 0
+        self.sum = 0
+
+    @staticmethod
+    def bucket(value: int) -> int:
+        value = min(max(value, 0), MAX_VALUE)
+        if value < SUB_BUCKETS:
+            return value
+        shift = value.bit_length() - SUB_BUCKETS.bit_length()
+        return (shift + 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+    @staticmethod
+    def bucket_value(index: int) -> float:
+        """The middle of the range of values of a bucket."""
+        if index < SUB_BUCKETS:
+            return index
+        shift, sub = divmod(index, SUB_BUCKETS)
+        low = (SUB_BUCKETS + sub) << (shift - 1)
+        return low + ((1 << (shift - 1)) - 1) / 2
+
+    def record(self, value: int) -> None:
+        self.counts[self.bucket(value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other: LatencyHistogram) -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts, strict=True)]
+        self.count += other.count
+        self.sum += other.sum
+
+    def percentile(self, q: float) -> float:
+        """The value below which a fraction `q` of the values are."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return self.bucket_value(index)
+        return self.bucket_value(len(self.counts) - 1)
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+
+NUM_BUCKETS = LatencyHistogram.bucket(MAX_VALUE) + 1
+
+
+@dataclass
+class Stats:
+    """Counters of the requests of a period."""
+
+    requests: int = 0
+    bytes: int = 0
+    statuses: list[int] = field(default_factory=lambda: [0] * len(STATUS_CLASSES))
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+    def record(self, status: int, size: int, msecs: int) -> None:
+        self.requests += 1
+        self.bytes += size
+        if 100 <= status < 600:
+            self.statuses[status // 100 - 1] += 1
+        self.latency.record(msecs)
+
+    def merge(self, other: Stats) -> None:
+        self.requests += other.requests
+        self.bytes += other.bytes
+        self.statuses = [
+            a + b for a, b in zip(self.statuses, other.statuses, strict=True)
+        ]
+        self.latency.merge(other.latency)
+
+    def get_status_counts(self) -> dict[str, int]:
+        return dict(zip(STATUS_CLASSES, self.statuses, strict=True))
+
+
+class RollingStats:
+    """Stats of the last `window` seconds (by slots of `resolution` seconds),
+    and since the start."""
+
+    def __init__(self, window: int, resolution: int) -> None:
+        self.window = window
+        self.resolution = resolution
+        size = max(1, window // resolution)
+        self.slots = [Stats() for _ in range(size)]
+        self.slot_ids = [-1] * size
+        self.totals = Stats()
+
+    def record(self, ts: float, status: int, size: int, msecs: int) -> None:
+        self.totals.record(status, size, msecs)
+
+        slot_id = int(ts // self.resolution)
+        i = slot_id % len(self.slots)
+        if slot_id < self.slot_ids[i]:
+            # Older than the window
+            return
+        if slot_id > self.slot_ids[i]:
+            self.slots[i] = Stats()
+            self.slot_ids[i] = slot_id
+        self.slots[i].record(status, size, msecs)
+
+    def snapshot(self, now: float) -> Stats:
+        """The stats of the window ending at `now`."""
+        last = int(now // self.resolution)
+        first = last - len(self.slots) + 1
+        result = Stats()
+        for slot, slot_id in zip(self.slots, self.slot_ids, strict=True):
+            if first <= slot_id <= last:
+                result.merge(slot)
+        return result
+
+
+class AppMetrics:
+    """Request metrics of the workers of an app."""
+
+    def __init__(
+        self,
+        log_path: Path,
+        window: int | None = None,
+        resolution: int = 10,
+    ) -> None:
+        self.log_path = log_path
+        self.window = window or c.METRICS_WINDOW
+        self.resolution = resolution
+        self.workers: dict[str, RollingStats] = {}
+        self._files: dict[str, dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def update(self) -> None:
+        """Aggregate the new lines of the logs."""
+        if not self.log_path.exists():
+            return
+        with self._lock:
+            for path in sorted(self.log_path.glob("*.*.log")):
+                # Only the lines of the last minutes are needed
+                seek_tail(path, self._files, INITIAL_READ)
+                while lines := read_new_lines(path, self._files, READ_CHUNK):
+                    self._record(path.stem, lines)
+
+    def _record(self, worker: str, lines: list[str]) -> None:
+        if worker not in self.workers:
+            self.workers[worker] = RollingStats(self.window, self.resolution)
+        stats = self.workers[worker]
+        for line in lines:
+            if record := parse_access_line(line):
+                stats.record(record.timestamp, record.status, record.size, record.msecs)
+
+    def snapshot(self, now: float | None = None) -> dict[str, Stats]:
+        """The stats of the last `window` seconds, per worker."""
+        if now is None:
+            now = time.time()
+        with self._lock:
+            return {
+                worker: stats.snapshot(now)
+                for worker, stats in sorted(self.workers.items())
+            }
+
+    def get_totals(self) -> dict[str, Stats]:
+        """The stats since the start (of the server), per worker."""
+        with self._lock:
+            return {
+                worker: stats.totals for worker, stats in sorted(self.workers.items())
+            }
+
+
+# The metrics of each app, kept for the whole process
+_app_metrics: dict[str, AppMetrics] = {}
+_lock = threading.Lock()
+
+
+def get_app_metrics(app_name: str, log_path: Path) -> AppMetrics:
+    """The (updated) metrics of an app."""
+    with _lock:
+        if app_name not in _app_metrics:
+            _app_metrics[app_name] = AppMetrics(log_path)
+        metrics = _app_metrics[app_name]
+    metrics.update()
+    return metrics
+
+
+def format_prometheus(apps: dict[str, AppMetrics], now: float | None = None) -> str:
+    """Format the metrics of the apps for Prometheus (text format).
+
+    Counters are since the start of the server, the quantiles and rates are
+    those of the rolling window.
+    """
+    if now is None:
+        now = time.time()
+
+    requests, size, duration, duration_sum, duration_count, rps = ([] for _ in range(6))
+    for app_name, metrics in sorted(apps.items()):
+        window = metrics.snapshot(now)
+        for worker, totals in metrics.get_totals().items():
+            labels = f'app="{escape(app_name)}",worker="{escape(worker)}"'
+            for status, count in totals.get_status_counts().items():
+                requests.append(
+                    f'hop3_http_requests_total{{{labels},status="{status}"}} {count}'
+                )
+            size.append(f"hop3_http_response_bytes_total{{{labels}}} {totals.bytes}")
+            stats = window[worker]
+            for q in (0.5, 0.95, 0.99):
+                value = stats.latency.percentile(q) / 1000
+                duration.append(
+                    f"hop3_http_request_duration_seconds"
+                    f'{{{labels},quantile="{q}"}} {value}'
+                )
+            duration_sum.append(
+                f"hop3_http_request_duration_seconds_sum{{{labels}}}"
+                f" {totals.latency.sum / 1000}"
+            )
+            duration_count.append(
+                f"hop3_http_request_duration_seconds_count{{{labels}}}"
+                f" {totals.latency.count}"
+            )
+            rps.append(
+                f"hop3_http_requests_per_second{{{labels}}}"
+                f" {stats.requests / metrics.window}"
+            )
+
+    lines = [
+        "# HELP hop3_http_requests_total Requests handled by the workers.",
+        "# TYPE hop3_http_requests_total counter",
+        *requests,
+        "# HELP hop3_http_response_bytes_total Size of the responses.",
+        "# TYPE hop3_http_response_bytes_total counter",
+        *size,
+        "# HELP hop3_http_request_duration_seconds Duration of the requests.",
+        "# TYPE hop3_http_request_duration_seconds summary",
+        *duration,
+        *duration_sum,
+        *duration_count,
+        "# HELP hop3_http_requests_per_second Requests per second (rolling window).",
+        "# TYPE hop3_http_requests_per_second gauge",
+        *rps,
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
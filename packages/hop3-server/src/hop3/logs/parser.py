@@ -0,0 +1,135 @@
+# Copyright (c) 2025, Abilian SAS
+#
+# SPDX-License-Identifier: Apache-2.0
+"""Parsers for the uwsgi access logs, and for the query parameters."""
+
+from __future__ import annotations
+
+import calendar
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+__all__ = ["AccessRecord", "parse_access_line", "parse_since", "parse_status"]
+
+# The `log_format` of `WsgiWorker` and `WebWorker`:
+# %(addr) - %(user) [%(ltime)] "%(method) %(uri) %(proto)" %(status) %(size)
+# "%(referer)" "%(uagent)" %(msecs)ms
+ACCESS_LOG_REGEXP = re.compile(
+    r"(?P<addr>\S+) - \S* \[(?P<ltime>[^\]]+)\] "
+    r'"(?P<method>\S+) (?P<uri>\S*)(?: [^"]*)?" '
+    r"(?P<status>\d{3}) (?P<size>\d+) "
+    r'".*" (?P<msecs>\d+)ms$'
+)
+
+MONTHS = {
+    name: i
+    for i, name in enumerate(
+        [
+            "Jan",
+            "Feb",
+            "Mar",
+            "Apr",
+            "May",
+            "Jun",
+            "Jul",
+            "Aug",
+            "Sep",
+            "Oct",
+            "Nov",
+            "Dec",
+        ],
+        start=1,
+    )
+}
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+
+@dataclass(frozen=True)
+class AccessRecord:
+    """A parsed access log line."""
+
+    timestamp: float
+    addr: str
+    method: str
+    uri: str
+    status: int
+    size: int
+    msecs: int
+
+
+def parse_access_line(line: str) -> AccessRecord | None:
+    """Parse an access log line (None if it's another kind of line, e.g.
+    something printed by the app)."""
+    m = ACCESS_LOG_REGEXP.match(line.rstrip("\n"))
+    if not m:
+        return None
+    try:
+        timestamp = parse_ltime(m["ltime"])
+    except ValueError:
+        return None
+    return AccessRecord(
+        timestamp=timestamp,
+        addr=m["addr"],
+        method=m["method"],
+        uri=m["uri"],
+        status=int(m["status"]),
+        size=int(m["size"]),
+        msecs=int(m["msecs"]),
+    )
+
+
+def parse_ltime(value: str) -> float:
+    """Parse an Apache style time (e.g. "18/Oct/2025:10:00:00 +0000").
+
+    (Faster than `strptime`, and independent of the locale.)
+    """
+    try:
+        day, month, year, hour, minute, second, offset = re.split(r"[/: ]", value)
+        tz_seconds = int(offset[1:3]) * 3600 + int(offset[3:5]) * 60
+        fields = (int(year), MONTHS[month], int(day), int(hour), int(minute))
+        timestamp = calendar.timegm((*fields, int(second)))
+    except (KeyError, ValueError) as e:
+        msg = f"Invalid time: {value}"
+        raise ValueError(msg) from e
+    return timestamp + (tz_seconds if offset[0] == "-" else -tz_seconds)
+
+
+def parse_since(value: str, now: float | None = None) -> float:
+    """Parse a point in time, either relative (e.g. "90s", "15m", "1h",
+    "2d") or absolute (ISO 8601, e.g. "2025-10-18T10:00").
+
+    Returns:
+        The time, as a timestamp.
+    """
+    if now is None:
+        now = time.time()
+    if m := re.fullmatch(r"(\d+)([smhdw])", value.strip()):
+        return now - int(m[1]) * DURATION_UNITS[m[2]]
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        msg = f"Invalid time or duration: {value} (e.g. 1h, 2025-10-18T10:00)"
+        raise ValueError(msg) from None
+
+
+def parse_status(value: str) -> list[tuple[int, int]]:
+    """Parse a status filter, e.g. "5xx", "404" or "4xx,500".
+
+    Returns:
+        A list of (min, max) ranges of status codes (inclusive).
+    """
+    ranges = []
+    for part in value.split(","):
+        item = part.strip().lower()
+        if re.fullmatch(r"[1-5]xx", item):
+            start = int(item[0]) * 100
+            ranges.append((start, start + 99))
+        elif re.fullmatch(r"\d{3}", item):
+            ranges.append((int(item), int(item)))
+        else:
+            msg = f"Invalid status: {item} (e.g. 5xx, 404)"
+            raise ValueError(msg)
+    return ranges
@@ -0,0 +1,76 @@
+# Copyright (c) 2025, Abilian SAS
+#
+# SPDX-License-Identifier: Apache-2.0
+"""Incremental reading of log files."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+__all__ = ["read_new_lines", "seek_tail"]
+
+
+def read_new_lines(
+    path: Path, files: dict[str, dict[str, int]], max_size: int = -1
+) -> list[str]:
+    """Read the complete lines added to a log file since the last call.
+
+    Input:
+    - path: The log file.
+    - files: The state (inode and offset) of the files read, updated by
+      the call.
+    - max_size: The max number of bytes read from the file (all if < 0).
+
+    If the file was rotated (cf. uwsgi's `log-backupname`), the end of the
+    old file is read first. If it was truncated, it is read from the start.
+    """
+    st = path.stat()
+    lines: list[str] = []
+
+    state = files.get(path.name)
+    if state and state["inode"] != st.st_ino:
+        old_path = path.with_name(f"{path.name}.old")
+        if old_path.exists() and old_path.stat().st_ino == state["inode"]:
+            lines, _ = read_lines_from(old_path, state["offset"])
+        state = None
+
+    offset = state["offset"] if state else 0
+    if offset > st.st_size:
+        offset = 0
+    new_lines, offset = read_lines_from(path, offset, max_size)
+    files[path.name] = {"inode": st.st_ino, "offset": offset}
+    return lines + new_lines
+
+
+def read_lines_from(
+    path: Path, offset: int, max_size: int = -1
+) -> tuple[list[str], int]:
+    """Read the complete lines of a file, from the given offset.
+
+    Returns:
+        The lines (without newlines), and the offset of the first line not
+        read.
+    """
+    with path.open("rb") as fd:
+        fd.seek(offset)
+        data = fd.read(max_size)
+    end = data.rfind(b"\n") + 1
+    return data[:end].decode(errors="replace").splitlines(), offset + end
+
+
+def seek_tail(path: Path, files: dict[str, dict[str, int]], size: int) -> None:
+    """Only read the last `size` bytes (at most) of a file not read yet,
+    starting at a line boundary."""
+    if path.name in files:
+        return
+    st = path.stat()
+    offset = max(0, st.st_size - size)
+    if offset:
+        with path.open("rb") as fd:
+            fd.seek(offset - 1)
+            data = fd.read(size)
+        offset = offset + data.find(b"\n") if b"\n" in data else st.st_size
+    files[path.name] = {"inode": st.st_ino, "offset": offset}
@@ -0,0 +1,484 @@
+# Copyright (c) 2025, Abilian SAS
+#
+# SPDX-License-Identifier: Apache-2.0
+"""Columnar log store of an app.
+
+New lines of the log files are ingested incrementally (the offset and
+inode of each file are recorded, so rotated files are finished first), and
+appended to segments. Each segment has a few packed columns (time, worker,
+method, status, size, duration, and the offset of the raw line), and the
+raw lines, used for the output and for `grep`.
+
+The time range of each segment is kept in the index, and the rows of a
+segment are sorted by time once it is full: a query only reads the
+segments in its time range, and finds the matching rows by bisection.
+
+Layout (in `<app>/logstore/`):
+- `index.json`: the segments and the ingestion state;
+- `<segment>/<column>.bin`: the columns of a segment;
+- `<segment>/lines.txt`: the raw lines.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import json
+import re
+import shutil
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from fnmatch import fnmatch
+from operator import itemgetter
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from hop3 import config as c
+
+from .parser import parse_access_line
+from .reader import read_new_lines
+
+if TYPE_CHECKING:
+    from collections.abc import Generator, Sequence
+
+    from hop3.orm import App
+
+__all__ = ["LogEntry", "LogStore"]
+
+# Columns, and their type codes (see the `array` module)
+COLUMNS = {
+    "ts": "d",
+    "worker": "H",
+    "method": "H",
+    "status": "H",
+    "size": "Q",
+    "msecs": "I",
+    "offset": "Q",
+}
+
+# Number of rows in a (full) segment
+SEGMENT_ROWS = 50_000
+
+# Max number of bytes read from a log file at once, when ingesting
+INGEST_CHUNK = 16 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class LogEntry:
+    """A line returned by a query."""
+
+    timestamp: float
+    worker: str
+    status: int
+    line: str
+
+
+@dataclass
+class Segment:
+    name: str
+    rows: int = 0
+    min_ts: float = 0.0
+    max_ts: float = 0.0
+    # Size of `lines.txt`
+    text_size: int = 0
+    # Full segments are sorted by time
+    sealed: bool = False
+    # Dictionaries of the encoded columns
+    workers: list[str] = field(default_factory=list)
+    methods: list[str] = field(default_factory=list)
+
+
+@dataclass
+class Index:
+    segments: list[Segment] = field(default_factory=list)
+    # Ingestion state of each log file: {"inode": ..., "offset": ...}
+    files: dict[str, dict[str, int]] = field(default_factory=dict)
+    next_segment: int = 0
+
+
+# A row to append: (ts, worker, method, status, size, msecs, line)
+Row = tuple[float, str, str, int, int, int, str]
+
+
+class LogStore:
+    """The log store of an app.
+
+    Attributes:
+        root: The directory of the store.
+        log_path: The directory of the log files.
+        segment_rows: The number of rows of a full segment.
+        retention_days: The number of days the lines are kept (0 to keep
+            them forever).
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        log_path: Path,
+        segment_rows: int = SEGMENT_ROWS,
+        retention_days: int | None = None,
+    ) -> None:
+        self.root = root
+        self.log_path = log_path
+        self.segment_rows = segment_rows
+        if retention_days is None:
+            retention_days = c.LOG_RETENTION_DAYS
+        self.retention_days = retention_days
+
+    @classmethod
+    def for_app(cls, app: App) -> LogStore:
+        return cls(app.app_path / "logstore", app.log_path)
+
+    #
+    # Ingestion
+    #
+    def ingest(self) -> int:
+        """Ingest the new lines of the log files.
+
+        Returns:
+            The number of new rows.
+        """
+        if not self.log_path.exists():
+            return 0
+
+        total = 0
+        with self._lock():
+            index = self._load_index()
+            while True:
+                rows: list[Row] = []
+                for path in sorted(self.log_path.glob("*.*.log")):
+                    rows += self._read_new_rows(path, index.files)
+                if not rows:
+                    break
+                # Files are read by chunks: lines from several files are merged
+                rows.sort(key=itemgetter(0))
+                self._append(index, rows)
+                total += len(rows)
+            self._prune(index)
+            self._save_index(index)
+        return total
+
+    @staticmethod
+    def _read_new_rows(path: Path, files: dict) -> list[Row]:
+        worker = path.stem
+        mtime = path.stat().st_mtime
+        rows: list[Row] = []
+        # Other lines (e.g. printed by the app) get the time of the previous
+        # request, or the time of the file for the first ones.
+        ts = mtime
+        for line in read_new_lines(path, files, INGEST_CHUNK):
+            if record := parse_access_line(line):
+                ts = record.timestamp
+                rows.append((
+                    ts,
+                    worker,
+                    record.method,
+                    record.status,
+                    record.size,
+                    record.msecs,
+                    line,
+                ))
+            else:
+                rows.append((ts, worker, "", 0, 0, 0, line))
+        return rows
+
+    def _append(self, index: Index, rows: list[Row]) -> None:
+        while rows:
+            segment = self._get_head_segment(index)
+            space = self.segment_rows - segment.rows
+            self._write_rows(segment, rows[:space])
+            rows = rows[space:]
+            if segment.rows >= self.segment_rows:
+                self._seal(segment)
+
+    def _get_head_segment(self, index: Index) -> Segment:
+        if index.segments and not index.segments[-1].sealed:
+            segment = index.segments[-1]
+            self._truncate(segment)
+            return segment
+
+        segment = Segment(name=f"{index.next_segment:08d}")
+        index.next_segment += 1
+        index.segments.append(segment)
+        (self.root / segment.name).mkdir(parents=True)
+        return segment
+
+    def _truncate(self, segment: Segment) -> None:
+        # Remove the data written after the last saved index (if any)
+        path = self.root / segment.name
+        for name, typecode in COLUMNS.items():
+            with (path / f"{name}.bin").open("ab") as fd:
+                fd.truncate(segment.rows * array(typecode).itemsize)
+        with (path / "lines.txt").open("ab") as fd:
+            fd.truncate(segment.text_size)
+
+    def _write_rows(self, segment: Segment, rows: list[Row]) -> None:
+        path = self.root / segment.name
+        columns = {name: array(typecode) for name, typecode in COLUMNS.items()}
+        workers = {name: i for i, name in enumerate(segment.workers)}
+        methods = {name: i for i, name in enumerate(segment.methods)}
+
+        text = bytearray()
+        for ts, worker, method, status, size, msecs, line in rows:
+            if worker not in workers:
+                workers[worker] = len(segment.workers)
+                segment.workers.append(worker)
+            if method not in methods:
+                methods[method] = len(segment.methods)
+                segment.methods.append(method)
+            columns["ts"].append(ts)
+            columns["worker"].append(workers[worker])
+            columns["method"].append(methods[method])
+            columns["status"].append(status)
+            columns["size"].append(size)
+            columns["msecs"].append(msecs)
+            columns["offset"].append(segment.text_size + len(text))
+            text += line.encode() + b"\n"
+
+        for name, values in columns.items():
+            with (path / f"{name}.bin").open("ab") as fd:
+                values.tofile(fd)
+        with (path / "lines.txt").open("ab") as fd:
+            fd.write(text)
+
+        if not segment.rows:
+            segment.min_ts = rows[0][0]
+        segment.min_ts = min(segment.min_ts, rows[0][0])
+        segment.max_ts = max(segment.max_ts, rows[-1][0])
+        segment.rows += len(rows)
+        segment.text_size += len(text)
+
+    def _seal(self, segment: Segment) -> None:
+        """Sort the rows of a full segment by time."""
+        columns = self._read_columns(segment)
+        lines = self._read_lines(segment, columns["offset"], range(segment.rows))
+        order = sorted(range(segment.rows), key=columns["ts"].__getitem__)
+
+        path = self.root / segment.name
+        text = bytearray()
+        offsets = array(COLUMNS["offset"])
+        for i in order:
+            offsets.append(len(text))
+            text += lines[i] + b"\n"
+        for name, typecode in COLUMNS.items():
+            if name == "offset":
+                values = offsets
+            else:
+                values = array(typecode, (columns[name][i] for i in order))
+            (path / f"{name}.bin").write_bytes(values.tobytes())
+        (path / "lines.txt").write_bytes(text)
+
+        segment.text_size = len(text)
+        segment.sealed = True
+
+    def _prune(self, index: Index) -> None:
+        """Remove the segments older than the retention period."""
+        if not self.retention_days:
+            return
+        cutoff = time.time() - self.retention_days * 86400
+        for segment in list(index.segments):
+            if segment.sealed and segment.max_ts < cutoff:
+                shutil.rmtree(self.root / segment.name, ignore_errors=True)
+                index.segments.remove(segment)
+
+    #
+    # Queries
+    #
+    def query(
+        self,
+        *,
+        since: float | None = None,
+        until: float | None = None,
+        status: list[tuple[int, int]] | None = None,
+        grep: str = "",
+        workers: str = "*",
+        limit: int = 0,
+    ) -> list[LogEntry]:
+        """Find the lines matching all the given criteria.
+
+        Input:
+        - since, until: The time range (as timestamps).
+        - status: Ranges of status codes (see `parse_status`). Only access
+          log lines match.
+        - grep: A regular expression, searched in the lines.
+        - workers: A pattern for the workers (e.g. "web.*").
+        - limit: Only return the last matching lines.
+
+        Returns:
+            The lines, sorted by time.
+        """
+        since = since if since is not None else float("-inf")
+        until = until if until is not None else float("inf")
+        # Searched in the raw lines, without decoding them
+        regexp = re.compile(grep.encode(), re.MULTILINE) if grep else None
+
+        if not self.root.exists():
+            return []
+
+        matches: list[LogEntry] = []
+        # (Segments are sealed and pruned by `ingest()` in place)
+        with self._lock(shared=True):
+            index = self._load_index()
+            # Most recent segments first, to stop early when there is a limit
+            segments = sorted(index.segments, key=lambda s: s.max_ts, reverse=True)
+            for segment in segments:
+                if segment.max_ts < since or segment.min_ts > until:
+                    continue
+                if limit and len(matches) >= limit:
+                    threshold = sorted(m.timestamp for m in matches)[-limit]
+                    if segment.max_ts < threshold:
+                        break
+                matches += self._query_segment(
+                    segment, since, until, status, regexp, workers, limit
+                )
+
+        matches.sort(key=lambda m: m.timestamp)
+        return matches[-limit:] if limit else matches
+
+    def _query_segment(
+        self,
+        segment: Segment,
+        since: float,
+        until: float,
+        status: list[tuple[int, int]] | None,
+        regexp: re.Pattern | None,
+        workers: str,
+        limit: int,
+    ) -> list[LogEntry]:
+        columns = self._read_columns(segment, ["ts", "worker", "status", "offset"])
+        ts = columns["ts"]
+        rows: Sequence[int]
+        if segment.sealed:
+            rows = range(bisect_left(ts, since), bisect_right(ts, until))
+        else:
+            rows = [i for i, t in enumerate(ts) if since <= t <= until]
+            rows.sort(key=ts.__getitem__)
+
+        if workers != "*":
+            ids = {
+                i for i, name in enumerate(segment.workers) if fnmatch(name, workers)
+            }
+            worker_col = columns["worker"]
+            rows = [i for i in rows if worker_col[i] in ids]
+
+        if status:
+            status_col = columns["status"]
+            rows = [
+                i for i in rows if any(lo <= status_col[i] <= hi for lo, hi in status)
+            ]
+
+        if regexp and rows:
+            rows = self._grep(segment, columns["offset"], rows, regexp)
+
+        if limit:
+            rows = rows[-limit:]
+        lines = self._read_lines(segment, columns["offset"], rows)
+        return [
+            LogEntry(
+                ts[i],
+                segment.workers[columns["worker"][i]],
+                columns["status"][i],
+                lines[i].decode(errors="replace"),
+            )
+            for i in rows
+        ]
+
+    def _grep(
+        self,
+        segment: Segment,
+        offsets: array,
+        rows: Sequence[int],
+        regexp: re.Pattern,
+    ) -> list[int]:
+        """Filter the rows whose line matches a regexp.
+
+        The regexp is searched in the text of all the rows at once, then
+        each match is mapped to its row.
+        """
+        data, start = self._read_text(segment, offsets, rows)
+        candidates = set(rows)
+        found = set()
+        pos = 0
+        while pos < len(data) and (m := regexp.search(data, pos)):
+            i = bisect_right(offsets, start + m.start()) - 1
+            line_start = offsets[i] - start
+            line_end = self._line_end(segment, offsets, i) - start
+            # (A match could span several lines)
+            line = data[line_start : line_end - 1]
+            if i in candidates and regexp.search(line):
+                found.add(i)
+            # (Also past an empty match at the end of the text, e.g. "^":
+            # `search()` would find it again)
+            pos = max(line_end, m.end() + 1)
+        return [i for i in rows if i in found]
+
+    def _read_columns(
+        self, segment: Segment, names: list[str] | None = None
+    ) -> dict[str, array]:
+        path = self.root / segment.name
+        result = {}
+        for name in names or COLUMNS:
+            values = array(COLUMNS[name])
+            with (path / f"{name}.bin").open("rb") as fd:
+                values.fromfile(fd, segment.rows)
+            result[name] = values
+        return result
+
+    def _read_text(
+        self, segment: Segment, offsets: array, rows: Sequence[int]
+    ) -> tuple[bytes, int]:
+        """Read the text spanning the given rows (in one read).
+
+        Returns:
+            The text, and its offset in `lines.txt`.
+        """
+        if not rows:
+            return b"", 0
+        start = offsets[min(rows)]
+        end = self._line_end(segment, offsets, max(rows))
+        with (self.root / segment.name / "lines.txt").open("rb") as fd:
+            fd.seek(start)
+            return fd.read(end - start), start
+
+    def _read_lines(
+        self, segment: Segment, offsets: array, rows: Sequence[int]
+    ) -> dict[int, bytes]:
+        """Read the raw lines of the given rows (without the newlines)."""
+        data, start = self._read_text(segment, offsets, rows)
+        return {
+            i: data[
+                offsets[i] - start : self._line_end(segment, offsets, i) - start - 1
+            ]
+            for i in rows
+        }
+
+    @staticmethod
+    def _line_end(segment: Segment, offsets: array, i: int) -> int:
+        return offsets[i + 1] if i + 1 < segment.rows else segment.text_size
+
+    #
+    # Index
+    #
+    def _load_index(self) -> Index:
+        path = self.root / "index.json"
+        if not path.exists():
+            return Index()
+        data = json.loads(path.read_text())
+        segments = [Segment(**segment) for segment in data.pop("segments")]
+        return Index(segments=segments, **data)
+
+    def _save_index(self, index: Index) -> None:
+        path = self.root / "index.json"
+        tmp_path = path.with_name("index.json.tmp")
+        tmp_path.write_text(json.dumps(asdict(index)))
+        tmp_path.replace(path)
+
+    @contextmanager
+    def _lock(self, *, shared: bool = False) -> Generator[None]:
+        """Lock the store: exclusively to change it, shared to read it."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with (self.root / ".lock").open("w") as fd:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            yield
@@ -9,7 +9,12 @@ from .app import App, AppStateEnum
 from .backup import Backup, BackupStateEnum
 from .env import EnvVar
 from .repositories import AppRepository
-from .session import get_session_factory
+from .session import (
+    get_database,
+    get_session_factory,
+    init_database,
+    shutdown_database,
+)
 
 __all__ = [
     "App",
@@ -18,5 +23,8 @@ __all__ = [
     "Backup",
     "BackupStateEnum",
     "EnvVar",
+    "get_database",
     "get_session_factory",
+    "init_database",
+    "shutdown_database",
 ]
@@ -14,9 +14,11 @@ from sqlalchemy import String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from hop3 import config as c
+from hop3.builders import get_build_caches
 from hop3.core.env import Env
 from hop3.deploy import do_deploy
 from hop3.lib import Abort, log
+from hop3.plugins.nginx import get_reload_coordinator
 from hop3.run.spawn import spawn_app
 
 if TYPE_CHECKING:
@@ -167,13 +169,26 @@ class App(BigIntAuditBase):
         remove_file(self.repo_path)
         remove_file(self.virtualenv_path)
         remove_file(self.log_path)
+        for build_cache in get_build_caches():
+            build_cache.forget(self.app_path)
 
         for p in [c.UWSGI_AVAILABLE, c.UWSGI_ENABLED]:
             for f in Path(p).glob(f"{app_name}*.ini"):
                 remove_file(f)
-
-        remove_file(c.NGINX_ROOT / f"{app_name}.conf")
+        for f in c.UWSGI_STATS.glob(f"{app_name}_*.sock"):
+            remove_file(f)
+
+        # nginx must stop routing to the app now
+        nginx_conf_path = c.NGINX_ROOT / f"{app_name}.conf"
+        if nginx_conf_path.exists():
+            previous = nginx_conf_path.read_text()
+            remove_file(nginx_conf_path)
+            coordinator = get_reload_coordinator()
+            coordinator.add(nginx_conf_path, previous)
+            coordinator.flush()
         remove_file(c.NGINX_ROOT / f"{app_name}.sock")
+        for generation in ["blue", "green"]:
+            remove_file(c.NGINX_ROOT / f"{app_name}.{generation}.sock")
         remove_file(c.NGINX_ROOT / f"{app_name}.key")
         remove_file(c.NGINX_ROOT / f"{app_name}.crt")
 
@@ -1,21 +1,164 @@
 # Copyright (c) 2024-2025, Abilian SAS
+"""Database engine and session management.
+
+The server keeps a single, process-wide engine (and its connection pool)
+which is created once at startup, instead of creating a new engine for
+each request.
+"""
+
 from __future__ import annotations
 
-from sqlalchemy import create_engine
+import threading
+from typing import TYPE_CHECKING
+
+from attrs import frozen
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 from hop3 import config as c
 
 from .app import App
 
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Engine
+
+__all__ = [
+    "Database",
+    "create_db_engine",
+    "get_database",
+    "get_session_factory",
+    "init_database",
+    "migrate",
+    "shutdown_database",
+]
+
+
+@frozen
+class Database:
+    """A database engine, with its connection pool, and a session factory."""
+
+    uri: str
+    engine: Engine
+    session_factory: sessionmaker
+
+    @classmethod
+    def create(cls, database_uri: str) -> Database:
+        engine = create_db_engine(database_uri)
+        return cls(database_uri, engine, sessionmaker(bind=engine))
+
+    def migrate(self) -> None:
+        migrate(self.engine)
+
+    def dispose(self) -> None:
+        self.engine.dispose()
+
+
+# The process-wide database (protected by a lock, since requests
+# may be served from several threads)
+_database: Database | None = None
+_lock = threading.Lock()
+
+
+def init_database(database_uri: str = "", *, migrate_schema: bool = True) -> Database:
+    """Create the process-wide database and (optionally) run the migrations.
+
+    This is meant to be called once, at startup. Calling it again with
+    the same URI returns the existing database.
+    """
+    global _database  # noqa: PLW0603
+
+    database_uri = database_uri or c.DATABASE_URI
+    with _lock:
+        if _database is not None and _database.uri == database_uri:
+            return _database
+
+        if _database is not None:
+            _database.dispose()
+
+        database = Database.create(database_uri)
+        if migrate_schema:
+            database.migrate()
+        _database = database
+        return database
+
+
+def get_database() -> Database:
+    """Return the process-wide database, creating it on first use."""
+    if _database is not None:
+        return _database
+    return init_database()
+
+
+def shutdown_database() -> None:
+    """Close all pooled connections of the process-wide database."""
+    global _database  # noqa: PLW0603
+
+    with _lock:
+        if _database is not None:
+            _database.dispose()
+            _database = None
+
 
 def get_session_factory(database_uri: str = "") -> sessionmaker:
+    """Return a session factory.
+
+    Without argument, this returns the session factory of the process-wide
+    (pooled) database. With an explicit URI, a new, standalone database
+    is created and migrated (this is mostly useful for tests and scripts).
+    """
     if not database_uri:
-        database_uri = f"sqlite:///{c.HOP3_ROOT}/hop3.db"
+        return get_database().session_factory
+
+    database = Database.create(database_uri)
+    database.migrate()
+    return database.session_factory
+
 
-    engine = create_engine(database_uri)
+def create_db_engine(database_uri: str) -> Engine:
+    """Create an engine, with a pool configured for the given database.
 
+    - SQLite databases are switched to WAL mode, with a busy timeout, so
+      that readers don't block writers (and vice versa).
+    - Other databases (e.g. PostgreSQL) get a connection pool whose size is
+      set by `DATABASE_POOL_SIZE` and `DATABASE_MAX_OVERFLOW`.
+    """
+    if database_uri.startswith("sqlite"):
+        return _create_sqlite_engine(database_uri)
+
+    return create_engine(
+        database_uri,
+        pool_size=c.DATABASE_POOL_SIZE,
+        max_overflow=c.DATABASE_MAX_OVERFLOW,
+        pool_pre_ping=True,
+    )
+
+
+def _create_sqlite_engine(database_uri: str) -> Engine:
+    in_memory = database_uri in {"sqlite://", "sqlite:///:memory:"}
+    busy_timeout = c.DATABASE_BUSY_TIMEOUT
+
+    engine = create_engine(
+        database_uri,
+        connect_args={
+            "check_same_thread": False,
+            # In seconds
+            "timeout": busy_timeout / 1000,
+        },
+    )
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, _connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        if not in_memory:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={busy_timeout:d}")
+        cursor.close()
+
+    return engine
+
+
+def migrate(engine: Engine) -> None:
+    """Bring the database schema up to date (one-time step, at startup)."""
     with engine.begin() as conn:
         App.metadata.create_all(conn)
-
-    return sessionmaker(bind=engine)
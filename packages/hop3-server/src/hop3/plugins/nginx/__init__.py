@@ -5,6 +5,26 @@
 
 from __future__ import annotations
 
+from ._capabilities import (
+    NginxCapabilities,
+    get_loaded_modules,
+    get_nginx_capabilities,
+)
+from ._reload import (
+    NginxCheck,
+    ReloadCoordinator,
+    check_nginx_config,
+    get_reload_coordinator,
+)
 from ._setup import NginxVirtualHost
 
-__all__ = ["NginxVirtualHost"]
+__all__ = [
+    "NginxCapabilities",
+    "NginxCheck",
+    "NginxVirtualHost",
+    "ReloadCoordinator",
+    "check_nginx_config",
+    "get_loaded_modules",
+    "get_nginx_capabilities",
+    "get_reload_coordinator",
+]
@@ -0,0 +1,136 @@
+# Copyright (c) 2025, Abilian SAS
+#
+# SPDX-License-Identifier: Apache-2.0
+"""The features supported by the installed nginx.
+
+They are detected from the output of `nginx -V` (version, built-in modules,
+and modules built with `--add-module`) and from the dynamic modules loaded
+by `/etc/nginx/modules-enabled` (e.g. the `libnginx-mod-http-brotli-*`
+packages of Debian).
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from hop3.core.capabilities import get_host_capabilities
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+__all__ = ["NginxCapabilities", "get_loaded_modules", "get_nginx_capabilities"]
+
+MODULES_ENABLED = Path("/etc/nginx/modules-enabled")
+
+VERSION_REGEXP = re.compile(r"nginx/(\d+)\.(\d+)\.(\d+)")
+# E.g. "--with-http_v2_module"
+BUILTIN_REGEXP = re.compile(r"--with-(\w+)_module")
+# E.g. "--add-module=/build/ngx_brotli"
+ADDED_REGEXP = re.compile(r"--add-module=(\S+)")
+# E.g. "load_module modules/ngx_http_brotli_filter_module.so;"
+LOAD_MODULE_REGEXP = re.compile(
+    r"^\s*load_module\s+\S*ngx_(\w+)_module\.so", re.MULTILINE
+)
+
+# Third-party modules, by a part of the name of their source directory
+THIRD_PARTY_MODULES = {
+    "brotli": ["http_brotli_filter", "http_brotli_static"],
+    "zstd": ["http_zstd_filter", "http_zstd_static"],
+}
+
+# `http2 on` replaced the `http2` parameter of `listen` in nginx 1.25.1
+HTTP2_DIRECTIVE_VERSION = (1, 25, 1)
+
+
+@dataclass(frozen=True)
+class NginxCapabilities:
+    version: tuple[int, ...] = ()
+    # E.g. "http_v2", "http_brotli_filter"
+    modules: frozenset[str] = frozenset()
+
+    @classmethod
+    def parse(cls, output: str, loaded: Iterable[str] = ()) -> NginxCapabilities:
+        """Parse the output of `nginx -V`, and the names of the loaded
+        dynamic modules."""
+        version: tuple[int, ...] = ()
+        if m := VERSION_REGEXP.search(output):
+            version = tuple(int(part) for part in m.groups())
+
+        modules = set(BUILTIN_REGEXP.findall(output))
+        for path in ADDED_REGEXP.findall(output):
+            for name, names in THIRD_PARTY_MODULES.items():
+                if name in Path(path).name:
+                    modules.update(names)
+        modules.update(loaded)
+        return cls(version, frozenset(modules))
+
+    def has(self, module: str) -> bool:
+        return module in self.modules
+
+    @property
+    def http2(self) -> bool:
+        return self.has("http_v2")
+
+    @property
+    def http2_directive(self) -> bool:
+        """If HTTP/2 is enabled with `http2 on` (instead of `listen`)."""
+        return self.version >= HTTP2_DIRECTIVE_VERSION
+
+    @property
+    def http3(self) -> bool:
+        return self.has("http_v3")
+
+    @property
+    def ssl(self) -> bool:
+        return self.has("http_ssl")
+
+    @property
+    def gzip_static(self) -> bool:
+        return self.has("http_gzip_static")
+
+    @property
+    def brotli(self) -> bool:
+        return self.has("http_brotli_filter")
+
+    @property
+    def brotli_static(self) -> bool:
+        return self.has("http_brotli_static")
+
+    @property
+    def zstd(self) -> bool:
+        return self.has("http_zstd_filter")
+
+    @property
+    def zstd_static(self) -> bool:
+        return self.has("http_zstd_static")
+
+
+def get_loaded_modules(modules_enabled: Path = MODULES_ENABLED) -> list[str]:
+    """The dynamic modules loaded by nginx (e.g. "http_brotli_filter")."""
+    if not modules_enabled.is_dir():
+        return []
+    modules = []
+    for path in sorted(modules_enabled.glob("*.conf")):
+        modules += LOAD_MODULE_REGEXP.findall(read_conf(path))
+    return modules
+
+
+def read_conf(path: Path) -> str:
+    try:
+        return path.read_text()
+    except OSError:
+        return ""
+
+
+def get_nginx_capabilities() -> NginxCapabilities:
+    """The capabilities of the installed nginx (cached, see
+    `hop3.core.capabilities`)."""
+    capabilities = get_host_capabilities()
+    output = capabilities.command_output("nginx -V")
+    loaded = capabilities.probe(
+        "nginx:modules-enabled", get_loaded_modules, depends=[MODULES_ENABLED]
+    )
+    return NginxCapabilities.parse(output, loaded)
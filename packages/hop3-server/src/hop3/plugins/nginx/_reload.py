@@ -0,0 +1,198 @@
+# Copyright (c) 2025, Abilian SAS
+#
+# SPDX-License-Identifier: Apache-2.0
+"""Batched, validated reloads of nginx.
+
+Each reload makes nginx re-parse the configs of all the apps and replace its
+worker processes, so when many apps are (re)deployed at once, the changed
+configs are collected and nginx is reloaded once for all of them:
+
+- `NginxVirtualHost.setup()` adds the config it changed to the coordinator,
+  with its previous content;
+- `NGINX_RELOAD_DELAY` seconds after the first change (the configs changed
+  in the meantime join the same batch), the configs are checked once with
+  `nginx -t` (with a delay of 0, each change is checked and reloaded
+  right away);
+- the configs reported as broken are rolled back to their previous content
+  (or removed, if new), then nginx is reloaded once.
+
+nginx is reloaded by touching the `.reload` file of `NGINX_ROOT`, watched
+by the `hop3-nginx.path` systemd unit (or with `NGINX_RELOAD_COMMAND`).
+
+The pending changes are also flushed when the process exits, and when the
+server shuts down.
+"""
+
+from __future__ import annotations
+
+import atexit
+import re
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from hop3 import config as c
+from hop3.lib import log, write_if_changed
+
+__all__ = [
+    "NginxCheck",
+    "ReloadCoordinator",
+    "check_nginx_config",
+    "get_reload_coordinator",
+]
+
+RELOAD_TRIGGER = ".reload"
+
+# E.g. 'nginx: [emerg] unknown directive "foo" in /home/hop3/nginx/app.conf:3'
+ERROR_REGEXP = re.compile(r"\[(?:emerg|crit|alert)\].* in (?P<path>/\S+):\d+")
+
+
+@dataclass(frozen=True)
+class NginxCheck:
+    """The result of `nginx -t`."""
+
+    ok: bool
+    output: str = ""
+    # Set if the check could not be run (e.g. no nginx, or no permission)
+    skipped: bool = False
+
+    @property
+    def failed_paths(self) -> set[Path]:
+        """The config files with errors."""
+        return {Path(m["path"]) for m in ERROR_REGEXP.finditer(self.output)}
+
+
+def check_nginx_config() -> NginxCheck:
+    """Check the whole nginx config (`NGINX_CHECK_COMMAND`)."""
+    try:
+        result = subprocess.run(
+            c.NGINX_CHECK_COMMAND,
+            shell=True,
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+    except OSError as e:
+        return NginxCheck(ok=True, output=str(e), skipped=True)
+
+    output = result.stdout + result.stderr
+    if result.returncode == 0:
+        return NginxCheck(ok=True, output=output)
+    if "test failed" not in output:
+        # E.g. nginx not installed, or sudo not allowed
+        return NginxCheck(ok=True, output=output, skipped=True)
+    return NginxCheck(ok=False, output=output)
+
+
+@dataclass
+class ReloadCoordinator:
+    """Collect the changed nginx configs, and reload nginx once for all of
+    them, after `delay` seconds (right away if 0, only on `flush()` if
+    None, which is meant for the tests)."""
+
+    delay: float | None = c.NGINX_RELOAD_DELAY
+
+    # Previous content of the changed configs (None for new ones)
+    dirty: dict[Path, str | None] = field(default_factory=dict)
+    # The configs which were rolled back (until they are changed again)
+    rolled_back: set[Path] = field(default_factory=set)
+    reloads: int = 0
+
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+    _flush_lock: threading.Lock = field(default_factory=threading.Lock)
+    _timer: threading.Timer | None = None
+
+    def add(self, path: Path, previous: str | None) -> None:
+        """Add a changed config to the next reload."""
+        with self._lock:
+            # Keep the content before the first change (the last good one)
+            self.dirty.setdefault(path, previous)
+            self.rolled_back.discard(path)
+            if self.delay is not None and self.delay > 0 and self._timer is None:
+                self._timer = threading.Timer(self.delay, self.flush_safely)
+                self._timer.daemon = True
+                self._timer.start()
+        if self.delay is not None and self.delay <= 0:
+            self.flush_safely()
+
+    def flush_safely(self) -> None:
+        try:
+            self.flush()
+        except Exception as e:
+            log(f"Error while reloading nginx: {e}", level=1, fg="red")
+
+    def flush(self) -> set[Path]:
+        """Check the changed configs and reload nginx now (if needed).
+
+        Returns:
+        - The configs which were rolled back.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                dirty, self.dirty = self.dirty, {}
+            if not dirty:
+                return set()
+
+            rolled_back: set[Path] = set()
+            while True:
+                result = check_nginx_config()
+                if result.skipped:
+                    log(f"Can't check the nginx config: {result.output}", level=2)
+                    break
+                if result.ok:
+                    break
+                broken = {
+                    path
+                    for path in result.failed_paths
+                    if path in dirty and path not in rolled_back
+                }
+                if not broken:
+                    # Not caused by the changed configs (nginx would refuse
+                    # to reload anyway)
+                    log(f"Error: broken nginx config:\n{result.output}", fg="red")
+                    return rolled_back
+                for path in sorted(broken):
+                    log(
+                        f"Error: broken nginx config {path}, rolling it back:\n"
+                        f"{result.output}",
+                        level=1,
+                        fg="red",
+                    )
+                    rollback(path, dirty[path])
+                rolled_back |= broken
+                with self._lock:
+                    self.rolled_back |= broken
+
+            if len(rolled_back) < len(dirty):
+                self.reload()
+            return rolled_back
+
+    def reload(self) -> None:
+        self.reloads += 1
+        if c.NGINX_RELOAD_COMMAND:
+            subprocess.run(c.NGINX_RELOAD_COMMAND, shell=True, check=False)
+        else:
+            (c.NGINX_ROOT / RELOAD_TRIGGER).write_text(f"{time.time()}\n")
+
+
+def rollback(path: Path, previous: str | None) -> None:
+    """Restore the previous content of a config (or remove it, if new)."""
+    if previous is None:
+        path.unlink(missing_ok=True)
+    else:
+        write_if_changed(path, previous)
+
+
+# The coordinator of the process. The pending reloads are done when the
+# process exits (the timer thread is a daemon), e.g. after a CLI command.
+_coordinator = ReloadCoordinator()
+atexit.register(_coordinator.flush_safely)
+
+
+def get_reload_coordinator() -> ReloadCoordinator:
+    return _coordinator
@@ -5,25 +5,33 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+import re
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import TYPE_CHECKING
 
 from hop3.config import ACME_WWW, CACHE_ROOT, NGINX_ROOT
 from hop3.container import container
 from hop3.core.protocols import Proxy
-from hop3.lib import command_output, expand_vars, log
+from hop3.lib import expand_vars, log, write_if_changed
 from hop3.services.certificates import CertificatesManager
 
+from ._capabilities import NginxCapabilities, get_nginx_capabilities
+from ._reload import get_reload_coordinator
 from ._templates import (
     HOP3_INTERNAL_NGINX_CACHE_MAPPING,
     HOP3_INTERNAL_NGINX_STATIC_MAPPING,
     HOP3_INTERNAL_NGINX_UWSGI_SETTINGS,
     HOP3_INTERNAL_PROXY_CACHE_PATH,
+    NGINX_BROTLI_FRAGMENT,
     NGINX_COMMON_FRAGMENT,
+    NGINX_COMPRESSION_TYPES,
+    NGINX_CONNECTION_MAP,
+    NGINX_GZIP_FRAGMENT,
     NGINX_HTTPS_ONLY_TEMPLATE,
     NGINX_PORTMAP_FRAGMENT,
     NGINX_TEMPLATE,
+    NGINX_ZSTD_FRAGMENT,
 )
 
 if TYPE_CHECKING:
@@ -36,15 +44,15 @@ class NginxVirtualHost(Proxy):
     app: App
     env: Env
     workers: dict[str, str]
+    capabilities: NginxCapabilities = field(default_factory=get_nginx_capabilities)
 
     def __post_init__(self) -> None:
         # Hack to get around ClickCommand
         server_name_list = self.env["NGINX_SERVER_NAME"].split(",")
         self.env["NGINX_SERVER_NAME"] = " ".join(server_name_list)
 
-        nginx_version = command_output("nginx -V")
         nginx_ssl = "443 ssl"
-        if "--with-http_v2_module" in nginx_version:
+        if self.use_http2 and not self.capabilities.http2_directive:
             nginx_ssl += " http2"
 
         self.env.update(
@@ -55,6 +63,12 @@ class NginxVirtualHost(Proxy):
             },
         )
 
+    @property
+    def use_http2(self) -> bool:
+        return self._use_feature(
+            "NGINX_HTTP2", available=self.capabilities.http2, default=True
+        )
+
     @property
     def app_name(self) -> str:
         return self.app.name
@@ -72,18 +86,21 @@ class NginxVirtualHost(Proxy):
             value = template.format(**self.env)
         self.env[key] = value
 
-    def setup(self) -> None:
+    def setup(self) -> bool:
         """Configures the Nginx environment for the application.
 
         This sets up the necessary environment variables and
         configurations for Nginx to properly serve the application,
         based on the application's configuration and deployment setup.
+
+        Returns:
+        - True if the nginx config of the app changed.
         """
 
         self.setup_backend()
 
         # Get certificates and add them to the nginx configuration
-        self.setup_certificates()
+        changed = self.setup_certificates()
 
         # Setup caching and static file handling
         self.setup_cache()
@@ -92,21 +109,29 @@ class NginxVirtualHost(Proxy):
         # Additinal misc setup
         self.extra_setup()
 
+        # Optional protocols, TLS and compression features
+        self.setup_features()
+
         # Configure proxy settings and generate buffer with the configuration
-        self.generate_config()
+        path = self.nginx_conf_path
+        previous = path.read_text() if path.exists() else None
+        changed = self.generate_config() or changed
+        if not changed:
+            log(f"nginx config of app '{self.app_name}' unchanged", level=2)
+            return False
 
         # Check the generated Nginx configuration for errors
-        self.check_config(self.nginx_conf_path)
+        self.check_config(path, previous)
+        return True
 
     def setup_backend(self):
-        # default to reverse proxying to the TCP port we picked
-        self.update_env(
-            "HOP3_INTERNAL_NGINX_UWSGI_SETTINGS",
-            template="proxy_pass http://{BIND_ADDRESS:s}:{PORT:s};",
-        )
+        # (Can be called again, e.g. by `setup()` during a blue/green deploy)
         if "wsgi" in self.workers or "jwsgi" in self.workers:
             # Configure for Unix socket if WSGI or JWSGI workers are involved
             sock = NGINX_ROOT / f"{self.app_name}.sock"
+            # Generation of the workers, for blue/green deploys
+            if generation := self.env.get("HOP3_INTERNAL_GENERATION"):
+                sock = sock.with_suffix(f".{generation}.sock")
             self.env["HOP3_INTERNAL_NGINX_UWSGI_SETTINGS"] = expand_vars(
                 HOP3_INTERNAL_NGINX_UWSGI_SETTINGS,
                 self.env,
@@ -116,19 +141,29 @@ class NginxVirtualHost(Proxy):
             if "PORT" in self.env:
                 del self.env["PORT"]
         else:
-            # Configure for TCP socket if no WSGI or JWSGI workers are involved
+            # Configure for TCP socket if no WSGI or JWSGI workers are involved:
+            # reverse proxy to the TCP port we picked
+            self.update_env(
+                "HOP3_INTERNAL_NGINX_UWSGI_SETTINGS",
+                template="proxy_pass http://{BIND_ADDRESS:s}:{PORT:s};",
+            )
             self.update_env("NGINX_SOCKET", template="{BIND_ADDRESS:s}:{PORT:s}")
             log(
                 f"nginx will look for app '{self.app_name}' on {self.env['NGINX_SOCKET']}",
                 level=2,
             )
 
-    def setup_certificates(self) -> None:
+    def setup_certificates(self) -> bool:
         domain_name = self.env["NGINX_SERVER_NAME"].split()[0]
         certificate_manager = container.get(CertificatesManager)
         certificate = certificate_manager.get_certificate(domain_name)
-        (NGINX_ROOT / f"{self.app_name}.key").write_text(certificate.get_key())
-        (NGINX_ROOT / f"{self.app_name}.crt").write_text(certificate.get_crt())
+        key_changed = write_if_changed(
+            NGINX_ROOT / f"{self.app_name}.key", certificate.get_key()
+        )
+        crt_changed = write_if_changed(
+            NGINX_ROOT / f"{self.app_name}.crt", certificate.get_crt()
+        )
+        return key_changed or crt_changed
 
     def extra_setup(self):
         # Conditionally block .git folders from being served
@@ -139,9 +174,142 @@ class NginxVirtualHost(Proxy):
         )
         self.env["NGINX_ACL"] = ""
 
-    def generate_config(self) -> None:
-        buffer = self.get_proxy_conf()
-        self.nginx_conf_path.write_text(buffer)
+    def setup_features(self) -> None:
+        """Configure the optional features of the vhost, according to the
+        `NGINX_*` settings of the app, and if the installed nginx supports
+        them (see `NginxCapabilities`):
+
+        - `NGINX_HTTP3`: HTTP/3 (QUIC), advertised with an `Alt-Svc` header;
+        - `NGINX_COMPRESSION`: the compressions of the responses, by order
+          of preference (`brotli`, `zstd`, `gzip`, or `off`; default: `gzip`);
+        - `NGINX_PRECOMPRESSED`: serve the precompressed static files
+          (`.gz`, `.br`, `.zst`) when they exist;
+        - `NGINX_SSL_SESSION_CACHE`: size of the TLS session cache of the
+          app (e.g. `10m`), and `NGINX_SSL_SESSION_TIMEOUT` (default: `1d`);
+        - `NGINX_SSL_SESSION_TICKETS`: enable or disable TLS session tickets;
+        - `NGINX_OCSP_STAPLING`: OCSP stapling (with `NGINX_RESOLVER`, to
+          reach the OCSP responder);
+        - `NGINX_UPSTREAM_KEEPALIVE`: number of idle connections to the app
+          kept open (for apps behind a HTTP proxy, not uwsgi).
+        """
+        capabilities = self.capabilities
+        env = self.env
+
+        protocols = []
+        if self.use_http2 and capabilities.http2_directive:
+            protocols.append("http2 on;")
+        env["HOP3_INTERNAL_NGINX_HTTP3_LISTEN"] = ""
+        if self._use_feature("NGINX_HTTP3", available=capabilities.http3):
+            env["HOP3_INTERNAL_NGINX_HTTP3_LISTEN"] = expand_vars(
+                "listen              $NGINX_IPV6_ADDRESS:443 quic;\n"
+                "  listen              $NGINX_IPV4_ADDRESS:443 quic;",
+                env,
+            )
+            protocols.append("add_header Alt-Svc 'h3=\":443\"; ma=86400' always;")
+        env["HOP3_INTERNAL_NGINX_PROTOCOLS"] = "\n  ".join(protocols)
+
+        env["HOP3_INTERNAL_NGINX_TLS"] = self.get_tls_settings()
+        env["HOP3_INTERNAL_NGINX_COMPRESSION"] = self.get_compression_settings()
+
+        env["HOP3_INTERNAL_NGINX_UPSTREAM_KEEPALIVE"] = ""
+        env["HOP3_INTERNAL_NGINX_CONNECTION_MAP"] = ""
+        env["HOP3_INTERNAL_NGINX_CONNECTION"] = '"upgrade"'
+        keepalive = env.get_int("NGINX_UPSTREAM_KEEPALIVE", 0)
+        if keepalive and ("wsgi" in self.workers or "jwsgi" in self.workers):
+            log("nginx can't keep connections to uwsgi workers alive", level=2)
+        elif keepalive:
+            variable = "hop3_connection_" + re.sub(r"\W", "_", self.app_name)
+            env["HOP3_INTERNAL_NGINX_UPSTREAM_KEEPALIVE"] = f"keepalive {keepalive};"
+            env["HOP3_INTERNAL_NGINX_CONNECTION_MAP"] = NGINX_CONNECTION_MAP.format(
+                variable=variable
+            )
+            env["HOP3_INTERNAL_NGINX_CONNECTION"] = f"${variable}"
+            # Through the upstream, with its pool of connections
+            env["HOP3_INTERNAL_NGINX_UWSGI_SETTINGS"] = (
+                f"proxy_pass http://{self.app_name};"
+            )
+
+    def get_tls_settings(self) -> str:
+        env = self.env
+        lines = []
+        if cache_size := env.get("NGINX_SSL_SESSION_CACHE"):
+            if cache_size.lower() in {"1", "on", "true", "yes"}:
+                cache_size = "10m"
+            zone = "ssl_" + re.sub(r"\W", "_", self.app_name)
+            timeout = env.get("NGINX_SSL_SESSION_TIMEOUT", "1d")
+            lines += [
+                f"ssl_session_cache shared:{zone}:{cache_size};",
+                f"ssl_session_timeout {timeout};",
+            ]
+        if "NGINX_SSL_SESSION_TICKETS" in env:
+            tickets = env.get_bool("NGINX_SSL_SESSION_TICKETS")
+            lines.append(f"ssl_session_tickets {'on' if tickets else 'off'};")
+        if self._use_feature("NGINX_OCSP_STAPLING", available=self.capabilities.ssl):
+            lines += ["ssl_stapling on;", "ssl_stapling_verify on;"]
+            if resolver := env.get("NGINX_RESOLVER"):
+                lines.append(f"resolver {resolver};")
+        return "\n  ".join(lines)
+
+    def get_compression_settings(self) -> str:
+        """The compression settings, for the compressions listed in
+        `NGINX_COMPRESSION` which are supported."""
+        capabilities = self.capabilities
+        supported = {
+            "gzip": (True, NGINX_GZIP_FRAGMENT, capabilities.gzip_static),
+            "brotli": (
+                capabilities.brotli,
+                NGINX_BROTLI_FRAGMENT,
+                capabilities.brotli_static,
+            ),
+            "zstd": (capabilities.zstd, NGINX_ZSTD_FRAGMENT, capabilities.zstd_static),
+        }
+        names = self.env.get("NGINX_COMPRESSION", "gzip").replace(" ", "").lower()
+        precompressed = self.env.get_bool("NGINX_PRECOMPRESSED")
+        env = {"NGINX_COMPRESSION_TYPES": NGINX_COMPRESSION_TYPES}
+
+        fragments = []
+        for name in names.split(","):
+            if name in {"", "off", "none"}:
+                continue
+            if name not in supported:
+                log(f"nginx: unknown compression '{name}', ignoring it", level=2)
+                continue
+            available, fragment, static = supported[name]
+            if not available:
+                log(
+                    f"nginx: {name} compression not supported by the installed"
+                    " nginx, ignoring it",
+                    level=2,
+                    fg="yellow",
+                )
+                continue
+            fragments.append(expand_vars(fragment, env))
+            if precompressed and static:
+                fragments.append(f"  {name}_static on;\n")
+        return "".join(fragments)
+
+    def _use_feature(self, key: str, *, available: bool, default: bool = False) -> bool:
+        """Check if a feature is enabled by the app (with `key`) and supported
+        by the installed nginx."""
+        if not self.env.get_bool(key, default=default):
+            return False
+        if not available:
+            # Only warn about features explicitly enabled
+            if key in self.env:
+                log(
+                    f"nginx: {key} not supported by the installed nginx, ignoring it",
+                    level=2,
+                    fg="yellow",
+                )
+            return False
+        return True
+
+    def generate_config(self) -> bool:
+        """Write the config, if changed (and return True if so).
+
+        The config is replaced atomically: nginx may be reloaded at any time.
+        """
+        return write_if_changed(self.nginx_conf_path, self.get_proxy_conf())
 
     @property
     def nginx_conf_path(self) -> Path:
@@ -225,23 +393,19 @@ class NginxVirtualHost(Proxy):
         self.env["HOP3_INTERNAL_NGINX_CUSTOM_CLAUSES"] = expand_vars(tpl, self.env)
         self.env["HOP3_INTERNAL_NGINX_PORTMAP"] = ""
 
-    def check_config(self, nginx_conf_path: Path) -> None:
+    def check_config(self, nginx_conf_path: Path, previous: str | None) -> None:
         """Prevent broken config from breaking other deployments.
 
+        The config is checked (with `nginx -t`) by the reload coordinator,
+        together with the other configs changed at the same time, and rolled
+        back to its previous content if broken. Then nginx is reloaded once
+        for all of them.
+
         Input:
         - nginx_conf_path (Path): The path to the nginx configuration file to be checked.
+        - previous (str | None): The previous content of the file (None if new).
         """
-        # FIXME: currently broken (should be run as root)
-        return
-
-        # try:
-        #     subprocess.check_output(["/usr/sbin/nginx", "-t"])
-        # except subprocess.CalledProcessError:
-        #     echo(f"Error: broken nginx config - removing", fg="red")
-        #     content = nginx_conf_path.read_text()
-        #     echo(f"here is the broken config\n{content}")
-        #     # nginx_conf_path.unlink()
-        #     sys.exit(1)
+        get_reload_coordinator().add(nginx_conf_path, previous)
 
     def get_static_paths(self) -> list[tuple[str, Path]]:
         """Get a mapping of static URL prefixes to file system paths.
@@ -9,7 +9,9 @@ NGINX_TEMPLATE = """
 $HOP3_INTERNAL_PROXY_CACHE_PATH
 upstream $APP {
   server $NGINX_SOCKET;
+  $HOP3_INTERNAL_NGINX_UPSTREAM_KEEPALIVE
 }
+$HOP3_INTERNAL_NGINX_CONNECTION_MAP
 server {
   listen $NGINX_IPV6_ADDRESS:80;
   listen $NGINX_IPV4_ADDRESS:80;
@@ -26,7 +28,9 @@ NGINX_HTTPS_ONLY_TEMPLATE = """
 $HOP3_INTERNAL_PROXY_CACHE_PATH
 upstream $APP {
   server $NGINX_SOCKET;
+  $HOP3_INTERNAL_NGINX_UPSTREAM_KEEPALIVE
 }
+$HOP3_INTERNAL_NGINX_CONNECTION_MAP
 server {
   listen      $NGINX_IPV6_ADDRESS:80;
   listen      $NGINX_IPV4_ADDRESS:80;
@@ -50,21 +54,17 @@ $HOP3_INTERNAL_NGINX_COMMON
 NGINX_COMMON_FRAGMENT = r"""
   listen              $NGINX_IPV6_ADDRESS:$NGINX_SSL;
   listen              $NGINX_IPV4_ADDRESS:$NGINX_SSL;
+  $HOP3_INTERNAL_NGINX_HTTP3_LISTEN
   ssl_certificate     $NGINX_ROOT/$APP.crt;
   ssl_certificate_key $NGINX_ROOT/$APP.key;
   server_name         $NGINX_SERVER_NAME;
+  $HOP3_INTERNAL_NGINX_PROTOCOLS
+  $HOP3_INTERNAL_NGINX_TLS
   # These are not required under systemd - enable for debugging only
   # access_log        $LOG_ROOT/$APP/access.log;
   # error_log         $LOG_ROOT/$APP/error.log;
 
-  # Enable gzip compression
-  gzip on;
-  gzip_proxied any;
-  gzip_types text/plain text/xml text/css text/javascript text/js application/x-javascript application/javascript application/json application/xml+rss application/atom+xml image/svg+xml;
-  gzip_comp_level 7;
-  gzip_min_length 2048;
-  gzip_vary on;
-  gzip_disable "MSIE [1-6]\.(?!.*SV1)";
+  $HOP3_INTERNAL_NGINX_COMPRESSION
   # set a custom header for requests
   add_header X-Deployed-By Hop3;
 
@@ -75,12 +75,54 @@ NGINX_COMMON_FRAGMENT = r"""
   $HOP3_INTERNAL_NGINX_PORTMAP
 """
 
+# Compression of the responses (see `NginxVirtualHost.setup_features`)
+NGINX_GZIP_FRAGMENT = r"""
+  # Enable gzip compression
+  gzip on;
+  gzip_proxied any;
+  gzip_types $NGINX_COMPRESSION_TYPES;
+  gzip_comp_level 7;
+  gzip_min_length 2048;
+  gzip_vary on;
+  gzip_disable "MSIE [1-6]\.(?!.*SV1)";
+"""
+
+NGINX_BROTLI_FRAGMENT = """
+  brotli on;
+  brotli_types $NGINX_COMPRESSION_TYPES;
+  brotli_comp_level 5;
+  brotli_min_length 2048;
+"""
+
+NGINX_ZSTD_FRAGMENT = """
+  zstd on;
+  zstd_types $NGINX_COMPRESSION_TYPES;
+  zstd_comp_level 3;
+  zstd_min_length 2048;
+"""
+
+NGINX_COMPRESSION_TYPES = (
+    "text/plain text/xml text/css text/javascript text/js"
+    " application/x-javascript application/javascript application/json"
+    " application/xml+rss application/atom+xml image/svg+xml"
+)
+
+# Upgrade the connections to the app for websockets only, so that the
+# others can be kept alive
+# (A `str.format()` template)
+NGINX_CONNECTION_MAP = """
+map $http_upgrade ${variable} {{
+  default upgrade;
+  '' '';
+}}
+"""
+
 NGINX_PORTMAP_FRAGMENT = """
   location    / {
     $HOP3_INTERNAL_NGINX_UWSGI_SETTINGS
     proxy_http_version 1.1;
     proxy_set_header Upgrade $http_upgrade;
-    proxy_set_header Connection "upgrade";
+    proxy_set_header Connection $HOP3_INTERNAL_NGINX_CONNECTION;
     proxy_set_header Host $host;
     proxy_set_header X-Forwarded-Proto $scheme;
     proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
@@ -0,0 +1,284 @@
+# Copyright (c) 2025, Abilian SAS
+#
+# SPDX-License-Identifier: Apache-2.0
+"""Autoscaler of the web workers of the apps.
+
+Policies are declared in the ENV of the apps, for each kind of workers,
+as `min:max[:target]`, e.g.:
+
+    HOP3_AUTOSCALE_WEB=2:8:p95<200ms
+    HOP3_AUTOSCALE_WSGI=1:4:busy<70%
+
+Targets are either a latency percentile (`p50`, `p95`, `p99`, from the
+access logs, see `hop3.logs.metrics`), or a ratio of `busy` workers or of
+the listen `queue` (from the uwsgi stats, see `hop3.run.uwsgi.stats`). The
+default target is `busy<75%`.
+
+The number of workers is adjusted every `AUTOSCALE_INTERVAL` seconds:
+- up, when the value is above the target (by `TOLERANCE`), proportionally
+  to the excess (as Kubernetes' horizontal pod autoscaler does);
+- down, one worker at a time, when the value is well below the target
+  (`SCALE_DOWN_RATIO`), so that the load of one less worker stays below it;
+- never more often than the cooldowns (`AUTOSCALE_UP_COOLDOWN`,
+  `AUTOSCALE_DOWN_COOLDOWN`) after a change.
+
+Workers are added or removed with `AppLauncher.scale()` (no rebuild, the
+other workers keep running).
+"""
+
+from __future__ import annotations
+
+import math
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from hop3 import config as c
+from hop3.core.env import Env
+from hop3.lib import log
+from hop3.logs.metrics import Stats, get_app_metrics
+from hop3.orm import App
+from hop3.scheduler import get_app_lock
+
+from .spawn import AppLauncher
+from .uwsgi.stats import collect_stats
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+
+    from .uwsgi.stats import VassalStats
+
+__all__ = ["AutoscalePolicy", "Autoscaler", "start_autoscaler", "stop_autoscaler"]
+
+ENV_PREFIX = "HOP3_AUTOSCALE_"
+
+# Scale up only when the value exceeds the target by more than 10%
+TOLERANCE = 0.1
+# Scale down only when the value is below half the target
+SCALE_DOWN_RATIO = 0.5
+
+TARGET_REGEXP = re.compile(
+    r"(?P<metric>p50|p95|p99|busy|queue)<(?P<value>\d+(?:\.\d+)?)(?P<unit>ms|s|%)"
+)
+UNITS = {
+    "p50": {"ms": 1, "s": 1000},
+    "p95": {"ms": 1, "s": 1000},
+    "p99": {"ms": 1, "s": 1000},
+    "busy": {"%": 1},
+    "queue": {"%": 1},
+}
+
+
+@dataclass(frozen=True)
+class AutoscalePolicy:
+    """The scaling policy of a kind of workers.
+
+    The target is in ms for latencies, in % for the others.
+    """
+
+    kind: str
+    min: int
+    max: int
+    metric: str = "busy"
+    target: float = 75.0
+
+    @classmethod
+    def parse(cls, kind: str, value: str) -> AutoscalePolicy:
+        """Parse a policy, e.g. "2:8:p95<200ms"."""
+        parts = value.strip().split(":")
+        try:
+            min_, max_ = int(parts[0]), int(parts[1])
+        except (IndexError, ValueError):
+            min_ = max_ = -1
+        if len(parts) > 3 or not 0 <= min_ <= max_ or max_ == 0:
+            msg = f"Invalid autoscaling policy for '{kind}': {value}"
+            raise ValueError(msg)
+        if len(parts) == 2:
+            return cls(kind, min_, max_)
+
+        m = TARGET_REGEXP.fullmatch(parts[2].replace(" ", ""))
+        if not m or m["unit"] not in UNITS[m["metric"]]:
+            msg = (
+                f"Invalid autoscaling target for '{kind}': {parts[2]}"
+                " (e.g. p95<200ms, busy<70%, queue<50%)"
+            )
+            raise ValueError(msg)
+        target = float(m["value"]) * UNITS[m["metric"]][m["unit"]]
+        return cls(kind, min_, max_, m["metric"], target)
+
+    def get_desired_count(self, current: int, value: float) -> int:
+        """The number of workers needed for the value to meet the target."""
+        if current and value > self.target * (1 + TOLERANCE):
+            desired = math.ceil(current * value / self.target)
+        elif value < self.target * SCALE_DOWN_RATIO:
+            desired = current - 1
+        else:
+            desired = current
+        return min(max(desired, self.min), self.max)
+
+
+def get_policies(env: Mapping[str, str]) -> list[AutoscalePolicy]:
+    """The autoscaling policies declared in an app's environment."""
+    policies = []
+    for key, value in sorted(env.items()):
+        if key.startswith(ENV_PREFIX) and value:
+            kind = key.removeprefix(ENV_PREFIX).lower()
+            policies.append(AutoscalePolicy.parse(kind, value))
+    return policies
+
+
+def get_metric_value(
+    policy: AutoscalePolicy, vassals: list[VassalStats], window: dict[str, Stats]
+) -> float | None:
+    """The current value of the metric of a policy (None if unknown)."""
+    if policy.metric in {"busy", "queue"}:
+        running = [v for v in vassals if v.kind == policy.kind and not v.error]
+        if not running:
+            return None
+        if policy.metric == "queue":
+            return max(v.queue_saturation for v in running) * 100
+        workers = sum(len(v.workers) for v in running)
+        busy = sum(v.busy_workers for v in running)
+        return busy / workers * 100 if workers else None
+
+    # Latency, of the requests of the workers of this kind (e.g. "web.1")
+    stats = Stats()
+    for worker, worker_stats in window.items():
+        if worker.split(".")[0] == policy.kind:
+            stats.merge(worker_stats)
+    quantile = int(policy.metric[1:]) / 100
+    return stats.latency.percentile(quantile)
+
+
+@dataclass
+class Autoscaler:
+    """Adjust the number of workers of the apps which declare a policy."""
+
+    interval: int = c.AUTOSCALE_INTERVAL
+    up_cooldown: int = c.AUTOSCALE_UP_COOLDOWN
+    down_cooldown: int = c.AUTOSCALE_DOWN_COOLDOWN
+
+    # Time of the last change, per (app, kind)
+    last_change: dict[tuple[str, str], float] = field(default_factory=dict)
+    _stop: threading.Event = field(default_factory=threading.Event)
+
+    def run(self) -> None:
+        """Check the apps every `interval` seconds, until stopped."""
+        while not self._stop.wait(self.interval):
+            self.run_safely()
+
+    def run_safely(self) -> None:
+        try:
+            self.run_once()
+        except Exception as e:
+            log(f"Autoscaler error: {e}", level=1, fg="red")
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run_once(self, now: float | None = None) -> None:
+        if now is None:
+            now = time.time()
+        if not c.APP_ROOT.exists():
+            return
+        for app_path in sorted(c.APP_ROOT.iterdir()):
+            app = App(name=app_path.name)
+            # Deployed apps
+            if (app.virtualenv_path / "LIVE_ENV").exists():
+                self.check_app(app, now)
+
+    def check_app(self, app: App, now: float) -> None:
+        env = Env()
+        env.parse_settings(app.virtualenv_path / "LIVE_ENV")
+        try:
+            policies = get_policies(env)
+        except ValueError as e:
+            log(f"{app.name}: {e}", level=1, fg="red")
+            return
+        if not policies:
+            return
+
+        # Don't scale during a deploy (it would be overridden anyway)
+        lock = get_app_lock(app.name)
+        if not lock.acquire(blocking=False):
+            return
+        try:
+            launcher = AppLauncher(app)
+            counts = launcher.get_scale()
+            changes = self.get_changes(app, policies, counts, now)
+            if changes:
+                launcher.scale(changes)
+        finally:
+            lock.release()
+
+    def get_changes(
+        self,
+        app: App,
+        policies: list[AutoscalePolicy],
+        counts: dict[str, int],
+        now: float,
+    ) -> dict[str, int]:
+        """The new number of workers of each kind which must change."""
+        vassals: list[VassalStats] = []
+        if any(p.metric in {"busy", "queue"} for p in policies):
+            vassals = collect_stats(app.name)
+        window: dict[str, Stats] = {}
+        if any(p.metric.startswith("p") for p in policies):
+            window = get_app_metrics(app.name, app.log_path).snapshot(now)
+
+        changes = {}
+        for policy in policies:
+            if policy.kind not in counts:
+                continue
+            current = counts[policy.kind]
+            value = get_metric_value(policy, vassals, window)
+            if value is None:
+                # Still enforce the bounds
+                desired = min(max(current, policy.min), policy.max)
+            else:
+                desired = policy.get_desired_count(current, value)
+            if desired == current:
+                continue
+
+            cooldown = self.up_cooldown if desired > current else self.down_cooldown
+            last_change = self.last_change.get((app.name, policy.kind), 0.0)
+            if now - last_change < cooldown:
+                continue
+
+            log(
+                f"{app.name}: scaling '{policy.kind}' from {current} to {desired}"
+                f" workers ({policy.metric}={value}, target {policy.target})",
+                level=2,
+                fg="blue",
+            )
+            self.last_change[app.name, policy.kind] = now
+            changes[policy.kind] = desired
+        return changes
+
+
+# The autoscaler of the server process (if enabled)
+_autoscaler: Autoscaler | None = None
+
+
+def start_autoscaler() -> None:
+    """Start the autoscaler in a background thread (unless disabled, with
+    `AUTOSCALE_INTERVAL=0`)."""
+    global _autoscaler  # noqa: PLW0603
+
+    if c.AUTOSCALE_INTERVAL <= 0 or _autoscaler is not None:
+        return
+    _autoscaler = Autoscaler()
+    thread = threading.Thread(
+        target=_autoscaler.run, name="hop3-autoscaler", daemon=True
+    )
+    thread.start()
+
+
+def stop_autoscaler() -> None:
+    global _autoscaler  # noqa: PLW0603
+
+    if _autoscaler is not None:
+        _autoscaler.stop()
+        _autoscaler = None
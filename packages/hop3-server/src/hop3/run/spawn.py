@@ -6,14 +6,16 @@
 from __future__ import annotations
 
 import os
+import time
 from dataclasses import dataclass, field
 from typing import TYPE_CHECKING
 
+from hop3 import config as c
 from hop3.config import HOP3_ROOT, HOP3_USER, UWSGI_ENABLED
 from hop3.core.env import Env
-from hop3.lib import echo, get_free_port, log
+from hop3.lib import Abort, echo, get_free_port, log, wait_until_healthy
 from hop3.lib.settings import write_settings
-from hop3.plugins.nginx import NginxVirtualHost
+from hop3.plugins.nginx import NginxVirtualHost, get_reload_coordinator
 from hop3.project.config import AppConfig
 from hop3.project.procfile import parse_procfile
 
@@ -22,19 +24,44 @@ from .uwsgi import spawn_uwsgi_worker
 if TYPE_CHECKING:
     from hop3.orm import App
 
+# Generation of the running workers, for blue/green deploys
+GENERATION_FILE = "GENERATION"
+GENERATIONS = ["blue", "green"]
 
-def spawn_app(app: App, deltas: dict[str, int] | None = None) -> None:
-    """Create all workers for an app."""
+
+def spawn_app(
+    app: App, deltas: dict[str, int] | None = None, *, restart: bool = True
+) -> None:
+    """Create all workers for an app.
+
+    If `restart` is False (e.g. the sources and the build didn't change),
+    only the workers whose config changed are restarted.
+    """
     if deltas is None:
         deltas = {}
-    launcher = AppLauncher(app, deltas)
+    launcher = AppLauncher(app, deltas, restart=restart)
     launcher.spawn_app()
 
 
+def get_scaling_changes(
+    current: dict[str, int], new: dict[str, int]
+) -> tuple[dict[str, range], dict[str, range]]:
+    """Compute the workers to create and to destroy (ranges of ordinals, by
+    kind), to go from the current to the new number of workers."""
+    to_create = {}
+    to_destroy = {}
+    for kind, count in new.items():
+        to_create[kind] = range(current.get(kind, 0) + 1, count + 1)
+        to_destroy[kind] = range(current.get(kind, 0), count, -1)
+    return to_create, to_destroy
+
+
 @dataclass
 class AppLauncher:
     app: App
     deltas: dict[str, int] = field(default_factory=dict)
+    # Restart all the workers, even those whose config didn't change
+    restart: bool = True
 
     def __post_init__(self) -> None:
         """Initialize additional attributes for the application configuration.
@@ -61,17 +88,176 @@ class AppLauncher:
         """Create the app's workers by setting up web worker configurations and
         handling environment-specific setups, including nginx and uwsgi
         configurations."""
+        generation = ""
+        if self.use_blue_green():
+            if self.restart:
+                self.spawn_app_blue_green()
+                return
+            # The code didn't change: update the running generation in place
+            # (only the workers whose config changed are reloaded)
+            generation = self.get_generation()
+            if generation:
+                self.env["HOP3_INTERNAL_GENERATION"] = generation
+        elif self.get_generation():
+            # No longer deployed with blue/green: replace the workers of the
+            # last generation with unsuffixed ones
+            self.retire_workers(keep="")
+            (self.app_path / GENERATION_FILE).unlink()
+            self.restart = True
+
+        if not self.restart:
+            self.keep_live_port()
 
         # Set up nginx if we have NGINX_SERVER_NAME set
         if "NGINX_SERVER_NAME" in self.env:
             nginx = NginxVirtualHost(self.app, self.env, self.workers)
             nginx.setup()
 
-        # Configured worker count using dict.fromkeys to initialize each key with value 1
+        web_worker_count, to_create, to_destroy = self.get_worker_counts()
+
+        env = self.get_worker_env()
+        self.save_settings(env, web_worker_count)
+
+        # Handle auto-restart via uwsgi if enabled (otherwise, only the
+        # workers whose config changed are reloaded by the emperor)
+        if self.restart and env.get_bool("HOP3_AUTO_RESTART", default=True):
+            configs = list(UWSGI_ENABLED.glob(f"{self.app_name}*.ini"))
+            if configs:
+                echo("-----> Removing uwsgi configs to trigger auto-restart.")
+                for config in configs:
+                    config.unlink()
+
+        # Create new workers and remove unnecessary ones
+        self.create_new_workers(to_create, env, generation, update=not self.restart)
+        self.remove_unnecessary_workers(to_destroy, generation)
+
+    def spawn_app_blue_green(self) -> None:
+        """Replace the app's workers without downtime.
+
+        A new generation of workers is spawned next to the current one (on a
+        fresh socket or port), and health-checked: it must answer a request
+        to `HOP3_HEALTH_CHECK_PATH` with a success (or, if not set, answer a
+        request to "/" without a server error). Then nginx is switched to
+        the new generation, and the old one is retired once it had time to
+        finish its requests in flight. If the new workers don't come up,
+        they are removed and the current ones keep serving the app.
+        """
+        old_generation = self.get_generation()
+        generation = "green" if old_generation == "blue" else "blue"
+        log(f"Starting the '{generation}' generation of workers", level=2, fg="blue")
+
+        self.env["HOP3_INTERNAL_GENERATION"] = generation
+        nginx = NginxVirtualHost(self.app, self.env, self.workers)
+        # Where nginx will look for the new workers
+        nginx.setup_backend()
+        address = self.env["NGINX_SOCKET"]
+
+        web_worker_count, to_create, _to_destroy = self.get_worker_counts()
+
+        env = self.get_worker_env()
+        self.save_settings(env, web_worker_count)
+
+        for kind, ordinals in to_create.items():
+            for ordinal in ordinals:
+                spawn_uwsgi_worker(
+                    self.app_name,
+                    kind,
+                    self.workers[kind],
+                    env,
+                    ordinal,
+                    generation=generation,
+                )
+
+        timeout = self.env.get_int(
+            "HOP3_HEALTH_CHECK_TIMEOUT", c.DEPLOY_HEALTH_CHECK_TIMEOUT
+        )
+        # The workers must answer a request (not just accept connections:
+        # uwsgi binds its socket before loading the app)
+        path = self.env.get("HOP3_HEALTH_CHECK_PATH", "")
+        if not wait_until_healthy(address, timeout, path):
+            self.retire_workers(keep=old_generation)
+            msg = (
+                f"Error: the new workers of app '{self.app_name}' are not ready"
+                f" after {timeout}s, keeping the current ones."
+            )
+            raise Abort(msg)
+
+        # Switch nginx to the new generation (now, not with the next batch
+        # of reloads, since the current workers will be retired)
+        nginx.setup()
+        coordinator = get_reload_coordinator()
+        coordinator.flush()
+        if nginx.nginx_conf_path in coordinator.rolled_back:
+            self.retire_workers(keep=old_generation)
+            msg = (
+                f"Error: the new nginx config of app '{self.app_name}' is broken,"
+                " keeping the current workers."
+            )
+            raise Abort(msg)
+        (self.app_path / GENERATION_FILE).write_text(generation)
+
+        drain_timeout = self.env.get_int("HOP3_DRAIN_TIMEOUT", c.DEPLOY_DRAIN_TIMEOUT)
+        log(f"Retiring the previous workers in {drain_timeout}s", level=2, fg="blue")
+        time.sleep(drain_timeout)
+        self.retire_workers(keep=generation)
+
+    def use_blue_green(self) -> bool:
+        """Check if the workers can be replaced using a blue/green deploy."""
+        if not self.env.get_bool("HOP3_BLUE_GREEN", default=c.DEPLOY_BLUE_GREEN):
+            return False
+
+        # Only for web workers behind nginx, which can run side by side
+        if "NGINX_SERVER_NAME" not in self.env:
+            log("Blue/green deploys need nginx, restarting workers.", level=2)
+            return False
+        if not self.web_workers or not set(self.web_workers) <= {"wsgi", "web"}:
+            log("Blue/green deploys need web or wsgi workers.", level=2)
+            return False
+        if "web" in self.web_workers and self.fixed_port:
+            log("Blue/green deploys can't use a fixed PORT.", level=2)
+            return False
+        return True
+
+    def get_generation(self) -> str:
+        """Return the generation of the running workers ("" if none)."""
+        path = self.app_path / GENERATION_FILE
+        return path.read_text().strip() if path.exists() else ""
+
+    def retire_workers(self, keep: str) -> None:
+        """Remove the workers which are not of the given generation."""
+        for kind in self.web_workers:
+            for config in UWSGI_ENABLED.glob(f"{self.app_name}_{kind}.*.ini"):
+                # E.g. "app_web.1.blue.ini" (or "app_web.1.ini", without generation)
+                generation = config.stem.rsplit(".", 1)[-1]
+                if generation not in GENERATIONS:
+                    generation = ""
+                if generation != keep:
+                    log(f"terminating '{config.stem}'", level=3, fg="yellow")
+                    config.unlink()
+
+    def get_worker_counts(self) -> tuple[dict, dict, dict]:
+        """Compute the number of workers of each kind, according to the
+        scaling settings and the requested deltas.
+
+        Returns:
+        - The new worker counts, the workers to create and the workers to
+          destroy (ranges of ordinals, by kind).
+        """
+        current = self.get_scale()
+        web_worker_count = {
+            kind: count + self.deltas.get(kind, 0) for kind, count in current.items()
+        }
+        _, to_destroy = get_scaling_changes(current, web_worker_count)
+        # All the workers: the existing ones are skipped, unless their config
+        # was removed (to restart them)
+        to_create = {kind: range(1, n + 1) for kind, n in web_worker_count.items()}
+        return web_worker_count, to_create, to_destroy
+
+    def get_scale(self) -> dict[str, int]:
+        """Return the configured number of workers of each kind (1 by
+        default)."""
         web_worker_count = dict.fromkeys(self.web_workers.keys(), 1)
         scaling = self.virtualenv_path / "SCALING"
-
-        # Check if scaling configuration file exists and update web_worker_count
         if scaling.exists():
             web_worker_count.update(
                 {
@@ -80,57 +266,79 @@ class AppLauncher:
                     if worker in self.web_workers
                 },
             )
+        return web_worker_count
 
-        deltas = self.deltas
-        to_create = {}
-        to_destroy = {}
-
-        # Determine workers to create and destroy based on deltas
-        for env_key in web_worker_count:
-            to_create[env_key] = range(1, web_worker_count[env_key] + 1)
-            if deltas.get(env_key):
-                to_create[env_key] = range(
-                    1,
-                    web_worker_count[env_key] + deltas[env_key] + 1,
-                )
-                # If delta is negative, calculate which workers to destroy
-                if deltas[env_key] < 0:
-                    to_destroy[env_key] = range(
-                        web_worker_count[env_key],
-                        web_worker_count[env_key] + deltas[env_key],
-                        -1,
-                    )
-                web_worker_count[env_key] += deltas[env_key]
+    def scale(self, counts: dict[str, int]) -> None:
+        """Change the number of workers of some kinds, without a deploy.
 
+        Only the configs of the added or removed workers are written or
+        removed, so the other workers keep running. New workers get the
+        environment of the last deploy (`LIVE_ENV`).
+        """
+        current = self.get_scale()
+        for kind, count in counts.items():
+            if kind not in current:
+                msg = f"Error: app '{self.app_name}' has no '{kind}' workers."
+                raise Abort(msg)
+            if count < 0:
+                msg = f"Error: invalid number of '{kind}' workers: {count}."
+                raise Abort(msg)
+
+        web_worker_count = {**current, **counts}
+        to_create, to_destroy = get_scaling_changes(current, web_worker_count)
+
+        env = self.get_live_env()
+        # Workers of a blue/green deploy
+        generation = self.get_generation()
+        if not any(UWSGI_ENABLED.glob(f"{self.app_name}_*.{generation}.ini")):
+            generation = ""
+        self.create_new_workers(to_create, env, generation)
+        self.remove_unnecessary_workers(to_destroy, generation)
+        self.save_settings(env, web_worker_count)
+
+    def keep_live_port(self) -> None:
+        """Use the port of the running workers, instead of a fresh one (which
+        would change their config, and restart them)."""
+        if self.fixed_port:
+            return
+        live = self.virtualenv_path / "LIVE_ENV"
+        if not live.exists():
+            return
+        env = Env()
+        env.parse_settings(live)
+        if "PORT" in env:
+            self.env["PORT"] = env["PORT"]
+
+    def get_live_env(self) -> Env:
+        """Return the environment of the running workers (i.e. of the last
+        deploy)."""
+        live = self.virtualenv_path / "LIVE_ENV"
+        if not live.exists():
+            return self.get_worker_env()
+        env = Env()
+        env.parse_settings(live)
+        return env
+
+    def get_worker_env(self) -> Env:
+        """Return the environment of the workers (without the internal
+        variables)."""
         env = self.env.copy()
 
         # Cleanup environment variables that are internal
         for env_key in list(env.keys()):
             if env_key.startswith("HOP3_INTERNAL_"):
                 del env[env_key]
+        return env
 
-        # Save current settings to file
-
-        # app = App(self.app_name)
-        app = self.app
-        live = app.virtualenv_path / "LIVE_ENV"
+    def save_settings(self, env: Env, web_worker_count: dict) -> None:
+        """Save the current settings and worker counts to files."""
+        live = self.virtualenv_path / "LIVE_ENV"
         write_settings(live, env)
 
         # Write worker count settings to scaling file
+        scaling = self.virtualenv_path / "SCALING"
         write_settings(scaling, web_worker_count, ":")
 
-        # Handle auto-restart via uwsgi if enabled
-        if env.get_bool("HOP3_AUTO_RESTART", default=True):
-            configs = list(UWSGI_ENABLED.glob(f"{self.app_name}*.ini"))
-            if configs:
-                echo("-----> Removing uwsgi configs to trigger auto-restart.")
-                for config in configs:
-                    config.unlink()
-
-        # Create new workers and remove unnecessary ones
-        self.create_new_workers(to_create, env)
-        self.remove_unnecessary_workers(to_destroy)
-
     def make_env(self) -> Env:
         """Set up and configure the environment for the application.
 
@@ -175,7 +383,8 @@ class AppLauncher:
         # Load environment variables from the ORM
         env.update(self.app.get_runtime_env())
 
-        # Pick a port if none defined
+        # Pick a port if none defined (a fresh one on each deploy)
+        self.fixed_port = "PORT" in env
         if "PORT" not in env:
             port = env["PORT"] = str(get_free_port())
             log(f"Picked free port: {port}", level=3)
@@ -192,7 +401,9 @@ class AppLauncher:
 
         return env
 
-    def create_new_workers(self, to_create, env) -> None:
+    def create_new_workers(
+        self, to_create, env, generation: str = "", *, update: bool = False
+    ) -> None:
         """Creates new workers for the given application.
 
         This iterates over the types of workers specified in the `to_create` dictionary
@@ -204,30 +415,45 @@ class AppLauncher:
           that need to be created.
         - env: dict
           A dictionary representing the environment variables needed for the worker process.
+        - generation: The generation of the workers (for blue/green deploys).
+        - update: Also regenerate the configs of the enabled workers (only
+          those whose config changed are reloaded).
         """
         # Create new workers
         for kind, v in to_create.items():
             for w in v:
-                enabled = UWSGI_ENABLED / f"{self.app_name:s}_{kind:s}.{w:d}.ini"
-                if enabled.exists():
+                enabled = UWSGI_ENABLED / self.get_config_file(kind, w, generation)
+                exists = enabled.exists()
+                if exists and not update:
                     # Skip if the worker configuration already exists
                     continue
 
-                log(f"spawning '{self.app_name:s}:{kind:s}.{w:d}'", level=3)
-                spawn_uwsgi_worker(self.app_name, kind, self.workers[kind], env, w)
+                changed = spawn_uwsgi_worker(
+                    self.app_name,
+                    kind,
+                    self.workers[kind],
+                    env,
+                    w,
+                    generation=generation,
+                )
+                if not exists:
+                    log(f"spawning '{self.app_name:s}:{kind:s}.{w:d}'", level=3)
+                elif changed:
+                    log(f"reloading '{self.app_name:s}:{kind:s}.{w:d}'", level=3)
 
-    def remove_unnecessary_workers(self, to_destroy) -> None:
+    def remove_unnecessary_workers(self, to_destroy, generation: str = "") -> None:
         """Removes unnecessary worker configuration files based on the provided
         dictionary.
 
         Input:
         - to_destroy: A dictionary where keys are worker types (as strings) and values are
           lists of worker identifiers (as integers) that need to be removed.
+        - generation: The generation of the workers (for blue/green deploys).
         """
         # Remove unnecessary workers (leave logfiles)
         for k, v in to_destroy.items():
             for w in v:
-                enabled = UWSGI_ENABLED / f"{self.app_name:s}_{k:s}.{w:d}.ini"
+                enabled = UWSGI_ENABLED / self.get_config_file(k, w, generation)
                 if not enabled.exists():
                     continue  # Skip if the file does not exist
 
@@ -235,3 +461,10 @@ class AppLauncher:
                 msg = f"terminating '{self.app_name:s}:{k:s}.{w:d}'"
                 log(msg, level=3, fg="yellow")
                 enabled.unlink()  # Remove the worker's configuration file
+
+    def get_config_file(self, kind: str, ordinal: int, generation: str = "") -> str:
+        """The name of the uwsgi config of a worker (see
+        `UwsgiWorker.config_name`)."""
+        if generation:
+            return f"{self.app_name:s}_{kind:s}.{ordinal:d}.{generation}.ini"
+        return f"{self.app_name:s}_{kind:s}.{ordinal:d}.ini"
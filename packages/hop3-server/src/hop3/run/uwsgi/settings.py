@@ -8,6 +8,8 @@ from __future__ import annotations
 from dataclasses import dataclass, field
 from typing import TYPE_CHECKING
 
+from hop3.lib import write_if_changed
+
 if TYPE_CHECKING:
     from pathlib import Path
 
@@ -58,13 +60,20 @@ class UwsgiSettings:
         self.extend(items)
         return self
 
-    def write(self, path: Path) -> None:
-        """Write the configuration values to a specified file path.
+    def render(self) -> str:
+        """Return the content of the configuration file."""
+        lines = ["[uwsgi]\n"]
+        lines += [f"{k:s} = {v}\n" for k, v in sorted(self.values)]
+        return "".join(lines)
+
+    def write(self, path: Path) -> bool:
+        """Write the configuration values to a specified file path, unless
+        the file is already up to date.
 
         Input:
         - path (Path): The file path where the configuration should be written.
+
+        Returns:
+        - True if the file was written.
         """
-        with path.open("w") as h:
-            h.write("[uwsgi]\n")
-            for k, v in sorted(self.values):
-                h.write(f"{k:s} = {v}\n")
+        return write_if_changed(path, self.render())
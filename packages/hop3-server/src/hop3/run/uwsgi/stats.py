@@ -0,0 +1,228 @@
+# Copyright (c) 2025, Abilian SAS
+#
+# SPDX-License-Identifier: Apache-2.0
+"""Live telemetry of the uwsgi vassals, from their stats sockets.
+
+Each vassal (i.e. each enabled `.ini` file) has a stats socket (see
+`UwsgiWorker.create_base_settings`), which sends a JSON document on
+connection. The sockets are read concurrently, with a short timeout, so
+that a hung vassal doesn't block the others.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from hop3 import config as c
+
+__all__ = [
+    "VassalStats",
+    "WorkerStats",
+    "collect_stats",
+    "format_saturation",
+    "get_stats_socket",
+    "list_vassals",
+    "parse_config_name",
+]
+
+# Timeout (in seconds) for reading a stats socket
+STATS_TIMEOUT = 1.0
+
+# Fill ratio above which a listen queue is considered saturated
+QUEUE_SATURATION = 0.8
+
+# E.g. "myapp_web.1" or "myapp_wsgi.2.blue" (see `UwsgiWorker.config_name`)
+CONFIG_NAME_REGEXP = re.compile(
+    r"(?P<app>.+)_(?P<kind>[^_.]+)\.(?P<ordinal>\d+)(?:\.(?P<generation>blue|green))?"
+)
+
+
+def get_stats_socket(config_name: str) -> Path:
+    """The path of the stats socket of a vassal."""
+    return c.UWSGI_STATS / f"{config_name}.sock"
+
+
+@dataclass(frozen=True)
+class WorkerStats:
+    """The state of a uwsgi worker (i.e. process) of a vassal."""
+
+    id: int
+    pid: int
+    # "idle", "busy", "cheap", "sig", "pause"...
+    status: str
+    requests: int = 0
+    exceptions: int = 0
+    harakiri_count: int = 0
+    respawn_count: int = 0
+    # Resident memory, in bytes (needs `memory-report`)
+    rss: int = 0
+    # Average response time, in microseconds
+    avg_rt: int = 0
+
+    @classmethod
+    def from_json(cls, data: dict) -> WorkerStats:
+        return cls(
+            id=data.get("id", 0),
+            pid=data.get("pid", 0),
+            status=data.get("status", ""),
+            requests=data.get("requests", 0),
+            exceptions=data.get("exceptions", 0),
+            harakiri_count=data.get("harakiri_count", 0),
+            respawn_count=data.get("respawn_count", 0),
+            rss=data.get("rss", 0),
+            avg_rt=data.get("avg_rt", 0),
+        )
+
+    @property
+    def busy(self) -> bool:
+        return self.status == "busy"
+
+
+@dataclass(frozen=True)
+class VassalStats:
+    """The state of a vassal (i.e. of the workers of an `.ini` file)."""
+
+    # Name of the config, e.g. "myapp_web.1"
+    name: str
+    app_name: str = ""
+    kind: str = ""
+    ordinal: int = 0
+    generation: str = ""
+    listen_queue: int = 0
+    # Size of the listen queue (`listen` setting, 0 if no socket)
+    listen_queue_max: int = 0
+    # Connections refused because the listen queue was full
+    listen_queue_errors: int = 0
+    workers: list[WorkerStats] = field(default_factory=list)
+    # Set if the stats socket could not be read
+    error: str = ""
+
+    @classmethod
+    def from_json(cls, name: str, data: dict) -> VassalStats:
+        sockets = data.get("sockets", [])
+        return cls(
+            name=name,
+            **parse_config_name(name),
+            listen_queue=data.get("listen_queue", 0),
+            listen_queue_max=max((s.get("max_queue", 0) for s in sockets), default=0),
+            listen_queue_errors=data.get("listen_queue_errors", 0),
+            workers=[WorkerStats.from_json(w) for w in data.get("workers", [])],
+        )
+
+    @classmethod
+    def from_error(cls, name: str, error: str) -> VassalStats:
+        return cls(name=name, **parse_config_name(name), error=error)
+
+    @property
+    def busy_workers(self) -> int:
+        return sum(1 for worker in self.workers if worker.busy)
+
+    @property
+    def requests(self) -> int:
+        return sum(worker.requests for worker in self.workers)
+
+    @property
+    def rss(self) -> int:
+        return sum(worker.rss for worker in self.workers)
+
+    @property
+    def harakiri_count(self) -> int:
+        return sum(worker.harakiri_count for worker in self.workers)
+
+    @property
+    def respawn_count(self) -> int:
+        return sum(worker.respawn_count for worker in self.workers)
+
+    @property
+    def avg_rt(self) -> float:
+        """Average response time (in microseconds) of the workers, weighted
+        by their number of requests."""
+        if not self.requests:
+            return 0.0
+        total = sum(worker.avg_rt * worker.requests for worker in self.workers)
+        return total / self.requests
+
+    @property
+    def queue_saturation(self) -> float:
+        if not self.listen_queue_max:
+            return 0.0
+        return self.listen_queue / self.listen_queue_max
+
+    @property
+    def saturated(self) -> bool:
+        return self.queue_saturation >= QUEUE_SATURATION
+
+
+def format_saturation(vassal: VassalStats) -> str:
+    """A warning about the listen queue of a vassal."""
+    return (
+        f"Warning: the listen queue of {vassal.name} is"
+        f" {vassal.listen_queue}/{vassal.listen_queue_max}"
+        f" ({vassal.listen_queue_errors} connections refused): raise"
+        " UWSGI_LISTEN, UWSGI_PROCESSES or the number of workers."
+    )
+
+
+def parse_config_name(name: str) -> dict:
+    if m := CONFIG_NAME_REGEXP.fullmatch(name):
+        return {
+            "app_name": m["app"],
+            "kind": m["kind"],
+            "ordinal": int(m["ordinal"]),
+            "generation": m["generation"] or "",
+        }
+    return {}
+
+
+def list_vassals(app_name: str = "") -> list[str]:
+    """The names of the enabled vassals (of an app, or of all the apps)."""
+    pattern = f"{app_name}_*.ini" if app_name else "*.ini"
+    names = []
+    for path in sorted(c.UWSGI_ENABLED.glob(pattern)):
+        info = parse_config_name(path.stem)
+        if info and (not app_name or info["app_name"] == app_name):
+            names.append(path.stem)
+    return names
+
+
+def collect_stats(
+    app_name: str = "", timeout: float = STATS_TIMEOUT
+) -> list[VassalStats]:
+    """Read the stats of the vassals (of an app, or of all the apps).
+
+    Must not be called from a running event loop (see `fetch_all`).
+    """
+    names = list_vassals(app_name)
+    if not names:
+        return []
+    return asyncio.run(fetch_all(names, timeout))
+
+
+async def fetch_all(names: list[str], timeout: float) -> list[VassalStats]:
+    return list(await asyncio.gather(*(fetch(name, timeout) for name in names)))
+
+
+async def fetch(name: str, timeout: float) -> VassalStats:
+    path = get_stats_socket(name)
+    try:
+        data = await asyncio.wait_for(read_stats(path), timeout)
+    except asyncio.TimeoutError:
+        return VassalStats.from_error(name, "timeout")
+    except FileNotFoundError:
+        return VassalStats.from_error(name, "not running")
+    except (OSError, ValueError) as e:
+        return VassalStats.from_error(name, str(e))
+    return VassalStats.from_json(name, data)
+
+
+async def read_stats(path: Path) -> dict:
+    reader, writer = await asyncio.open_unix_connection(path)
+    try:
+        data = await reader.read()
+    finally:
+        writer.close()
+    return json.loads(data)
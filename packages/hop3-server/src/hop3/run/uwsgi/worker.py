@@ -8,17 +8,17 @@ from __future__ import annotations
 import grp
 import os
 import pwd
-import shutil
 from abc import abstractmethod
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import TYPE_CHECKING
 
 from hop3 import config as c
-from hop3.lib import Abort, log
+from hop3.lib import Abort, log, write_if_changed
 from hop3.lib.settings import parse_settings
 
 from .settings import UwsgiSettings
+from .stats import get_stats_socket
 
 if TYPE_CHECKING:
     from hop3.core.env import Env
@@ -32,7 +32,8 @@ def spawn_uwsgi_worker(
     command: str,
     env: Env,
     ordinal=1,
-) -> None:
+    generation: str = "",
+) -> bool:
     """Set up and deploy a single worker of a given kind.
 
     Input:
@@ -41,6 +42,11 @@ def spawn_uwsgi_worker(
         command (str): The command to be executed by the worker.
         env (Env): The environment in which the worker will be spawned.
         ordinal (int): The ordinal number of the worker, default is 1.
+        generation (str): The generation of the worker, for blue/green
+            deploys (see `AppLauncher.spawn_app_blue_green`).
+
+    Returns:
+        True if the config of the worker changed (i.e. it is (re)started).
     """
 
     # if kind == "web":
@@ -51,7 +57,7 @@ def spawn_uwsgi_worker(
     match kind:
         case "static":
             log("nginx serving static files only", level=2, fg="yellow")
-            return
+            return False
         case "cron":
             worker = CronWorker(app_name, command, env, ordinal)
             log(f"uwsgi scheduled cron for {command}", level=2, fg="yellow")
@@ -66,7 +72,8 @@ def spawn_uwsgi_worker(
         case _:
             worker = GenericWorker(app_name, command, env, ordinal, kind=kind)
 
-    worker.spawn()
+    worker.generation = generation
+    return worker.spawn()
 
 
 @dataclass
@@ -77,10 +84,12 @@ class UwsgiWorker:
     ordinal: int = 1
     kind: str = ""
     settings: UwsgiSettings = field(default_factory=UwsgiSettings)
+    # Set for blue/green deploys, where two generations run side by side
+    generation: str = ""
 
     log_format: str = ""
 
-    def spawn(self) -> None:
+    def spawn(self) -> bool:
         """Execute a series of setup operations to initialize and configure
         settings for the environment.
 
@@ -92,7 +101,7 @@ class UwsgiWorker:
         self.create_base_settings()
         self.update_settings()
         self.update_env()
-        self.write_settings()
+        return self.write_settings()
 
     def create_base_settings(self) -> None:
         """Configures and updates base settings for an application using uWSGI.
@@ -113,7 +122,11 @@ class UwsgiWorker:
         env["PROC_TYPE"] = self.kind
         env_path = app.virtualenv_path
         log_path = app.log_path
-        log_file = log_path / self.kind
+        # (Each generation of a blue/green deploy rotates its own logs)
+        log_name = f"{self.kind}.{self.ordinal:d}"
+        if self.generation:
+            log_name += f".{self.generation}"
+        log_file = log_path / log_name
 
         # Retrieve username and group name from system user and group IDs
         pw_name = pwd.getpwuid(os.getuid()).pw_name
@@ -137,8 +150,11 @@ class UwsgiWorker:
             ("log-maxsize", env.get("UWSGI_LOG_MAXSIZE", c.UWSGI_LOG_MAXSIZE)),
             ("logfile-chown", f"{pw_name}:{gr_name}"),
             ("logfile-chmod", "640"),
-            ("logto2", f"{log_file}.{self.ordinal:d}.log"),
-            ("log-backupname", f"{log_file}.{self.ordinal:d}.log.old"),
+            ("logto2", f"{log_file}.log"),
+            ("log-backupname", f"{log_file}.log.old"),
+            # Live telemetry (see `hop3.run.uwsgi.stats`)
+            ("stats", get_stats_socket(self.config_name)),
+            ("memory-report", "true"),
         ]
 
         if self.log_format:
@@ -194,7 +210,7 @@ class UwsgiWorker:
         for k, v in env.items():
             self.settings.add("env", f"{k:s}={v}")
 
-    def write_settings(self) -> None:
+    def write_settings(self) -> bool:
         """Write configuration settings to a file and enable them by copying to
         another directory.
 
@@ -202,12 +218,27 @@ class UwsgiWorker:
         and an ordinal number, writes the settings to a file in the
         'UWSGI_AVAILABLE' directory, and then copies this file to the
         'UWSGI_ENABLED' directory to make the settings active.
+
+        The files are only written if their content changed: the emperor
+        reloads a vassal each time its config is touched.
+
+        Returns:
+        - True if the enabled config was written (i.e. the worker is
+          (re)started).
         """
-        name = f"{self.app_name:s}_{self.kind:s}.{self.ordinal:d}.ini"
-        uwsgi_available_path = c.UWSGI_AVAILABLE / name
-        uwsgi_enabled_path = c.UWSGI_ENABLED / name
-        self.settings.write(uwsgi_available_path)
-        shutil.copyfile(uwsgi_available_path, uwsgi_enabled_path)
+        name = f"{self.config_name}.ini"
+        content = self.settings.render()
+        write_if_changed(c.UWSGI_AVAILABLE / name, content)
+        return write_if_changed(c.UWSGI_ENABLED / name, content)
+
+    @property
+    def config_name(self) -> str:
+        """The name of the vassal, e.g. "myapp_web.1" (or "myapp_web.1.blue"
+        for blue/green deploys)."""
+        name = f"{self.app_name:s}_{self.kind:s}.{self.ordinal:d}"
+        if self.generation:
+            name += f".{self.generation}"
+        return name
 
     def log(self, message) -> None:
         """Logs a formatted message with a specified log level and color.
@@ -235,6 +266,8 @@ class JwsgiWorker(UwsgiWorker):
     def update_settings(self) -> None:
         self.settings += [
             ("module", self.command),
+            # Exit if the app can't be loaded (instead of serving errors)
+            ("need-app", "true"),
             ("threads", self.env.get("UWSGI_THREADS", "4")),
             ("plugin", "jvm"),
             ("plugin", "jwsgi"),
@@ -248,6 +281,8 @@ class RwsgiWorker(UwsgiWorker):
     def update_settings(self) -> None:
         self.settings += [
             ("module", self.command),
+            # Exit if the app can't be loaded (instead of serving errors)
+            ("need-app", "true"),
             ("threads", self.env.get("UWSGI_THREADS", "4")),
             ("plugin", "rack"),
             ("plugin", "rbrequire"),
@@ -267,6 +302,8 @@ class WsgiWorker(UwsgiWorker):
     def update_settings(self) -> None:
         self.settings += [
             ("module", self.command),
+            # Exit if the app can't be loaded (instead of serving errors)
+            ("need-app", "true"),
             ("threads", self.env.get("UWSGI_THREADS", "4")),
             ("plugin", "python3"),
         ]
@@ -286,6 +323,8 @@ class WsgiWorker(UwsgiWorker):
         # If running under nginx, don't expose a port at all
         if "NGINX_SERVER_NAME" in self.env:
             sock = c.NGINX_ROOT / f"{self.app_name}.sock"
+            if self.generation:
+                sock = sock.with_suffix(f".{self.generation}.sock")
             self.log(f"nginx will talk to uWSGI via {sock}")
             self.settings += [
                 ("socket", sock),
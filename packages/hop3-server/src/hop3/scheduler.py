@@ -0,0 +1,121 @@
+# Copyright (c) 2025, Abilian SAS
+#
+# SPDX-License-Identifier: Apache-2.0
+"""Concurrent deploys of several apps (e.g. after a system update).
+
+Deploys run in a pool of threads (at most `DEPLOY_MAX_PARALLEL` at once).
+Their phases are further limited by `DeploySlots`: few builds (CPU-bound)
+run at the same time, while more deploys can update their sources or spawn
+their workers (IO-bound).
+
+The output of each deploy is captured in the app's `log/deploy.log` (and
+also sent to the caller's console when a single app is deployed). Deploys
+of the same app are never run concurrently.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from hop3 import config as c
+from hop3.deploy import Deployer, DeploySlots
+from hop3.lib import log
+from hop3.lib.console import console, get_output_sink, redirect_output
+from hop3.orm import App, AppRepository, get_session_factory
+
+__all__ = ["DeployResult", "DeployScheduler"]
+
+# Per-app locks, shared by all schedulers of the process
+_app_locks: dict[str, threading.Lock] = {}
+_app_locks_lock = threading.Lock()
+
+
+def get_app_lock(app_name: str) -> threading.Lock:
+    with _app_locks_lock:
+        return _app_locks.setdefault(app_name, threading.Lock())
+
+
+@dataclass(frozen=True)
+class DeployResult:
+    app_name: str
+    ok: bool
+    duration: float
+    error: str = ""
+
+
+@dataclass
+class DeployScheduler:
+    max_parallel: int = field(default_factory=lambda: c.DEPLOY_MAX_PARALLEL)
+    slots: DeploySlots = field(default_factory=DeploySlots.create)
+    # Run all the phases of the deploys (see `Deployer.force`)
+    force: bool = False
+
+    def deploy(self, app_names: list[str], *, newrev: str = "") -> list[DeployResult]:
+        """Deploy the given apps concurrently, and return the results (in the
+        same order)."""
+        if not app_names:
+            return []
+
+        max_workers = min(self.max_parallel, len(app_names))
+        with ThreadPoolExecutor(max_workers, thread_name_prefix="hop3-deploy") as pool:
+            # Progress messages go to the caller's console (or output sink)
+            futures = [
+                pool.submit(
+                    contextvars.copy_context().run,
+                    self._deploy_one,
+                    app_name,
+                    newrev,
+                    tee=len(app_names) == 1,
+                )
+                for app_name in app_names
+            ]
+            return [future.result() for future in futures]
+
+    def deploy_app(self, app_name: str, newrev: str = "") -> None:
+        """Deploy one app (called in a worker thread)."""
+        # ORM sessions (and objects) must not be shared between threads
+        session_factory = get_session_factory()
+        with session_factory() as db_session:
+            app = AppRepository(session=db_session).get_one(App.name == app_name)
+            deployer = Deployer(app, slots=self.slots, force=self.force)
+            deployer.deploy(newrev=newrev)
+
+    def _deploy_one(
+        self, app_name: str, newrev: str, *, tee: bool = False
+    ) -> DeployResult:
+        log(f"Deploying app '{app_name}'", level=0, fg="green")
+
+        log_path = App(name=app_name).log_path
+        log_path.mkdir(parents=True, exist_ok=True)
+        log_file = log_path / "deploy.log"
+
+        caller_echo = get_output_sink() or console.echo
+
+        t0 = time.time()
+        error = ""
+        with get_app_lock(app_name), log_file.open("w") as fd:
+
+            def write(line: str) -> None:
+                fd.write(line + "\n")
+                fd.flush()
+                if tee:
+                    caller_echo(line)
+
+            with redirect_output(write):
+                try:
+                    self.deploy_app(app_name, newrev)
+                except Exception as e:
+                    write(traceback.format_exc())
+                    error = str(e) or e.__class__.__name__
+
+        duration = time.time() - t0
+        if error:
+            log(f"Deploy of '{app_name}' failed, see {log_file}", fg="red")
+        else:
+            log(f"App '{app_name}' deployed in {duration:.1f}s", fg="green")
+        return DeployResult(app_name, not error, duration, error)
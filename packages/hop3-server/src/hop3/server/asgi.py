@@ -1,20 +1,50 @@
 # Copyright (c) 2023-2025, Abilian SAS
 from __future__ import annotations
 
+from contextlib import asynccontextmanager
 from typing import TYPE_CHECKING
 
 from starlette.applications import Starlette
 
+from hop3.core.capabilities import warm_host_capabilities
+from hop3.core.maintenance import start_git_maintenance, stop_git_maintenance
+from hop3.orm import init_database, shutdown_database
+from hop3.plugins.nginx import get_reload_coordinator
+from hop3.run.autoscaler import start_autoscaler, stop_autoscaler
+
+from .dispatcher import get_dispatcher, shutdown_dispatcher
 from .lib.scanner import scan_package
 from .singletons import router
 
 if TYPE_CHECKING:
-    pass
+    from collections.abc import AsyncGenerator
 
 DEBUG = True
 
 
+@asynccontextmanager
+async def lifespan(app: Starlette) -> AsyncGenerator[None]:
+    # Create the (pooled) database engine once, for the whole process,
+    # and make sure the schema is up to date.
+    init_database()
+    # Load the commands, ready to be dispatched
+    get_dispatcher()
+    # Probe the host once, instead of on each deploy
+    warm_host_capabilities()
+    start_autoscaler()
+    start_git_maintenance()
+    try:
+        yield
+    finally:
+        stop_git_maintenance()
+        stop_autoscaler()
+        shutdown_dispatcher()
+        # Don't lose the nginx configs changed by the last commands
+        get_reload_coordinator().flush_safely()
+        shutdown_database()
+
+
 def create_app():
     scan_package("hop3.server.views")
     routes = list(router)
-    return Starlette(debug=DEBUG, routes=routes)
+    return Starlette(debug=DEBUG, routes=routes, lifespan=lifespan)
@@ -18,6 +18,7 @@ from tempfile import NamedTemporaryFile
 from hop3 import config as c
 from hop3.lib import Abort, echo
 from hop3.lib.registry import register
+from hop3.orm import init_database
 from hop3.oses.ubuntu2204 import setup_system
 from hop3.server.cli import Command
 
@@ -69,6 +70,9 @@ class SetupCmd(Command):
             for k, v in settings:
                 h.write(f"{k:s} = {v}\n")
 
+        # Create (or update) the database schema
+        init_database()
+
 
 @register
 class SetupSshCmd(Command):
@@ -140,3 +144,15 @@ class SetupSshCmd(Command):
         )
         authorized_keys.parent.chmod(stat.S_IRUSR | stat.S_IWUSR | stat.S_IXUSR)
         authorized_keys.chmod(stat.S_IRUSR | stat.S_IWUSR)
+
+
+@register
+class MigrateCmd(Command):
+    """Create or update the database schema."""
+
+    name = "migrate"
+
+    def run(self) -> None:
+        database = init_database(migrate_schema=False)
+        echo(f"Migrating database '{database.uri}'.", fg="green")
+        database.migrate()
@@ -0,0 +1,217 @@
+# Copyright (c) 2025, Abilian SAS
+"""Dispatch of CLI commands received by the RPC (and debug CLI) views.
+
+Most commands block (they run subprocesses, build apps, etc.), so they
+are run in a bounded thread pool, to keep the event loop free for other
+clients:
+
+- Pure in-memory commands (`Command.inline`, e.g. `help`) stay on a fast
+  path and are run directly on the event loop. Commands which touch the
+  database or the filesystem (even read-only ones, like `apps`) always
+  go to the pool.
+- Commands which return a lock key (`Command.lock_key()`, usually the app
+  name) are serialized per key, so that e.g. two deploys of the same app
+  never overlap.
+
+Commands can also be streamed (`Dispatcher.stream()`): the items they yield,
+and their console output, are sent to the client as they are produced,
+through a bounded queue (so a slow client slows down the command, instead
+of the output piling up in memory).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import threading
+import traceback
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from hop3 import config as c
+from hop3.commands import Command
+from hop3.lib.console import redirect_output
+from hop3.lib.registry import lookup
+from hop3.lib.scanner import scan_package
+from hop3.orm import get_session_factory
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncGenerator, AsyncIterator, Callable, Iterator
+
+__all__ = ["Dispatcher", "get_dispatcher", "shutdown_dispatcher"]
+
+# Max number of items waiting to be sent to a streaming client
+STREAM_QUEUE_SIZE = 256
+
+# End of stream marker
+_DONE = object()
+
+
+@dataclass
+class Dispatcher:
+    commands: dict[str, type[Command]]
+    max_workers: int = c.RPC_WORKERS
+
+    _executor: ThreadPoolExecutor | None = field(default=None, init=False)
+    # Per-key locks, with the number of pending calls holding a reference
+    # (locks are dropped when unused).
+    _locks: dict[str, tuple[asyncio.Lock, int]] = field(
+        default_factory=dict, init=False
+    )
+    # Running streamed commands
+    _tasks: set[asyncio.Task] = field(default_factory=set, init=False)
+
+    async def dispatch(self, command_name: str, args: list[str]) -> list[dict]:
+        """Run the command, without blocking the event loop."""
+        command_class = self.get_command_class(command_name)
+
+        if command_class.inline and "db_session" not in command_class.__annotations__:
+            return self.call(command_name, args)
+
+        lock_key = command_class.lock_key(*args)
+        return await self._submit(lock_key, self.call, command_name, args)
+
+    async def stream(self, command_name: str, args: list[str]) -> AsyncIterator[dict]:
+        """Run the command in the pool, yielding its output as it comes.
+
+        If the client goes away, the command still runs to completion
+        (e.g. a deploy is not interrupted halfway), its output is dropped.
+        """
+        command_class = self.get_command_class(command_name)
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        closed = threading.Event()
+
+        def put(item) -> None:
+            # Called from the worker thread: blocks while the queue is full
+            if closed.is_set():
+                return
+            future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+            while not closed.is_set():
+                done, _ = futures.wait([future], timeout=0.5)
+                if done:
+                    return
+            future.cancel()
+
+        def produce() -> None:
+            try:
+                with redirect_output(lambda text: put({"t": "text", "text": text})):
+                    for item in self.iter_call(command_name, args):
+                        put(item)
+            except Exception as e:
+                traceback.print_exc()
+                put({"t": "error", "text": str(e) or e.__class__.__name__})
+            finally:
+                put(_DONE)
+
+        # The task is not bound to this generator, so the lock (if any)
+        # is held until the command has actually finished.
+        lock_key = command_class.lock_key(*args)
+        task = asyncio.create_task(self._submit(lock_key, produce))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+        try:
+            while (item := await queue.get()) is not _DONE:
+                yield item
+        finally:
+            closed.set()
+
+    def call(self, command_name: str, args: list[str]) -> list[dict]:
+        """Run the command synchronously, in the current thread."""
+        return list(self.iter_call(command_name, args))
+
+    def iter_call(self, command_name: str, args: list[str]) -> Iterator[dict]:
+        """Run the command in the current thread, yielding its output.
+
+        `Command.call()` can return either a list of items, or a generator.
+        """
+        command_class = self.get_command_class(command_name)
+
+        if "db_session" not in command_class.__annotations__:
+            yield from command_class().call(*args)
+            return
+
+        # Sessions are not thread-safe: each call gets its own session
+        # (but connections come from the shared pool).
+        session_factory = get_session_factory()
+        with session_factory() as db_session:
+            command = command_class(db_session=db_session)
+            yield from command.call(*args)
+
+    @property
+    def locked_keys(self) -> list[str]:
+        """The lock keys held (or waited for) by pending calls."""
+        return list(self._locks)
+
+    def get_command_class(self, command_name: str) -> type[Command]:
+        command_class = self.commands.get(command_name)
+        if command_class is None:
+            msg = f"Command {command_name} not found"
+            raise ValueError(msg)
+        return command_class
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def _submit(self, lock_key: str | None, func: Callable, *args):
+        """Run `func(*args)` in the pool, holding the given lock (if any)."""
+        if lock_key is None:
+            return await self._run_in_executor(func, *args)
+
+        async with self._lock(lock_key):
+            return await self._run_in_executor(func, *args)
+
+    async def _run_in_executor(self, func: Callable, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="hop3-rpc"
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    @contextlib.asynccontextmanager
+    async def _lock(self, key: str) -> AsyncGenerator[None]:
+        lock, count = self._locks.get(key, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._locks[key] = (lock, count + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, count = self._locks[key]
+            if count == 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, count - 1)
+
+
+# The process-wide dispatcher, shared by the views
+_dispatcher: Dispatcher | None = None
+_lock = threading.Lock()
+
+
+def get_dispatcher() -> Dispatcher:
+    global _dispatcher  # noqa: PLW0603
+
+    with _lock:
+        if _dispatcher is None:
+            scan_package("hop3.commands")
+            commands = {command.name: command for command in lookup(Command)}
+            _dispatcher = Dispatcher(commands)
+        return _dispatcher
+
+
+def shutdown_dispatcher() -> None:
+    """Wait for running commands, and stop the worker threads."""
+    global _dispatcher  # noqa: PLW0603
+
+    with _lock:
+        if _dispatcher is not None:
+            _dispatcher.shutdown()
+            _dispatcher = None
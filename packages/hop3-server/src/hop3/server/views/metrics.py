@@ -0,0 +1,36 @@
+# Copyright (c) 2025, Abilian SAS
+"""Request metrics of the apps, for Prometheus.
+
+Scrape with e.g.:
+
+```yaml
+scrape_configs:
+  - job_name: hop3
+    static_configs:
+      - targets: ["localhost:8000"]
+```
+"""
+
+from __future__ import annotations
+
+from starlette.responses import PlainTextResponse
+
+from hop3 import config as c
+from hop3.logs import format_prometheus, get_app_metrics
+from hop3.server.singletons import router
+
+
+@router.get("/metrics")
+def metrics(request):
+    """
+    Metrics view (Prometheus text format).
+    """
+    apps = {}
+    if c.APP_ROOT.exists():
+        for app_path in sorted(c.APP_ROOT.iterdir()):
+            log_path = app_path / "log"
+            if log_path.is_dir():
+                apps[app_path.name] = get_app_metrics(app_path.name, log_path)
+    return PlainTextResponse(
+        format_prometheus(apps), media_type="text/plain; version=0.0.4"
+    )
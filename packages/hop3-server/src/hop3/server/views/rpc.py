@@ -5,21 +5,16 @@ import json
 import traceback
 from typing import TYPE_CHECKING
 
-from devtools import debug
 from starlette.exceptions import HTTPException
-from starlette.responses import Response
+from starlette.responses import Response, StreamingResponse
 
-from hop3.commands import Command
-from hop3.lib.registry import lookup
-from hop3.lib.scanner import scan_package
-from hop3.orm import get_session_factory
+from hop3.server.dispatcher import get_dispatcher
 from hop3.server.singletons import router
 
 if TYPE_CHECKING:
-    from starlette.requests import Request
+    from collections.abc import AsyncIterator
 
-scan_package("hop3.commands")
-commands = {command.name: command for command in lookup(Command)}
+    from starlette.requests import Request
 
 
 @router.post("/rpc")
@@ -34,7 +29,7 @@ async def handle_rpc(request: Request):
     args = params[1:]
 
     try:
-        result = call(command, args)
+        result = await get_dispatcher().dispatch(command, args)
         result_rpc = {"jsonrpc": "2.0", "result": result, "id": 1}
         json_result = json.dumps(result_rpc)
         return Response(json_result, media_type="application/json")
@@ -43,23 +38,28 @@ async def handle_rpc(request: Request):
         raise HTTPException(status_code=400, detail=str(e))
 
 
-def call(command_name: str, args: list[str]):
-    debug(command_name, args)
-    command_class = commands.get(command_name)
-    if command_class is None:
-        msg = f"Command {command_name} not found"
-        raise ValueError(msg)
+@router.post("/rpc/stream")
+async def handle_rpc_stream(request: Request):
+    """Same as `/rpc`, but stream the result as NDJSON (one item per line),
+    as it is produced by the command."""
+    json_request = await request.json()
+
+    method = json_request["method"]
+    assert method == "cli"
+
+    params = json_request["params"][0]
+    command = params[0]
+    args = params[1:]
 
-    session_factory = get_session_factory()
-    with session_factory() as db_session:
-        class_args = {}
+    dispatcher = get_dispatcher()
+    try:
+        dispatcher.get_command_class(command)
+    except ValueError as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=str(e))
 
-        if "db_session" in command_class.__annotations__:
-            class_args = {"db_session": db_session}
+    async def ndjson() -> AsyncIterator[str]:
+        async for item in dispatcher.stream(command, args):
+            yield json.dumps(item) + "\n"
 
-        debug(command_class, class_args)
-        command = command_class(**class_args)
-        debug(command)
-        result = command.call(*args)
-        debug(result)
-        return result
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
@@ -0,0 +1,86 @@
+# Copyright (c) 2025, Abilian SAS
+from __future__ import annotations
+
+import pytest
+
+from hop3.lib.inotify import Inotify
+from hop3.lib.multi_tail import MultiTail, tail_lines
+
+use_inotify = pytest.mark.parametrize(
+    "use_inotify",
+    [
+        pytest.param(
+            True,
+            marks=pytest.mark.skipif(
+                Inotify.create() is None, reason="inotify not available"
+            ),
+        ),
+        False,
+    ],
+)
+
+
+@pytest.fixture
+def logs(tmp_path):
+    paths = [tmp_path / "web.1.log", tmp_path / "worker.1.log"]
+    for path in paths:
+        path.write_text("old line\n")
+    return paths
+
+
+def take(iterator, n: int) -> list[str]:
+    return [next(iterator) for _ in range(n)]
+
+
+@use_inotify
+def test_follow(logs, use_inotify) -> None:
+    tail = MultiTail(logs, use_inotify=use_inotify, poll_interval=0.01)
+    lines = tail.follow()
+
+    with logs[0].open("a") as fd:
+        fd.write("line 1\nline 2\npart")
+    assert take(lines, 2) == ["web.1    | line 1\n", "web.1    | line 2\n"]
+
+    # Incomplete lines are only returned once complete
+    with logs[0].open("a") as fd:
+        fd.write("ial\n")
+    with logs[1].open("a") as fd:
+        fd.write("line 3\n")
+    assert sorted(take(lines, 2)) == ["web.1    | partial\n", "worker.1 | line 3\n"]
+
+
+@use_inotify
+def test_follow_rotation(logs, use_inotify) -> None:
+    tail = MultiTail(logs, use_inotify=use_inotify, poll_interval=0.01)
+    lines = tail.follow()
+
+    with logs[0].open("a") as fd:
+        fd.write("line 1\n")
+    assert take(lines, 1) == ["web.1    | line 1\n"]
+
+    # E.g. uwsgi's `log-maxsize`
+    logs[0].rename(logs[0].with_suffix(".log.old"))
+    logs[0].write_text("new line\n")
+    assert take(lines, 1) == ["web.1    | new line\n"]
+
+
+def test_initial_tail(logs) -> None:
+    logs[0].write_text("".join(f"line {i}\n" for i in range(100)))
+    lines = list(MultiTail(logs[:1], catch_up=2).initial_tail())
+    assert lines == ["web.1 | line 98\n", "web.1 | line 99\n"]
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 1024])
+@pytest.mark.parametrize("ending", ["", "\n"])
+def test_tail_lines(tmp_path, block_size, ending) -> None:
+    path = tmp_path / "web.1.log"
+    lines = [f"line {i} é\n" for i in range(50)]
+    path.write_text("".join(lines)[:-1] + ending)
+    if not ending:
+        lines[-1] = lines[-1][:-1]
+
+    for n in [0, 1, 2, 10, 50, 100]:
+        assert tail_lines(path, n, block_size) == lines[max(0, len(lines) - n) :]
+
+    path.write_text("")
+    assert tail_lines(path, 10) == []
@@ -5,7 +5,7 @@
 
 from __future__ import annotations
 
-from hop3.lib import prepend_to_path
+from hop3.lib import prepend_to_path, write_if_changed
 
 
 def test_path_no_change() -> None:
@@ -18,3 +18,20 @@ def test_path_change() -> None:
     path = "/usr/local/bin:/usr/bin:/bin"
     result = prepend_to_path(["/usr/local/sbin", "/bin"], path)
     assert result == "/usr/local/sbin:/usr/local/bin:/usr/bin:/bin"
+
+
+def test_write_if_changed(tmp_path) -> None:
+    path = tmp_path / "app.ini"
+    assert write_if_changed(path, "[uwsgi]\n")
+    mtime = path.stat().st_mtime_ns
+    inode = path.stat().st_ino
+
+    # Unchanged: not touched
+    assert not write_if_changed(path, "[uwsgi]\n")
+    assert path.stat().st_mtime_ns == mtime
+    assert path.stat().st_ino == inode
+
+    # Changed: replaced
+    assert write_if_changed(path, "[uwsgi]\nprocesses = 2\n")
+    assert path.read_text() == "[uwsgi]\nprocesses = 2\n"
+    assert [p.name for p in tmp_path.iterdir()] == ["app.ini"]
@@ -0,0 +1,145 @@
+# Copyright (c) 2025, Abilian SAS
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from hop3.core.env import Env
+from hop3.orm import App
+from hop3.plugins.nginx import (
+    NginxCapabilities,
+    NginxVirtualHost,
+    get_loaded_modules,
+)
+
+NGINX_V_OUTPUT = """\
+nginx version: nginx/1.26.3
+built with OpenSSL 3.0.15 3 Sep 2024
+TLS SNI support enabled
+configure arguments: --with-cc-opt='-g -O2' --prefix=/usr/share/nginx \
+--with-http_ssl_module --with-http_v2_module --with-http_v3_module \
+--with-http_gzip_static_module --add-module=/build/ngx_brotli
+"""
+
+OLD_NGINX_V_OUTPUT = """\
+nginx version: nginx/1.18.0 (Ubuntu)
+configure arguments: --with-http_ssl_module --with-http_v2_module
+"""
+
+
+@pytest.fixture
+def nginx_root(tmp_path, monkeypatch) -> Path:
+    monkeypatch.setattr("hop3.plugins.nginx._setup.NGINX_ROOT", tmp_path)
+    monkeypatch.setattr("hop3.plugins.nginx._setup.CACHE_ROOT", tmp_path / "cache")
+    return tmp_path
+
+
+@pytest.fixture
+def env() -> Env:
+    return Env({
+        "PORT": "8000",
+        "NGINX_SERVER_NAME": "testapp.com",
+        "NGINX_IPV4_ADDRESS": "0.0.0.0",
+        "NGINX_IPV6_ADDRESS": "[::]",
+        "BIND_ADDRESS": "127.0.0.1",
+    })
+
+
+def get_conf(name: str, env: Env, capabilities: NginxCapabilities, workers=None):
+    env["APP"] = name
+    nginx = NginxVirtualHost(App(name=name), env, workers or {}, capabilities)
+    nginx.setup()
+    return nginx.nginx_conf_path.read_text()
+
+
+def test_parse() -> None:
+    capabilities = NginxCapabilities.parse(NGINX_V_OUTPUT)
+    assert capabilities.version == (1, 26, 3)
+    assert capabilities.http2
+    assert capabilities.http2_directive
+    assert capabilities.http3
+    assert capabilities.gzip_static
+    assert capabilities.brotli
+    assert capabilities.brotli_static
+    assert not capabilities.zstd
+
+    capabilities = NginxCapabilities.parse(OLD_NGINX_V_OUTPUT, ["http_zstd_filter"])
+    assert capabilities.http2
+    assert not capabilities.http2_directive
+    assert not capabilities.http3
+    assert capabilities.zstd
+    assert not capabilities.zstd_static
+
+
+def test_loaded_modules(tmp_path) -> None:
+    (tmp_path / "50-mod-http-brotli-filter.conf").write_text(
+        "load_module modules/ngx_http_brotli_filter_module.so;\n"
+    )
+    (tmp_path / "50-mod-stream.conf").write_text(
+        "load_module /usr/lib/nginx/modules/ngx_stream_module.so;\n"
+    )
+    assert get_loaded_modules(tmp_path) == ["http_brotli_filter", "stream"]
+    assert get_loaded_modules(tmp_path / "missing") == []
+
+
+@pytest.mark.usefixtures("nginx_root")
+def test_defaults(env: Env) -> None:
+    capabilities = NginxCapabilities.parse(NGINX_V_OUTPUT)
+    conf = get_conf("capsdefault", env, capabilities, {"web": "server"})
+    assert "http2 on;" in conf
+    assert "443 ssl;" in conf
+    assert "quic" not in conf
+    assert "gzip on;" in conf
+    assert "brotli" not in conf
+    assert "ssl_session_cache" not in conf
+    assert "keepalive" not in conf
+    assert 'Connection "upgrade"' in conf
+
+
+@pytest.mark.usefixtures("nginx_root")
+def test_old_nginx(env: Env) -> None:
+    env["NGINX_HTTP3"] = "1"
+    env["NGINX_COMPRESSION"] = "brotli,gzip"
+    conf = get_conf("capsold", env, NginxCapabilities.parse(OLD_NGINX_V_OUTPUT))
+    assert "443 ssl http2;" in conf
+    assert "http2 on;" not in conf
+    # Not supported: ignored
+    assert "quic" not in conf
+    assert "brotli" not in conf
+    assert "gzip on;" in conf
+
+
+@pytest.mark.usefixtures("nginx_root")
+def test_features(env: Env) -> None:
+    env.update({
+        "NGINX_HTTP3": "1",
+        "NGINX_COMPRESSION": "brotli, gzip",
+        "NGINX_PRECOMPRESSED": "1",
+        "NGINX_SSL_SESSION_CACHE": "on",
+        "NGINX_SSL_SESSION_TICKETS": "0",
+        "NGINX_OCSP_STAPLING": "1",
+        "NGINX_UPSTREAM_KEEPALIVE": "16",
+    })
+    workers = {"web": "server"}
+    conf = get_conf("capsall", env, NginxCapabilities.parse(NGINX_V_OUTPUT), workers)
+    assert "listen              [::]:443 quic;" in conf
+    assert "Alt-Svc" in conf
+    assert conf.index("brotli on;") < conf.index("gzip on;")
+    assert "brotli_static on;" in conf
+    assert "gzip_static on;" in conf
+    assert "ssl_session_cache shared:ssl_capsall:10m;" in conf
+    assert "ssl_session_tickets off;" in conf
+    assert "ssl_stapling on;" in conf
+    assert "keepalive 16;" in conf
+    assert "upstream capsall {" in conf
+    assert "proxy_pass http://capsall;" in conf
+    assert "map $http_upgrade $hop3_connection_capsall" in conf
+    assert "proxy_set_header Connection $hop3_connection_capsall;" in conf
+
+
+@pytest.mark.usefixtures("nginx_root")
+def test_compression_off(env: Env) -> None:
+    env["NGINX_COMPRESSION"] = "off"
+    conf = get_conf("capsoff", env, NginxCapabilities.parse(NGINX_V_OUTPUT))
+    assert "gzip on;" not in conf
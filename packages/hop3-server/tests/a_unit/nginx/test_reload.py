@@ -0,0 +1,185 @@
+# Copyright (c) 2025, Abilian SAS
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from hop3 import config as c
+from hop3.orm import App
+from hop3.plugins import nginx
+from hop3.plugins.nginx import NginxCheck, ReloadCoordinator
+from hop3.server.asgi import lifespan
+
+
+@pytest.fixture
+def nginx_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(c, "NGINX_ROOT", tmp_path)
+    monkeypatch.setattr(c, "NGINX_RELOAD_COMMAND", "")
+    return tmp_path
+
+
+@pytest.fixture
+def checks(nginx_root, monkeypatch) -> list[int]:
+    checks = []
+
+    def check_nginx_config() -> NginxCheck:
+        # Like `nginx -t`: the configs with a "broken" directive are invalid
+        checks.append(1)
+        errors = [
+            f'nginx: [emerg] unknown directive "broken" in {path}:1\n'
+            for path in sorted(nginx_root.glob("*.conf"))
+            if "broken" in path.read_text()
+        ]
+        if not errors:
+            return NginxCheck(ok=True)
+        output = "".join(errors)
+        output += "nginx: configuration file /etc/nginx/nginx.conf test failed\n"
+        return NginxCheck(ok=False, output=output)
+
+    monkeypatch.setattr(
+        "hop3.plugins.nginx._reload.check_nginx_config", check_nginx_config
+    )
+    return checks
+
+
+def test_single_reload(nginx_root, checks) -> None:
+    coordinator = ReloadCoordinator(delay=None)
+    for i in range(300):
+        path = nginx_root / f"app{i}.conf"
+        path.write_text("server {}\n")
+        coordinator.add(path, None)
+
+    assert coordinator.flush() == set()
+    assert coordinator.reloads == 1
+    assert len(checks) == 1
+    assert (nginx_root / ".reload").exists()
+
+    # Nothing changed since
+    coordinator.flush()
+    assert coordinator.reloads == 1
+
+
+@pytest.mark.usefixtures("checks")
+def test_rollback(nginx_root) -> None:
+    coordinator = ReloadCoordinator(delay=None)
+    good = nginx_root / "good.conf"
+    good.write_text("server {}\n")
+    coordinator.add(good, "")
+    changed = nginx_root / "changed.conf"
+    changed.write_text("broken;\n")
+    coordinator.add(changed, "server {}\n")
+    new = nginx_root / "new.conf"
+    new.write_text("broken;\n")
+    coordinator.add(new, None)
+
+    assert coordinator.flush() == {changed, new}
+    # Only the broken configs are rolled back
+    assert good.read_text() == "server {}\n"
+    assert changed.read_text() == "server {}\n"
+    assert not new.exists()
+    assert coordinator.reloads == 1
+
+
+@pytest.mark.usefixtures("checks")
+def test_broken_elsewhere(nginx_root) -> None:
+    coordinator = ReloadCoordinator(delay=None)
+    (nginx_root / "other.conf").write_text("broken;\n")
+    path = nginx_root / "app.conf"
+    path.write_text("server {}\n")
+    coordinator.add(path, None)
+
+    # Not caused by this config: kept, but nginx can't be reloaded
+    assert coordinator.flush() == set()
+    assert path.exists()
+    assert coordinator.reloads == 0
+
+
+@pytest.mark.usefixtures("checks")
+def test_debounce(nginx_root) -> None:
+    coordinator = ReloadCoordinator(delay=0.05)
+    for i in range(10):
+        path = nginx_root / f"app{i}.conf"
+        path.write_text("server {}\n")
+        coordinator.add(path, None)
+
+    deadline = time.monotonic() + 5
+    while not coordinator.reloads and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert coordinator.reloads == 1
+    assert coordinator.dirty == {}
+
+
+@pytest.mark.usefixtures("checks")
+def test_no_delay(nginx_root) -> None:
+    coordinator = ReloadCoordinator(delay=0)
+    path = nginx_root / "app.conf"
+    path.write_text("broken;\n")
+    coordinator.add(path, None)
+    assert not path.exists()
+    assert coordinator.rolled_back == {path}
+
+    path.write_text("server {}\n")
+    coordinator.add(path, None)
+    assert coordinator.reloads == 1
+    assert coordinator.rolled_back == set()
+
+
+@pytest.mark.usefixtures("checks")
+def test_destroy(nginx_root, tmp_path, monkeypatch) -> None:
+    for name in ["APP_ROOT", "UWSGI_AVAILABLE", "UWSGI_ENABLED", "UWSGI_STATS"]:
+        path = tmp_path / name.lower()
+        path.mkdir()
+        monkeypatch.setattr(c, name, path)
+    monkeypatch.setattr(c, "ACME_WWW", tmp_path / "acme")
+    monkeypatch.setattr(c, "BUILD_CACHE_ROOT", tmp_path / "build-cache")
+    coordinator = ReloadCoordinator()
+    monkeypatch.setattr("hop3.orm.app.get_reload_coordinator", lambda: coordinator)
+
+    app = App(name="myapp")
+    app.app_path.mkdir()
+    (nginx_root / "myapp.conf").write_text("server {}\n")
+    app.destroy()
+
+    # nginx no longer routes to the app
+    assert not (nginx_root / "myapp.conf").exists()
+    assert coordinator.reloads == 1
+
+
+@pytest.mark.usefixtures("checks")
+def test_flush_at_shutdown(nginx_root, monkeypatch) -> None:
+    for name in [
+        "init_database",
+        "get_dispatcher",
+        "warm_host_capabilities",
+        "start_autoscaler",
+        "start_git_maintenance",
+        "stop_git_maintenance",
+        "stop_autoscaler",
+        "shutdown_dispatcher",
+        "shutdown_database",
+    ]:
+        monkeypatch.setattr(f"hop3.server.asgi.{name}", lambda: None)
+    coordinator = ReloadCoordinator(delay=60)
+    monkeypatch.setattr("hop3.server.asgi.get_reload_coordinator", lambda: coordinator)
+
+    async def serve() -> None:
+        async with lifespan(None):
+            path = nginx_root / "app.conf"
+            path.write_text("server {}\n")
+            coordinator.add(path, None)
+            assert coordinator.reloads == 0
+
+    asyncio.run(serve())
+    assert coordinator.reloads == 1
+
+
+def test_check_skipped(monkeypatch) -> None:
+    # E.g. sudo not allowed: the configs can't be checked
+    monkeypatch.setattr(
+        c, "NGINX_CHECK_COMMAND", "echo 'sudo: a password is required'; false"
+    )
+    result = nginx.check_nginx_config()
+    assert result.ok
+    assert result.skipped
@@ -72,3 +72,12 @@ def test_setup_with_workers(env: Env) -> None:
     workers = {"static": "public"}
     nginx = NginxVirtualHost(App(name="testapp"), env, workers)
     nginx.setup()
+
+
+def test_setup_unchanged(env: Env) -> None:
+    workers = {"static": "public"}
+    NginxVirtualHost(App(name="testapp"), env.copy(), workers).setup()
+    assert not NginxVirtualHost(App(name="testapp"), env.copy(), workers).setup()
+
+    env["NGINX_HTTPS_ONLY"] = "1"
+    assert NginxVirtualHost(App(name="testapp"), env.copy(), workers).setup()
@@ -0,0 +1,24 @@
+# Copyright (c) 2025, Abilian SAS
+from __future__ import annotations
+
+from sqlalchemy import text
+
+from hop3.orm import get_session_factory, init_database, shutdown_database
+
+
+def test_database_is_shared(tmp_path):
+    database_uri = f"sqlite:///{tmp_path}/hop3.db"
+    try:
+        database = init_database(database_uri)
+        assert init_database(database_uri) is database
+        assert get_session_factory() is database.session_factory
+    finally:
+        shutdown_database()
+
+
+def test_sqlite_wal_mode(tmp_path):
+    database_uri = f"sqlite:///{tmp_path}/hop3.db"
+    session_factory = get_session_factory(database_uri)
+    with session_factory() as db_session:
+        journal_mode = db_session.execute(text("PRAGMA journal_mode")).scalar()
+        assert journal_mode == "wal"
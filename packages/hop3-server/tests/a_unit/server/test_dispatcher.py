@@ -0,0 +1,135 @@
+# Copyright (c) 2025, Abilian SAS
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from typing import ClassVar
+
+import pytest
+
+from hop3.commands import Command
+from hop3.lib import echo, shell
+from hop3.server.dispatcher import Dispatcher, get_dispatcher
+
+
+class ListCmd(Command):
+    name = "list"
+    inline = True
+
+    def call(self, *args):
+        return [threading.current_thread().name]
+
+
+class SlowCmd(Command):
+    name = "slow"
+
+    running: ClassVar[dict[str, int]] = {}
+    max_running: ClassVar[dict[str, int]] = {}
+
+    @classmethod
+    def lock_key(cls, *args) -> str | None:
+        return args[0]
+
+    def call(self, *args):
+        key = args[0]
+        self.running[key] = self.running.get(key, 0) + 1
+        self.max_running[key] = max(self.max_running.get(key, 0), self.running[key])
+        time.sleep(0.1)
+        self.running[key] -= 1
+        return [threading.current_thread().name]
+
+
+class BuildCmd(Command):
+    name = "build"
+
+    def call(self, *args):
+        echo("Building")
+        shell("echo compiling; echo linking")
+        yield {"t": "text", "text": "Done"}
+        if args:
+            msg = "Build failed"
+            raise ValueError(msg)
+
+
+def make_dispatcher() -> Dispatcher:
+    commands = {"list": ListCmd, "slow": SlowCmd, "build": BuildCmd}
+    return Dispatcher(commands, max_workers=4)
+
+
+def test_inline_commands() -> None:
+    dispatcher = make_dispatcher()
+    result = asyncio.run(dispatcher.dispatch("list", []))
+    assert result == [threading.current_thread().name]
+
+
+def test_inline_commands_dont_use_the_database() -> None:
+    commands = get_dispatcher().commands
+    assert commands["help"].inline
+    assert not commands["apps"].inline
+    for command_class in commands.values():
+        if command_class.inline:
+            assert "db_session" not in command_class.__annotations__
+
+
+def test_blocking_commands_run_in_pool() -> None:
+    dispatcher = make_dispatcher()
+
+    async def main():
+        return await asyncio.gather(
+            dispatcher.dispatch("slow", ["app1"]),
+            dispatcher.dispatch("slow", ["app1"]),
+            dispatcher.dispatch("slow", ["app2"]),
+            dispatcher.dispatch("slow", ["app3"]),
+        )
+
+    t0 = time.perf_counter()
+    results = asyncio.run(main())
+    duration = time.perf_counter() - t0
+    dispatcher.shutdown()
+
+    assert all(result[0].startswith("hop3-rpc") for result in results)
+    # Calls for the same app are serialized, the others run concurrently
+    assert SlowCmd.max_running == {"app1": 1, "app2": 1, "app3": 1}
+    # (The two calls for app1 ran one after the other)
+    assert duration >= 0.2
+    assert not dispatcher.locked_keys
+
+
+def test_unknown_command() -> None:
+    dispatcher = make_dispatcher()
+    with pytest.raises(ValueError, match="not found"):
+        asyncio.run(dispatcher.dispatch("unknown", []))
+
+
+def test_stream() -> None:
+    dispatcher = make_dispatcher()
+
+    async def main():
+        return [item async for item in dispatcher.stream("build", [])]
+
+    items = asyncio.run(main())
+    dispatcher.shutdown()
+
+    texts = [item["text"] for item in items]
+    assert texts[0] == "Building"
+    assert texts[-3:] == ["compiling", "linking", "Done"]
+
+
+def test_stream_error() -> None:
+    dispatcher = make_dispatcher()
+
+    async def main():
+        return [item async for item in dispatcher.stream("build", ["fail"])]
+
+    items = asyncio.run(main())
+    dispatcher.shutdown()
+
+    assert items[-1] == {"t": "error", "text": "Build failed"}
+
+
+def test_generator_commands_are_collected() -> None:
+    dispatcher = make_dispatcher()
+    result = asyncio.run(dispatcher.dispatch("build", []))
+    dispatcher.shutdown()
+    assert result == [{"t": "text", "text": "Done"}]
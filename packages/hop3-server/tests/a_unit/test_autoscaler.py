@@ -0,0 +1,93 @@
+# Copyright (c) 2025, Abilian SAS
+from __future__ import annotations
+
+import pytest
+
+from hop3 import config as c
+from hop3.orm import App
+from hop3.run import autoscaler, spawn
+from hop3.run.autoscaler import AutoscalePolicy, Autoscaler, get_policies
+from hop3.run.spawn import AppLauncher
+from hop3.run.uwsgi.stats import VassalStats, WorkerStats
+
+
+def test_parse_policy() -> None:
+    assert AutoscalePolicy.parse("web", "2:8:p95<200ms") == AutoscalePolicy(
+        "web", 2, 8, "p95", 200
+    )
+    assert AutoscalePolicy.parse("wsgi", "1:4:p99 < 1.5s").target == 1500
+    assert AutoscalePolicy.parse("wsgi", "1:4") == AutoscalePolicy(
+        "wsgi", 1, 4, "busy", 75
+    )
+    for value in ["4:2", "1", "1:4:p95<20%", "1:4:cpu<50%", "0:0"]:
+        with pytest.raises(ValueError, match="Invalid autoscaling"):
+            AutoscalePolicy.parse("web", value)
+
+    env = {"HOP3_AUTOSCALE_WSGI": "1:4:queue<50%", "OTHER": "x"}
+    assert get_policies(env) == [AutoscalePolicy("wsgi", 1, 4, "queue", 50)]
+
+
+def test_desired_count() -> None:
+    policy = AutoscalePolicy("wsgi", 1, 8, "p95", 200)
+    # Up, proportionally
+    assert policy.get_desired_count(2, 500) == 5
+    assert policy.get_desired_count(4, 1000) == 8
+    # Hysteresis: no change near the target
+    assert policy.get_desired_count(2, 210) == 2
+    assert policy.get_desired_count(2, 150) == 2
+    # Down, one at a time
+    assert policy.get_desired_count(4, 50) == 3
+    assert policy.get_desired_count(1, 0) == 1
+
+
+def make_vassal(ordinal: int, busy: int, total: int) -> VassalStats:
+    workers = [
+        WorkerStats(id=i, pid=i, status="busy" if i < busy else "idle")
+        for i in range(total)
+    ]
+    return VassalStats(
+        f"myapp_wsgi.{ordinal}", "myapp", "wsgi", ordinal, workers=workers
+    )
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    for name in ["APP_ROOT", "UWSGI_AVAILABLE", "UWSGI_ENABLED", "UWSGI_STATS"]:
+        path = tmp_path / name.lower()
+        path.mkdir()
+        monkeypatch.setattr(c, name, path)
+    monkeypatch.setattr(spawn, "UWSGI_ENABLED", c.UWSGI_ENABLED)
+
+    app = App(name="myapp")
+    app.src_path.mkdir(parents=True)
+    (app.src_path / "Procfile").write_text("wsgi: myapp:app\n")
+    (app.app_path / "ENV").write_text("HOP3_AUTOSCALE_WSGI=1:4:busy<50%\n")
+    AppLauncher(app).spawn_app()
+    return app
+
+
+def test_autoscaler(app, monkeypatch) -> None:
+    vassals = [make_vassal(1, busy=2, total=2)]
+    monkeypatch.setattr(autoscaler, "collect_stats", lambda app_name: vassals)
+    scaler = Autoscaler(up_cooldown=60, down_cooldown=300)
+
+    def enabled_configs() -> list[str]:
+        return sorted(path.name for path in c.UWSGI_ENABLED.iterdir())
+
+    assert enabled_configs() == ["myapp_wsgi.1.ini"]
+    scaler.run_once(now=1000)
+    assert enabled_configs() == ["myapp_wsgi.1.ini", "myapp_wsgi.2.ini"]
+    assert "wsgi:2" in (app.virtualenv_path / "SCALING").read_text()
+
+    # Still overloaded, but in the cooldown
+    scaler.run_once(now=1030)
+    assert len(enabled_configs()) == 2
+    scaler.run_once(now=1100)
+    assert len(enabled_configs()) == 4
+
+    # Idle: down, one at a time, after the (longer) cooldown
+    vassals[:] = [make_vassal(i, busy=0, total=2) for i in range(1, 5)]
+    scaler.run_once(now=1200)
+    assert len(enabled_configs()) == 4
+    scaler.run_once(now=1400)
+    assert enabled_configs() == [f"myapp_wsgi.{i}.ini" for i in range(1, 4)]
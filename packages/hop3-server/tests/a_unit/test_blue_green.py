@@ -0,0 +1,173 @@
+# Copyright (c) 2025, Abilian SAS
+from __future__ import annotations
+
+import http.server
+import socket
+import struct
+import threading
+
+import pytest
+
+from hop3 import config as c
+from hop3.lib import Abort, get_http_status, wait_for_listener, wait_until_healthy
+from hop3.orm import App
+from hop3.plugins.nginx import NginxVirtualHost
+from hop3.run import spawn
+from hop3.run.spawn import AppLauncher
+
+ENV = """\
+NGINX_SERVER_NAME=myapp.example.com
+HOP3_BLUE_GREEN=1
+HOP3_DRAIN_TIMEOUT=0
+"""
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    for name in ["APP_ROOT", "NGINX_ROOT", "UWSGI_AVAILABLE", "UWSGI_ENABLED"]:
+        path = tmp_path / name.lower()
+        path.mkdir()
+        monkeypatch.setattr(c, name, path)
+    monkeypatch.setattr(spawn, "UWSGI_ENABLED", c.UWSGI_ENABLED)
+    monkeypatch.setattr("hop3.plugins.nginx._setup.NGINX_ROOT", c.NGINX_ROOT)
+    monkeypatch.setattr("hop3.plugins.nginx._setup.CACHE_ROOT", tmp_path / "cache")
+    monkeypatch.setattr(NginxVirtualHost, "setup_certificates", lambda self: None)
+
+    app = App(name="myapp")
+    app.src_path.mkdir(parents=True)
+    (app.src_path / "Procfile").write_text("wsgi: myapp:app\n")
+    (app.app_path / "ENV").write_text(ENV)
+    return app
+
+
+@pytest.fixture
+def health_checks(monkeypatch):
+    checks = []
+
+    def wait_until_healthy(address, timeout, path):
+        checks.append(address)
+        return "fail" not in checks
+
+    monkeypatch.setattr(spawn, "wait_until_healthy", wait_until_healthy)
+    return checks
+
+
+def enabled_configs() -> list[str]:
+    return sorted(path.name for path in c.UWSGI_ENABLED.iterdir())
+
+
+def test_blue_green_swap(app, health_checks) -> None:
+    # Workers started without blue/green
+    (c.UWSGI_ENABLED / "myapp_wsgi.1.ini").write_text("")
+
+    AppLauncher(app).spawn_app()
+    assert enabled_configs() == ["myapp_wsgi.1.blue.ini"]
+    assert health_checks == [f"unix://{c.NGINX_ROOT}/myapp.blue.sock"]
+    assert "myapp.blue.sock" in (c.NGINX_ROOT / "myapp.conf").read_text()
+    assert "myapp.blue.sock" in (c.UWSGI_ENABLED / "myapp_wsgi.1.blue.ini").read_text()
+
+    AppLauncher(app).spawn_app()
+    assert enabled_configs() == ["myapp_wsgi.1.green.ini"]
+    assert "myapp.green.sock" in (c.NGINX_ROOT / "myapp.conf").read_text()
+
+
+def test_update_in_place(app, health_checks) -> None:
+    AppLauncher(app).spawn_app()
+    assert enabled_configs() == ["myapp_wsgi.1.blue.ini"]
+
+    # The code didn't change: no new generation
+    (app.app_path / "ENV").write_text(ENV + "UWSGI_PROCESSES=4\n")
+    AppLauncher(app, restart=False).spawn_app()
+    assert enabled_configs() == ["myapp_wsgi.1.blue.ini"]
+    assert len(health_checks) == 1
+    assert "myapp.blue.sock" in (c.NGINX_ROOT / "myapp.conf").read_text()
+    config = (c.UWSGI_ENABLED / "myapp_wsgi.1.blue.ini").read_text()
+    assert "processes = 4" in config
+
+
+@pytest.mark.parametrize("restart", [True, False])
+def test_blue_green_disabled(app, health_checks, restart) -> None:
+    AppLauncher(app).spawn_app()
+    assert enabled_configs() == ["myapp_wsgi.1.blue.ini"]
+
+    (app.app_path / "ENV").write_text(
+        ENV.replace("HOP3_BLUE_GREEN=1", "HOP3_BLUE_GREEN=0")
+        + "HOP3_AUTO_RESTART=false\n"
+    )
+    AppLauncher(app, restart=restart).spawn_app()
+    assert enabled_configs() == ["myapp_wsgi.1.ini"]
+    assert not (app.app_path / spawn.GENERATION_FILE).exists()
+    assert "myapp.sock" in (c.NGINX_ROOT / "myapp.conf").read_text()
+
+    # Scaling no longer targets the last generation
+    AppLauncher(app).scale({"wsgi": 2})
+    assert enabled_configs() == ["myapp_wsgi.1.ini", "myapp_wsgi.2.ini"]
+
+
+def test_failed_health_check(app, health_checks) -> None:
+    AppLauncher(app).spawn_app()
+    nginx_conf = (c.NGINX_ROOT / "myapp.conf").read_text()
+
+    health_checks.append("fail")
+    with pytest.raises(Abort, match="not ready"):
+        AppLauncher(app).spawn_app()
+
+    # The current workers are still used
+    assert enabled_configs() == ["myapp_wsgi.1.blue.ini"]
+    assert (c.NGINX_ROOT / "myapp.conf").read_text() == nginx_conf
+
+
+def test_wait_for_listener() -> None:
+    with socket.create_server(("127.0.0.1", 0)) as server:
+        port = server.getsockname()[1]
+        assert wait_for_listener(f"127.0.0.1:{port}", timeout=1)
+    assert not wait_for_listener(f"127.0.0.1:{port}", timeout=0)
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        self.send_response(200 if self.path == "/health" else 404)
+        self.end_headers()
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def test_http_health_check() -> None:
+    server = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        address = f"127.0.0.1:{server.server_port}"
+        assert get_http_status(address, "/health") == 200
+        assert wait_until_healthy(address, timeout=1, path="/health")
+        # Not a server error
+        assert wait_until_healthy(address, timeout=1)
+        assert not wait_until_healthy(address, timeout=0, path="/missing")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_uwsgi_health_check(tmp_path) -> None:
+    socket_path = tmp_path / "app.sock"
+    requests = []
+
+    def serve(server) -> None:
+        connection, _ = server.accept()
+        with connection:
+            _, size, _ = struct.unpack("<BHB", connection.recv(4))
+            requests.append(connection.recv(size))
+            # E.g. an app which failed to load
+            connection.sendall(b"HTTP/1.1 500 Internal Server Error\r\n\r\n")
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(str(socket_path))
+        server.listen()
+        thread = threading.Thread(target=serve, args=(server,))
+        thread.start()
+        assert get_http_status(f"unix://{socket_path}", "/health?full=1") == 500
+        thread.join()
+
+    assert b"REQUEST_URI\x0e\x00/health?full=1" in requests[0]
+    assert b"PATH_INFO\x07\x00/health" in requests[0]
+    assert get_http_status(f"unix://{socket_path}") == 0
@@ -0,0 +1,170 @@
+# Copyright (c) 2025, Abilian SAS
+from __future__ import annotations
+
+import os
+import shutil
+
+import pytest
+
+from hop3 import config as c
+from hop3.builders import BuildCache, PackageCache, get_build_caches
+
+STAMP_FILE = ".hop3-build-key"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return BuildCache("python", root=tmp_path / "cache")
+
+
+def test_key(cache, tmp_path):
+    lockfile = tmp_path / "requirements.txt"
+    lockfile.write_text("flask")
+    key = cache.compute_key([lockfile, tmp_path / "uv.lock"], "3.12")
+
+    assert cache.compute_key([lockfile], "3.12") == key
+    assert cache.compute_key([lockfile], "3.13") != key
+
+    lockfile.write_text("flask\nrequests")
+    assert cache.compute_key([lockfile], "3.12") != key
+
+
+def test_store_and_restore(cache, tmp_path):
+    venv = tmp_path / "venv"
+    (venv / "lib").mkdir(parents=True)
+    (venv / "lib" / "module.py").write_text("x = 1")
+
+    assert not cache.reuse("key1", venv)
+    cache.store("key1", venv)
+    assert cache.is_current("key1", venv)
+    assert cache.reuse("key1", venv)
+
+    # Another set of dependencies
+    cache.store("key2", venv)
+    assert not cache.is_current("key1", venv)
+    assert cache.is_current("key2", venv)
+
+    # Back to the first one: restored from the cache (as hardlinks)
+    assert cache.reuse("key1", venv)
+    assert cache.is_current("key1", venv)
+    module = venv / "lib" / "module.py"
+    assert module.read_text() == "x = 1"
+    assert module.stat().st_nlink > 1
+
+    # The cached copy is not affected by the new stamp
+    cached = cache.get_path("key1")
+    assert (cached / STAMP_FILE).read_text() == "key1"
+    assert not list(tmp_path.glob("venv.*"))
+
+
+def test_package_cache_prune(tmp_path):
+    package_cache = PackageCache(root=tmp_path)
+    env = package_cache.get_env()
+    assert env["PIP_CACHE_DIR"] == str(tmp_path / "pip")
+
+    pip_cache = tmp_path / "pip"
+    pip_cache.mkdir()
+    for i in range(5):
+        path = pip_cache / f"wheel{i}"
+        path.write_bytes(b"x" * 1000)
+        # wheel0 is the least recently used
+        os.utime(path, (1000 + i, 1000 + i))
+
+    assert package_cache.usage()[0].size == 5000
+
+    removed, freed = package_cache.prune(max_size=3000)
+    assert (removed, freed) == (2, 2000)
+    assert sorted(p.name for p in pip_cache.iterdir()) == [
+        "wheel2",
+        "wheel3",
+        "wheel4",
+    ]
+
+
+def make_tree(path, content: str) -> None:
+    (path / "lib").mkdir(parents=True)
+    (path / "lib" / "module.py").write_text(content)
+
+
+def test_prune(cache, tmp_path):
+    venv = tmp_path / "app1" / "venv"
+    make_tree(venv, "x = 1")
+    cache.store("key1", venv)
+
+    # New dependencies: the first tree is no longer installed anywhere
+    shutil.rmtree(venv)
+    make_tree(venv, "x = 2")
+    cache.store("key2", venv)
+    assert [entry.key for entry in cache.entries()] == ["key1", "key2"]
+    assert [cache.is_live(entry) for entry in cache.entries()] == [False, True]
+    # (The module, and the stamp of the cached tree)
+    assert cache.entries()[0].size == 9
+
+    # Recent, and small enough
+    assert cache.prune() == (0, 0)
+    assert cache.prune(max_size=4) == (1, 9)
+    assert [entry.key for entry in cache.entries()] == ["key2"]
+
+    # The installed tree is kept, whatever its age
+    targets_path = cache.get_path("key2").with_name("key2.targets")
+    os.utime(targets_path, (1000, 1000))
+    assert cache.prune(max_size=1) == (0, 0)
+    assert cache.is_current("key2", venv)
+
+
+def test_prune_when_storing(cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(c, "BUILD_CACHE_MAX_SIZE", 1)
+    venv = tmp_path / "app1" / "venv"
+    for key in ["key1", "key2"]:
+        shutil.rmtree(venv, ignore_errors=True)
+        make_tree(venv, key)
+        cache.store(key, venv)
+    # Pruned by the first build only
+    assert [entry.key for entry in cache.entries()] == ["key1", "key2"]
+
+    stamp = cache.root / "python" / ".last-prune"
+    os.utime(stamp, (1000, 1000))
+    shutil.rmtree(venv)
+    make_tree(venv, "key3")
+    cache.store("key3", venv)
+    assert [entry.key for entry in cache.entries()] == ["key3"]
+
+
+def test_prune_by_age(cache, tmp_path):
+    venv = tmp_path / "app1" / "venv"
+    make_tree(venv, "x = 1")
+    cache.store("key1", venv)
+    (venv / STAMP_FILE).unlink()
+
+    targets_path = cache.get_path("key1").with_name("key1.targets")
+    os.utime(targets_path, (1000, 1000))
+    # (Only the stamp of the cached tree was not shared with the app)
+    assert cache.prune(max_age=30) == (1, 4)
+    assert not cache.entries()
+
+
+def test_forget(cache, tmp_path):
+    # Trees shared by two apps (e.g. the same package-lock.json)
+    for app_name in ["app1", "app2"]:
+        tree = tmp_path / app_name / "node_modules"
+        make_tree(tree, "x = 1")
+        cache.store("key1", tree)
+    assert len(cache.entries()[0].targets) == 2
+
+    assert cache.forget(tmp_path / "app1") == 0
+    assert cache.entries()[0].targets == [str(tmp_path / "app2" / "node_modules")]
+    assert cache.forget(tmp_path / "app2") == 1
+    assert not cache.entries()
+    assert get_build_caches(cache.root) == [cache]
+
+
+def test_detach(cache, tmp_path):
+    tree = tmp_path / "node_modules"
+    make_tree(tree, "x = 1")
+    cache.detach(tree)
+    assert tree.exists()
+
+    cache.store("key1", tree)
+    cache.detach(tree)
+    assert not tree.exists()
+    assert (cache.get_path("key1") / "lib" / "module.py").read_text() == "x = 1"
@@ -3,8 +3,17 @@ from __future__ import annotations
 
 import pytest
 
-from hop3.builders import ClojureBuilder, NodeBuilder, PythonBuilder, RubyBuilder
+from hop3 import config as c
+from hop3.builders import (
+    ClojureBuilder,
+    NodeBuilder,
+    PythonBuilder,
+    RubyBuilder,
+    python,
+)
+from hop3.builders.python import get_poetry_constraints
 from hop3.builders.rust import RustBuilder
+from hop3.lib import Abort
 
 
 @pytest.fixture
@@ -46,3 +55,79 @@ def test_clojure_builder(app_path):
     )
     builder = ClojureBuilder("myapp", app_path)
     assert builder.accept()
+
+
+@pytest.fixture
+def python_builder(app_path, monkeypatch):
+    builder = PythonBuilder("myapp", app_path)
+    commands = []
+    monkeypatch.setattr(
+        builder, "shell", lambda command, **kwargs: commands.append(command)
+    )
+    builder.commands = commands
+    return builder
+
+
+@pytest.mark.parametrize(
+    ("setting", "available", "expected"),
+    [
+        ("auto", True, "uv"),
+        ("auto", False, "pip"),
+        ("pip", True, "pip"),
+        ("uv", True, "uv"),
+    ],
+)
+def test_python_installer(python_builder, monkeypatch, setting, available, expected):
+    monkeypatch.setattr(c, "PYTHON_INSTALLER", setting)
+    monkeypatch.setattr(python, "check_binaries", lambda binaries: available)
+    assert python_builder.get_installer() == expected
+
+
+def test_python_installer_of_app(python_builder, monkeypatch):
+    monkeypatch.setattr(c, "PYTHON_INSTALLER", "uv")
+    monkeypatch.setattr(python, "check_binaries", lambda binaries: True)
+    python_builder.env_file.write_text("HOP3_PYTHON_INSTALLER=pip\n")
+    assert python_builder.get_installer() == "pip"
+
+
+def test_python_installer_not_available(python_builder, monkeypatch):
+    monkeypatch.setattr(c, "PYTHON_INSTALLER", "uv")
+    monkeypatch.setattr(python, "check_binaries", lambda binaries: False)
+    with pytest.raises(Abort):
+        python_builder.get_installer()
+
+
+@pytest.mark.parametrize(
+    ("lockfile", "expected"),
+    [
+        ("requirements.txt", "uv pip install --python PYTHON -r requirements.txt"),
+        ("uv.lock", "uv sync --frozen --no-dev --no-editable --inexact"),
+        ("pyproject.toml", "uv pip install --python PYTHON ."),
+    ],
+)
+def test_install_with_uv(python_builder, lockfile, expected):
+    src_path = python_builder.src_path
+    (src_path / "pyproject.toml").write_text("[project]\nname = 'myapp'\n")
+    (src_path / lockfile).write_text("")
+    python_builder.install_with_uv()
+
+    python = python_builder.virtual_env / "bin" / "python"
+    assert python_builder.commands == [expected.replace("PYTHON", str(python))]
+
+
+def test_install_with_uv_poetry(python_builder):
+    (python_builder.src_path / "pyproject.toml").write_text("[tool.poetry]\n")
+    (python_builder.src_path / "poetry.lock").write_text(
+        '[[package]]\nname = "flask"\nversion = "2.1.3"\n\n'
+        '[[package]]\nname = "mylib"\nversion = "0.1.0"\n\n'
+        '[package.source]\ntype = "git"\nurl = "https://example.com/mylib.git"\n'
+    )
+    assert get_poetry_constraints(python_builder.src_path / "poetry.lock") == [
+        "flask==2.1.3"
+    ]
+
+    python_builder.install_with_uv()
+    [command] = python_builder.commands
+    assert command.startswith("uv pip install --python ")
+    assert " -c " in command
+    assert command.endswith("constraints.txt .")
@@ -0,0 +1,79 @@
+# Copyright (c) 2025, Abilian SAS
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from hop3.core.capabilities import HostCapabilities, get_binary
+
+
+@pytest.fixture
+def bin_path(tmp_path):
+    path = tmp_path / "bin"
+    path.mkdir()
+    script = path / "probe"
+    script.write_text("#!/bin/sh\necho v1\n")
+    script.chmod(0o755)
+    return path
+
+
+def test_command_output_cached(tmp_path, bin_path) -> None:
+    env = {"PATH": str(bin_path)}
+    capabilities = HostCapabilities(tmp_path / "capabilities.json")
+    assert "v1" in capabilities.command_output("probe --version", env=env)
+    assert "v1" in capabilities.command_output("probe --version", env=env)
+    assert (capabilities.hits, capabilities.misses) == (1, 1)
+
+    # Persistent: another process doesn't run the command again
+    capabilities = HostCapabilities(tmp_path / "capabilities.json")
+    assert "v1" in capabilities.command_output("probe --version", env=env)
+    assert (capabilities.hits, capabilities.misses) == (1, 0)
+
+
+def test_invalidated_by_binary(tmp_path, bin_path) -> None:
+    env = {"PATH": str(bin_path)}
+    capabilities = HostCapabilities(tmp_path / "capabilities.json")
+    assert "v1" in capabilities.command_output("probe --version", env=env)
+
+    # E.g. the package was upgraded
+    script = bin_path / "probe"
+    script.write_text("#!/bin/sh\necho v2\n")
+    stat = script.stat()
+    os.utime(script, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert "v2" in capabilities.command_output("probe --version", env=env)
+    assert capabilities.misses == 2
+
+
+def test_invalidated_by_depends(tmp_path) -> None:
+    release = tmp_path / "os-release"
+    release.write_text("VERSION_ID=12\n")
+    capabilities = HostCapabilities(tmp_path / "capabilities.json")
+    calls = []
+
+    def probe() -> str:
+        calls.append(1)
+        return release.read_text()
+
+    for _ in range(3):
+        capabilities.probe("release", probe, depends=[release])
+    assert len(calls) == 1
+
+    release.write_text("VERSION_ID=13\n")
+    assert capabilities.probe("release", probe, depends=[release]) == "VERSION_ID=13\n"
+    assert len(calls) == 2
+
+
+def test_which(tmp_path) -> None:
+    capabilities = HostCapabilities(tmp_path / "capabilities.json")
+    sh = capabilities.which("sh")
+    assert sh
+    assert capabilities.which("sh") == sh
+    assert capabilities.hits == 1
+    assert capabilities.which("no-such-binary") is None
+
+
+def test_get_binary() -> None:
+    assert get_binary("nginx -V") == "nginx"
+    assert get_binary("sudo -n lshw -class disk | grep size") == "lshw"
+    assert get_binary("") == ""
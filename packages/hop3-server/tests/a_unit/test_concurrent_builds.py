@@ -0,0 +1,66 @@
+# Copyright (c) 2025, Abilian SAS
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from hop3 import config as c
+from hop3.builders import NodeBuilder
+from hop3.builders.rust import RustBuilder
+
+# Fake tools, recording the directory and environment they are run with
+FAKE_TOOL = """#!/bin/sh
+sleep 0.05
+echo "$(pwd) $NODE_PATH" > build.out
+"""
+
+
+@pytest.fixture
+def fake_tools(tmp_path, monkeypatch):
+    bin_path = tmp_path / "bin"
+    bin_path.mkdir()
+    for name in ["cargo", "npm"]:
+        tool = bin_path / name
+        tool.write_text(FAKE_TOOL)
+        tool.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_path}:{os.environ['PATH']}")
+    monkeypatch.setattr(c, "BUILD_CACHE", False)
+    monkeypatch.setattr(c, "PACKAGE_CACHE_ROOT", tmp_path / "package-cache")
+
+
+def make_app(tmp_path, app_name: str, filename: str) -> NodeBuilder | RustBuilder:
+    app_path = tmp_path / app_name
+    (app_path / "src").mkdir(parents=True)
+    if filename == "package.json":
+        (app_path / "src" / filename).write_text("{}")
+        return NodeBuilder(app_name, app_path)
+    (app_path / "src" / filename).write_text(f"[package]\nname = '{app_name}'")
+    return RustBuilder(app_name, app_path)
+
+
+def test_concurrent_builds(tmp_path, fake_tools) -> None:
+    builders = [
+        make_app(tmp_path, f"app{i}", "package.json" if i % 2 else "Cargo.toml")
+        for i in range(8)
+    ]
+    cwd = os.getcwd()
+    path = os.environ["PATH"]
+
+    with ThreadPoolExecutor(len(builders)) as pool:
+        for future in [pool.submit(builder.build) for builder in builders]:
+            future.result()
+
+    # Each build ran in its own directory, with its own environment
+    for builder in builders:
+        out = (builder.src_path / "build.out").read_text().split(" ")
+        assert out[0] == str(builder.src_path)
+        if isinstance(builder, NodeBuilder):
+            assert out[1].strip() == str(builder.src_path / "node_modules")
+        else:
+            assert out[1].strip() == ""
+
+    # ... without changing the state of the process
+    assert os.getcwd() == cwd
+    assert os.environ["PATH"] == path
@@ -0,0 +1,88 @@
+# Copyright (c) 2025, Abilian SAS
+from __future__ import annotations
+
+import pytest
+
+from hop3 import config as c, deploy
+from hop3.deploy import Deployer
+from hop3.deploy_manifest import DeployManifest
+from hop3.orm import App
+
+PROCFILE = """\
+web: python -m http.server $PORT
+build: echo built >> ../builds.log
+"""
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(c, "APP_ROOT", tmp_path)
+    # Only the build phase is actually run
+    monkeypatch.setattr(Deployer, "_git_update", lambda self, newrev: None)
+    monkeypatch.setattr(deploy, "spawn_app", lambda app, deltas, restart: None)
+
+    app = App(name="myapp")
+    app.src_path.mkdir(parents=True)
+    (app.src_path / "Procfile").write_text(PROCFILE)
+    (app.src_path / "requirements.txt").write_text("flask")
+    return app
+
+
+def count_builds(app: App) -> int:
+    return len((app.app_path / "builds.log").read_text().splitlines())
+
+
+def test_build_skipped_when_unchanged(app) -> None:
+    Deployer(app).deploy()
+    assert count_builds(app) == 1
+    manifest = DeployManifest.load(app.app_path)
+    assert "src/requirements.txt" in manifest.inputs
+
+    # E.g. a config change: nothing to rebuild
+    Deployer(app).deploy()
+    assert count_builds(app) == 1
+
+    # Forced deploy
+    Deployer(app, force=True).deploy()
+    assert count_builds(app) == 2
+
+
+@pytest.mark.parametrize(
+    ("path", "content"),
+    [
+        ("src/requirements.txt", "flask\nrequests"),
+        ("ENV", "NODE_VERSION=22"),
+        ("src/Procfile", PROCFILE + "postbuild: true\n"),
+    ],
+)
+def test_rebuild_when_inputs_change(app, path, content) -> None:
+    Deployer(app).deploy()
+    (app.app_path / path).write_text(content)
+    Deployer(app).deploy()
+    assert count_builds(app) == 2
+
+
+def test_settings_change(app) -> None:
+    (app.app_path / "ENV").write_text("DEBUG=1\n")
+    Deployer(app).deploy()
+
+    # Not read by the build: only the configs are regenerated
+    (app.app_path / "ENV").write_text("DEBUG=0\nWORKERS=4\n")
+    Deployer(app).deploy()
+    assert count_builds(app) == 1
+
+    # Read by the build commands
+    (app.app_path / "ENV").write_text("HOP3_BUILD_ENV=NODE_ENV\nNODE_ENV=dev\n")
+    Deployer(app).deploy()
+    assert count_builds(app) == 2
+    (app.app_path / "ENV").write_text("HOP3_BUILD_ENV=NODE_ENV\nNODE_ENV=prod\n")
+    Deployer(app).deploy()
+    assert count_builds(app) == 3
+
+
+def test_rebuild_when_output_missing(app) -> None:
+    manifest = DeployManifest(build_key="key", outputs=["venv"])
+    assert not manifest.is_built("key", app.app_path)
+    (app.app_path / "venv").mkdir()
+    assert manifest.is_built("key", app.app_path)
+    assert not manifest.is_built("other", app.app_path)
@@ -0,0 +1,201 @@
+# Copyright (c) 2025, Abilian SAS
+from __future__ import annotations
+
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from hop3 import config as c
+from hop3.core import git as git_module
+from hop3.core.env import Env
+from hop3.core.git import CheckoutOptions, GitManager, git_output
+from hop3.orm import App
+
+GITMODULES = """\
+[submodule "lib"]
+\tpath = lib
+\turl = https://example.com/lib.git
+"""
+
+
+def git(*args: str, cwd: Path) -> str:
+    result = subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout.strip()
+
+
+def commit(work_path: Path, files: dict[str, str]) -> str:
+    for name, content in files.items():
+        (work_path / name).write_text(content)
+    if files:
+        git("add", "--", *files, cwd=work_path)
+    git("commit", "--quiet", "-m", "update", cwd=work_path)
+    git("push", "--quiet", "origin", "HEAD:master", cwd=work_path)
+    return git("rev-parse", "HEAD", cwd=work_path)
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch) -> App:
+    monkeypatch.setattr(c, "APP_ROOT", tmp_path / "apps")
+    c.APP_ROOT.mkdir()
+    app = App(name="myapp")
+    app.app_path.mkdir()
+    app.repo_path.mkdir()
+    git("init", "--quiet", "--bare", "--initial-branch=master", cwd=app.repo_path)
+    return app
+
+
+@pytest.fixture
+def work_path(tmp_path, app) -> Path:
+    work_path = tmp_path / "work"
+    git("clone", "--quiet", str(app.repo_path), str(work_path), cwd=tmp_path)
+    return work_path
+
+
+def test_worktree(app, work_path) -> None:
+    rev1 = commit(work_path, {"Procfile": "web: app", "a.txt": "a"})
+    GitManager(app).clone()
+
+    src_path = app.src_path
+    assert (src_path / ".git").is_file()
+    assert (src_path / "a.txt").read_text() == "a"
+    # The objects are shared with the repository
+    assert not (app.repo_path / "worktrees" / "src" / "objects").exists()
+    assert git_output(["rev-parse", "HEAD"], src_path) == rev1
+
+    # Untracked files (e.g. build outputs) are kept
+    (src_path / "node_modules").mkdir()
+    rev2 = commit(work_path, {"a.txt": "b"})
+    GitManager(app).checkout(rev2)
+    assert (src_path / "a.txt").read_text() == "b"
+    assert (src_path / "node_modules").exists()
+    assert git_output(["rev-parse", "HEAD"], src_path) == rev2
+
+
+def test_empty_repository(app, work_path) -> None:
+    manager = GitManager(app)
+    manager.clone()
+    assert app.src_path.exists()
+    assert not manager.is_worktree
+
+    # First push
+    rev = commit(work_path, {"Procfile": "web: app"})
+    manager.checkout(rev)
+    assert manager.is_worktree
+    assert (app.src_path / "Procfile").exists()
+
+
+def test_removed_sources(app, work_path) -> None:
+    commit(work_path, {"Procfile": "web: app"})
+    manager = GitManager(app)
+    manager.clone()
+    subprocess.run(["rm", "-rf", str(app.src_path)], check=True)
+
+    manager.clone()
+    assert manager.is_worktree
+
+
+def test_legacy_clone(app, work_path) -> None:
+    commit(work_path, {"a.txt": "a"})
+    app.src_path.parent.mkdir(exist_ok=True)
+    git("clone", "--quiet", str(app.repo_path), str(app.src_path), cwd=app.app_path)
+
+    rev = commit(work_path, {"a.txt": "b"})
+    GitManager(app).checkout(rev)
+    assert (app.src_path / ".git").is_dir()
+    assert (app.src_path / "a.txt").read_text() == "b"
+
+
+def test_submodules_skipped(app, work_path, monkeypatch) -> None:
+    sha = "0123456789abcdef0123456789abcdef01234567"
+    git("update-index", "--add", "--cacheinfo", f"160000,{sha},lib", cwd=work_path)
+    commit(work_path, {".gitmodules": GITMODULES, "a.txt": "a"})
+
+    calls = []
+
+    def shell(cmd: str, cwd: Path, env=None) -> None:
+        calls.append(cmd)
+        if "submodule" not in cmd:
+            git(*cmd.split()[1:], cwd=cwd)
+
+    monkeypatch.setattr(git_module, "shell", shell)
+    manager = GitManager(app)
+    manager.clone()
+    assert calls == [
+        "git submodule sync --quiet",
+        f"git submodule update --init --jobs {c.GIT_SUBMODULE_JOBS}",
+    ]
+
+    # Neither `.gitmodules` nor the submodules changed
+    calls.clear()
+    rev = commit(work_path, {"a.txt": "b"})
+    manager.checkout(rev)
+    assert calls == [f"git reset --quiet --hard {rev}"]
+
+    # The submodule changed
+    calls.clear()
+    sha = "1123456789abcdef0123456789abcdef01234567"
+    git("update-index", "--add", "--cacheinfo", f"160000,{sha},lib", cwd=work_path)
+    rev = commit(work_path, {})
+    manager.checkout(rev)
+    assert calls[-1] == f"git submodule update --init --jobs {c.GIT_SUBMODULE_JOBS}"
+
+
+def test_sparse_checkout(app, work_path) -> None:
+    (work_path / "app").mkdir()
+    (work_path / "data").mkdir()
+    commit(
+        work_path,
+        {
+            "Procfile": "web: app",
+            "app/main.py": "",
+            "app/big.bin": "x" * 2048,
+            "data/dump.sql": "",
+            "checkout.env": "HOP3_GIT_SPARSE_PATHS=app",
+        },
+    )
+    GitManager(app).clone()
+    src_path = app.src_path
+    assert (src_path / "Procfile").exists()
+    assert (src_path / "app" / "big.bin").exists()
+    assert not (src_path / "data").exists()
+
+    # The settings of the app override the ones of the repository
+    (app.app_path / "ENV").write_text("HOP3_GIT_BLOB_LIMIT=1K\n")
+    rev = commit(work_path, {"app/main.py": "print()"})
+    GitManager(app).checkout(rev)
+    assert (src_path / "app" / "main.py").read_text() == "print()"
+    assert not (src_path / "app" / "big.bin").exists()
+    assert not (src_path / "data").exists()
+
+    # Back to a full checkout
+    (app.app_path / "ENV").write_text("HOP3_GIT_SPARSE_PATHS=\n")
+    GitManager(app).checkout("")
+    assert (src_path / "app" / "big.bin").exists()
+    assert (src_path / "data" / "dump.sql").exists()
+
+
+def test_checkout_options() -> None:
+    options = CheckoutOptions.from_env(
+        Env({
+            "HOP3_GIT_SPARSE_PATHS": "app, /static/",
+            "HOP3_GIT_BLOB_LIMIT": "10M",
+            "HOP3_GIT_LFS_SKIP_SMUDGE": "1",
+        })
+    )
+    assert options.sparse_paths == ("app", "static")
+    assert options.blob_limit == 10 * 1024**2
+    assert options.get_env()["GIT_LFS_SKIP_SMUDGE"] == "1"
+    assert options.get_patterns(["app/#1.bin"]) == [
+        "/*",
+        "!/*/",
+        "/app/",
+        "/static/",
+        "!/app/\\#1.bin",
+    ]
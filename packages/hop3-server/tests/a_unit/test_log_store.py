@@ -0,0 +1,161 @@
+# Copyright (c) 2025, Abilian SAS
+from __future__ import annotations
+
+import fcntl
+import threading
+
+import pytest
+
+from hop3.commands.apps import LogsCmd
+from hop3.lib import Abort
+from hop3.logs import LogStore, parse_access_line, parse_since, parse_status
+
+# 2025-10-18T10:00:00Z
+T0 = 1760781600
+
+
+def access_line(t: int, status: int = 200, uri: str = "/") -> str:
+    minutes, seconds = divmod(t, 60)
+    return (
+        f'127.0.0.1 - - [18/Oct/2025:10:{minutes:02d}:{seconds:02d} +0000] "GET {uri}'
+        f' HTTP/1.1" {status} 123 "-" "curl/8.0" 4ms'
+    )
+
+
+def write(path, *lines: str) -> None:
+    with path.open("a") as fd:
+        fd.writelines(f"{line}\n" for line in lines)
+
+
+@pytest.fixture
+def store(tmp_path) -> LogStore:
+    log_path = tmp_path / "log"
+    log_path.mkdir()
+    return LogStore(tmp_path / "logstore", log_path, segment_rows=10, retention_days=0)
+
+
+def test_parse_access_line() -> None:
+    record = parse_access_line(
+        '10.0.0.1 - - [18/Oct/2025:12:00:00 +0200] "POST /api?x=1 HTTP/1.1"'
+        ' 503 42 "-" "Mozilla/5.0 (X11)" 1200ms'
+    )
+    assert record
+    assert record.timestamp == T0
+    assert (record.method, record.uri, record.status) == ("POST", "/api?x=1", 503)
+    assert (record.size, record.msecs) == (42, 1200)
+
+    assert parse_access_line("Traceback (most recent call last):") is None
+
+
+def test_parse_status() -> None:
+    assert parse_status("5xx") == [(500, 599)]
+    assert parse_status("404,5XX") == [(404, 404), (500, 599)]
+    with pytest.raises(ValueError, match="Invalid status"):
+        parse_status("6xx")
+
+
+def test_parse_since() -> None:
+    assert parse_since("90s", now=T0) == T0 - 90
+    assert parse_since("2h", now=T0) == T0 - 7200
+    assert parse_since("2025-10-18T10:00:00+00:00") == T0
+    with pytest.raises(ValueError, match="Invalid time"):
+        parse_since("yesterday")
+
+
+def test_query(store) -> None:
+    write(
+        store.log_path / "web.1.log",
+        *(
+            access_line(t, 500 if t % 10 == 0 else 200, f"/{t}")
+            for t in range(0, 60, 2)
+        ),
+    )
+    write(store.log_path / "worker.1.log", access_line(1), "some error")
+    assert store.ingest() == 32
+    # Several segments, so the queries span segments
+    assert len(list(store.root.glob("*/lines.txt"))) > 1
+
+    assert len(store.query()) == 32
+    entries = store.query(since=T0 + 10, until=T0 + 20)
+    assert [e.line.split()[6] for e in entries] == [f"/{t}" for t in range(10, 21, 2)]
+
+    entries = store.query(status=parse_status("5xx"))
+    assert [e.timestamp - T0 for e in entries] == [0, 10, 20, 30, 40, 50]
+    assert store.query(status=parse_status("5xx"), limit=2)[0].timestamp == T0 + 40
+
+    entries = store.query(grep="error")
+    assert [(e.worker, e.line) for e in entries] == [("worker.1", "some error")]
+    # Other lines get the time of the previous request
+    assert entries[0].timestamp == T0 + 1
+
+    assert len(store.query(workers="worker.*")) == 2
+    assert store.query(since=T0 + 3600) == []
+
+
+def test_incremental_ingest(store) -> None:
+    path = store.log_path / "web.1.log"
+    write(path, access_line(0), access_line(1))
+    with path.open("a") as fd:
+        fd.write("incomplete")
+    assert store.ingest() == 2
+    assert store.ingest() == 0
+
+    write(path, " line", access_line(2))
+    assert store.ingest() == 2
+    assert [e.line for e in store.query(grep="line")] == ["incomplete line"]
+    assert len(store.query()) == 4
+
+
+@pytest.mark.parametrize("grep", ["^", "x*", "$"])
+def test_grep_empty_match(store, grep) -> None:
+    write(store.log_path / "web.1.log", "hello", "world")
+    store.ingest()
+    assert [e.line for e in store.query(grep=grep)] == ["hello", "world"]
+
+
+def test_invalid_grep() -> None:
+    with pytest.raises(Abort, match="invalid regexp"):
+        LogsCmd(db_session=None).parse_args(["myapp", "--grep", "("])
+
+
+def test_rotation(store) -> None:
+    path = store.log_path / "web.1.log"
+    write(path, access_line(0))
+    store.ingest()
+
+    # E.g. uwsgi's `log-maxsize`: new lines in the old file, then a new file
+    write(path, access_line(1))
+    path.rename(path.with_name("web.1.log.old"))
+    write(path, access_line(2))
+    assert store.ingest() == 2
+    assert [e.timestamp - T0 for e in store.query()] == [0, 1, 2]
+
+    # Truncated
+    path.write_text("")
+    write(path, "restarted")
+    assert store.ingest() == 1
+    assert store.query()[-1].line == "restarted"
+
+
+def test_retention(store) -> None:
+    store.retention_days = 1
+    write(store.log_path / "web.1.log", *(access_line(t) for t in range(25)))
+    store.ingest()
+    # Only the full segments are removed
+    assert len(store.query()) == 5
+
+
+def test_query_waits_for_ingest(store) -> None:
+    write(store.log_path / "web.1.log", *(access_line(t) for t in range(25)))
+    store.ingest()
+
+    results = []
+    with (store.root / ".lock").open("w") as fd:
+        # E.g. a segment being sealed
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        thread = threading.Thread(target=lambda: results.append(store.query()))
+        thread.start()
+        thread.join(0.1)
+        assert not results
+    thread.join()
+    assert len(results[0]) == 25
@@ -0,0 +1,79 @@
+# Copyright (c) 2025, Abilian SAS
+from __future__ import annotations
+
+import subprocess
+
+import pytest
+
+from hop3 import config as c
+from hop3.commands.system import MaintenanceCmd
+from hop3.core.maintenance import MaintenanceState, RepoStats, maintain_repo
+from hop3.orm import App
+from hop3.scheduler import get_app_lock
+
+
+def git(*args: str, cwd) -> None:
+    subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=cwd,
+        capture_output=True,
+        check=True,
+    )
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch) -> App:
+    monkeypatch.setattr(c, "APP_ROOT", tmp_path / "apps")
+    app = App(name="maintained")
+    app.repo_path.mkdir(parents=True)
+    git("init", "--quiet", "--bare", "--initial-branch=master", cwd=app.repo_path)
+
+    # A few small pushes: loose objects
+    work_path = tmp_path / "work"
+    git("clone", "--quiet", str(app.repo_path), str(work_path), cwd=tmp_path)
+    for i in range(3):
+        (work_path / f"file{i}").write_text(f"{i}\n")
+        git("add", ".", cwd=work_path)
+        git("commit", "--quiet", "-m", f"commit {i}", cwd=work_path)
+        git("push", "--quiet", "origin", "HEAD:master", cwd=work_path)
+    return app
+
+
+def test_maintain_repo(app) -> None:
+    assert RepoStats.collect(app.repo_path).loose_objects == 9
+
+    state = maintain_repo(app)
+    assert state is not None
+    assert state.ok, state.error
+    assert state.before.loose_objects == 9
+    assert state.after.loose_objects == 0
+    assert state.after.packs == 1
+    assert (app.repo_path / "objects" / "pack" / "multi-pack-index").exists()
+    assert MaintenanceState.load(app.repo_path) == state
+
+    # Unchanged since
+    assert maintain_repo(app) is None
+    assert maintain_repo(app, force=True) is not None
+
+
+def test_not_during_deploy(app) -> None:
+    with get_app_lock(app.name):
+        assert maintain_repo(app) is None
+    assert MaintenanceState.load(app.repo_path) is None
+
+
+def test_command(app) -> None:
+    cmd = MaintenanceCmd()
+    [table] = cmd.call()
+    assert table["rows"][0][0] == "maintained"
+    assert table["rows"][0][4] == "-"
+
+    [result] = cmd.call("run")
+    assert result["text"].startswith("maintained: 0 -> 1 packs")
+
+    [table] = cmd.call()
+    assert table["rows"][0][2:4] == [1, 0]
+    assert table["rows"][0][-1] == "ok"
+
+    [result] = cmd.call("rnu")
+    assert "hop system maintenance" in result["text"]
@@ -0,0 +1,94 @@
+# Copyright (c) 2025, Abilian SAS
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from hop3.logs.metrics import (
+    AppMetrics,
+    LatencyHistogram,
+    RollingStats,
+    format_prometheus,
+)
+
+# 2025-10-18T10:00:00Z
+T0 = 1760781600
+
+
+def access_line(t: int, status: int = 200, msecs: int = 10) -> str:
+    minutes, seconds = divmod(t, 60)
+    return (
+        f"127.0.0.1 - - [18/Oct/2025:10:{minutes:02d}:{seconds:02d} +0000]"
+        f' "GET / HTTP/1.1" {status} 100 "-" "curl/8.0" {msecs}ms\n'
+    )
+
+
+@pytest.mark.parametrize("q", [0.5, 0.95, 0.99])
+def test_histogram_percentiles(q) -> None:
+    rng = random.Random(42)
+    values = sorted(int(rng.lognormvariate(4, 1.5)) for _ in range(10_000))
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+
+    expected = values[int(q * len(values)) - 1]
+    assert histogram.percentile(q) == pytest.approx(expected, rel=1 / 16, abs=1)
+    assert histogram.count == len(values)
+    assert len(histogram.counts) < 600
+
+
+def test_histogram_small_values_are_exact() -> None:
+    histogram = LatencyHistogram()
+    for value in [1, 2, 3, 4, 15]:
+        histogram.record(value)
+    assert histogram.percentile(0.5) == 3
+    assert histogram.percentile(1) == 15
+
+
+def test_rolling_window() -> None:
+    stats = RollingStats(window=60, resolution=10)
+    for t in range(120):
+        stats.record(T0 + t, 500 if t >= 110 else 200, 100, t)
+
+    window = stats.snapshot(T0 + 119)
+    assert window.requests == 60
+    assert window.get_status_counts()["5xx"] == 10
+    assert window.latency.percentile(0.01) == pytest.approx(60, abs=1)
+    assert stats.totals.requests == 120
+
+    assert stats.snapshot(T0 + 3600).requests == 0
+    # Too old for the window
+    stats.record(T0, 200, 100, 1)
+    assert stats.snapshot(T0 + 119).requests == 60
+
+
+def test_app_metrics(tmp_path) -> None:
+    path = tmp_path / "web.1.log"
+    path.write_text(access_line(0, msecs=20) + "not a request\n")
+    metrics = AppMetrics(tmp_path, window=60)
+    metrics.update()
+
+    with path.open("a") as fd:
+        fd.write(access_line(1, status=404, msecs=40))
+    metrics.update()
+
+    window = metrics.snapshot(now=T0 + 30)["web.1"]
+    assert window.requests == 2
+    assert window.bytes == 200
+    assert window.get_status_counts() == {
+        "1xx": 0,
+        "2xx": 1,
+        "3xx": 0,
+        "4xx": 1,
+        "5xx": 0,
+    }
+    assert window.latency.mean == 30
+
+    text = format_prometheus({"myapp": metrics}, now=T0 + 30)
+    labels = 'app="myapp",worker="web.1"'
+    assert f'hop3_http_requests_total{{{labels},status="4xx"}} 1' in text
+    assert f"hop3_http_response_bytes_total{{{labels}}} 200" in text
+    assert f'hop3_http_request_duration_seconds{{{labels},quantile="0.5"}} 0.02' in text
+    assert f"hop3_http_request_duration_seconds_count{{{labels}}} 2" in text
+    assert "# TYPE hop3_http_request_duration_seconds summary" in text
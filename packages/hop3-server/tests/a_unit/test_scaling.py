@@ -0,0 +1,82 @@
+# Copyright (c) 2025, Abilian SAS
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from hop3 import config as c
+from hop3.lib import Abort
+from hop3.orm import App
+from hop3.run import spawn
+from hop3.run.spawn import AppLauncher, get_scaling_changes
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    for name in ["APP_ROOT", "UWSGI_AVAILABLE", "UWSGI_ENABLED", "UWSGI_STATS"]:
+        path = tmp_path / name.lower()
+        path.mkdir()
+        monkeypatch.setattr(c, name, path)
+    monkeypatch.setattr(spawn, "UWSGI_ENABLED", c.UWSGI_ENABLED)
+
+    app = App(name="myapp")
+    app.src_path.mkdir(parents=True)
+    (app.src_path / "Procfile").write_text("wsgi: myapp:app\n")
+    (app.app_path / "ENV").write_text("UWSGI_PROCESSES=2\n")
+    return app
+
+
+def enabled_configs() -> dict[str, int]:
+    """The enabled configs, and their inodes."""
+    return {path.name: path.stat().st_ino for path in c.UWSGI_ENABLED.iterdir()}
+
+
+def test_scaling_changes() -> None:
+    to_create, to_destroy = get_scaling_changes(
+        {"web": 2, "wsgi": 3}, {"web": 4, "wsgi": 1}
+    )
+    assert to_create == {"web": range(3, 5), "wsgi": range(4, 2)}
+    assert list(to_destroy["web"]) == []
+    assert list(to_destroy["wsgi"]) == [3, 2]
+
+
+def test_scale(app) -> None:
+    AppLauncher(app).spawn_app()
+    AppLauncher(app).scale({"wsgi": 2})
+    before = enabled_configs()
+    assert sorted(before) == ["myapp_wsgi.1.ini", "myapp_wsgi.2.ini"]
+
+    t0 = time.perf_counter()
+    AppLauncher(app).scale({"wsgi": 6})
+    duration = time.perf_counter() - t0
+    after = enabled_configs()
+    assert sorted(after) == [f"myapp_wsgi.{i}.ini" for i in range(1, 7)]
+    # The running workers are not restarted (their configs are untouched)
+    assert {name: after[name] for name in before} == before
+    # No build, no restart of the other workers
+    assert duration < 1
+    assert "wsgi:6" in (app.virtualenv_path / "SCALING").read_text()
+    # With the environment of the deploy
+    assert "UWSGI_PROCESSES=2" in (c.UWSGI_ENABLED / "myapp_wsgi.6.ini").read_text()
+
+    AppLauncher(app).scale({"wsgi": 3})
+    assert sorted(enabled_configs()) == [f"myapp_wsgi.{i}.ini" for i in range(1, 4)]
+
+    with pytest.raises(Abort, match="no 'web' workers"):
+        AppLauncher(app).scale({"web": 2})
+
+
+def test_scale_blue_green(app) -> None:
+    AppLauncher(app).spawn_app()
+    # As left by a blue/green deploy
+    (c.UWSGI_ENABLED / "myapp_wsgi.1.ini").rename(
+        c.UWSGI_ENABLED / "myapp_wsgi.1.green.ini"
+    )
+    (app.app_path / "GENERATION").write_text("green")
+
+    AppLauncher(app).scale({"wsgi": 2})
+    assert sorted(enabled_configs()) == [
+        "myapp_wsgi.1.green.ini",
+        "myapp_wsgi.2.green.ini",
+    ]
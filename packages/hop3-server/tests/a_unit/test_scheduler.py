@@ -0,0 +1,118 @@
+# Copyright (c) 2025, Abilian SAS
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from hop3 import config as c, deploy
+from hop3.deploy import Deployer, DeploySlots
+from hop3.lib import Abort, echo
+from hop3.orm import App
+from hop3.scheduler import DeployScheduler
+
+PROCFILE = """\
+web: python -m http.server $PORT
+build: echo start >> ../../builds.log; sleep 0.1; echo end >> ../../builds.log
+"""
+
+
+class FakeScheduler(DeployScheduler):
+    """Simulate deploys, tracking how many run in each phase at once."""
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.lock = threading.Lock()
+        self.running = {"build": 0, "io": 0}
+        self.max_running = {"build": 0, "io": 0}
+
+    def deploy_app(self, app_name: str, newrev: str = "") -> None:
+        echo(f"Building {app_name}")
+        for phase in ["io", "build", "io"]:
+            with getattr(self.slots, phase):
+                self.enter(phase)
+                time.sleep(0.02)
+                self.leave(phase)
+        if app_name == "broken":
+            msg = "Build failed"
+            raise Abort(msg)
+
+    def enter(self, phase: str) -> None:
+        with self.lock:
+            self.running[phase] += 1
+            self.max_running[phase] = max(self.max_running[phase], self.running[phase])
+
+    def leave(self, phase: str) -> None:
+        with self.lock:
+            self.running[phase] -= 1
+
+
+class Scheduler(DeployScheduler):
+    """Run real deploys, without the database."""
+
+    def deploy_app(self, app_name: str, newrev: str = "") -> None:
+        Deployer(App(name=app_name), slots=self.slots).deploy(newrev=newrev)
+
+
+@pytest.fixture
+def app_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(c, "APP_ROOT", tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def apps(app_root, monkeypatch) -> list[str]:
+    """Apps whose build logs when it starts and ends (only the build is
+    actually run)."""
+    monkeypatch.setattr(Deployer, "_git_update", lambda self, newrev: None)
+    monkeypatch.setattr(deploy, "spawn_app", lambda app, deltas, restart: None)
+
+    app_names = [f"app{i}" for i in range(6)]
+    for app_name in app_names:
+        src_path = App(name=app_name).src_path
+        src_path.mkdir(parents=True)
+        (src_path / "Procfile").write_text(PROCFILE)
+    return app_names
+
+
+def test_concurrent_deploys(app_root) -> None:
+    app_names = [f"app{i}" for i in range(10)]
+    scheduler = FakeScheduler(
+        max_parallel=8, slots=DeploySlots.create(build_slots=2, io_slots=3)
+    )
+    results = scheduler.deploy(app_names)
+
+    assert [result.app_name for result in results] == app_names
+    assert all(result.ok for result in results)
+    assert scheduler.max_running["build"] == 2
+    assert scheduler.max_running["io"] <= 3
+
+    # Each app's output is captured in its own log
+    for app_name in app_names:
+        log = (app_root / app_name / "log" / "deploy.log").read_text()
+        assert log == f"Building {app_name}\n"
+
+
+def test_failed_deploy(app_root) -> None:
+    scheduler = FakeScheduler(max_parallel=2)
+    results = scheduler.deploy(["app1", "broken"])
+
+    assert [result.ok for result in results] == [True, False]
+    assert results[1].error == "Build failed"
+    log = (app_root / "broken" / "log" / "deploy.log").read_text()
+    assert "Build failed" in log
+
+
+def test_build_slots(app_root, apps) -> None:
+    scheduler = Scheduler(max_parallel=6, slots=DeploySlots.create(build_slots=2))
+    results = scheduler.deploy(apps)
+    assert all(result.ok for result in results)
+
+    running = max_running = 0
+    events = (app_root / "builds.log").read_text().split()
+    assert len(events) == 2 * len(apps)
+    for event in events:
+        running += 1 if event == "start" else -1
+        max_running = max(max_running, running)
+    assert max_running == 2
@@ -0,0 +1,64 @@
+# Copyright (c) 2025, Abilian SAS
+from __future__ import annotations
+
+import pytest
+
+from hop3 import config as c
+from hop3.orm import App
+from hop3.run import spawn
+from hop3.run.spawn import AppLauncher
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    for name in ["APP_ROOT", "UWSGI_AVAILABLE", "UWSGI_ENABLED", "UWSGI_STATS"]:
+        path = tmp_path / name.lower()
+        path.mkdir()
+        monkeypatch.setattr(c, name, path)
+    monkeypatch.setattr(spawn, "UWSGI_ENABLED", c.UWSGI_ENABLED)
+
+    app = App(name="myapp")
+    app.src_path.mkdir(parents=True)
+    (app.src_path / "Procfile").write_text("wsgi: myapp:app\nrwsgi: config.ru\n")
+    (app.app_path / "ENV").write_text("UWSGI_PROCESSES=2\n")
+    return app
+
+
+def enabled_configs() -> dict[str, tuple[int, int]]:
+    """The enabled configs, and their inodes and mtimes."""
+    result = {}
+    for path in sorted(c.UWSGI_ENABLED.iterdir()):
+        stat = path.stat()
+        result[path.name] = (stat.st_ino, stat.st_mtime_ns)
+    return result
+
+
+def test_redeploy_unchanged(app) -> None:
+    AppLauncher(app).spawn_app()
+    before = enabled_configs()
+    assert sorted(before) == ["myapp_rwsgi.1.ini", "myapp_wsgi.1.ini"]
+
+    # E.g. a redeploy without changes: no worker is restarted
+    AppLauncher(app, restart=False).spawn_app()
+    assert enabled_configs() == before
+
+    # A new deploy of the code: all the workers are restarted
+    AppLauncher(app).spawn_app()
+    after = enabled_configs()
+    assert all(after[name] != before[name] for name in before)
+
+
+def test_redeploy_config_change(app) -> None:
+    AppLauncher(app).spawn_app()
+    before = enabled_configs()
+
+    # Only the workers whose config changed are reloaded
+    app.src_path.joinpath("Procfile").write_text(
+        "wsgi: myapp:app\nrwsgi: config.ru --verbose\n"
+    )
+    AppLauncher(app, restart=False).spawn_app()
+    after = enabled_configs()
+    assert after["myapp_wsgi.1.ini"] == before["myapp_wsgi.1.ini"]
+    assert after["myapp_rwsgi.1.ini"] != before["myapp_rwsgi.1.ini"]
+    ini = (c.UWSGI_ENABLED / "myapp_rwsgi.1.ini").read_text()
+    assert "module = config.ru --verbose" in ini
@@ -0,0 +1,93 @@
+# Copyright (c) 2025, Abilian SAS
+from __future__ import annotations
+
+import pytest
+
+from hop3 import config as c
+from hop3.builders import ToolchainStore, get_used_toolchains, link_binaries
+from hop3.commands.system import ToolchainsCmd
+
+
+@pytest.fixture
+def installs(tmp_path, monkeypatch) -> list[str]:
+    """Fake node installs (without nodeenv)."""
+    installs = []
+
+    def install_node(version, path) -> None:
+        installs.append(version)
+        (path / "bin").mkdir(parents=True)
+        (path / "bin" / "node").write_text(version)
+        (path / "bin" / "activate").write_text("")
+
+    monkeypatch.setattr("hop3.builders._toolchains.INSTALLERS", {"node": install_node})
+    monkeypatch.setattr(c, "TOOLCHAIN_ROOT", tmp_path / "toolchains")
+    monkeypatch.setattr(c, "APP_ROOT", tmp_path / "apps")
+    monkeypatch.setattr(c, "BUILD_CACHE_ROOT", tmp_path / "build-cache")
+    return installs
+
+
+def test_install_once(installs) -> None:
+    store = ToolchainStore()
+    path = store.install("node", "20.1.0")
+    assert path == c.TOOLCHAIN_ROOT / "node" / "20.1.0"
+    assert store.install("node", "20.1.0") == path
+    assert installs == ["20.1.0"]
+    assert [(t.kind, t.version) for t in store.list()] == [("node", "20.1.0")]
+
+
+def test_invalid(installs) -> None:
+    store = ToolchainStore()
+    with pytest.raises(ValueError, match="Unknown toolchain"):
+        store.install("cobol", "1.0")
+    with pytest.raises(ValueError, match="Invalid node version"):
+        store.install("node", "../20")
+    assert not installs
+
+
+def test_link_and_gc(installs) -> None:
+    store = ToolchainStore()
+    venv = c.APP_ROOT / "app1" / "venv"
+    for version in ["18.0.0", "20.1.0"]:
+        with store.use("node", version, venv) as path:
+            link_binaries(path, venv)
+
+    node = venv / "bin" / "node"
+    assert node.is_symlink()
+    assert node.read_text() == "20.1.0"
+    assert not (venv / "bin" / "activate").exists()
+    assert get_used_toolchains(venv) == {"node": "20.1.0"}
+    assert store.get_users() == {("node", "20.1.0"): ["app1"]}
+
+    removed, freed = store.gc()
+    assert [t.version for t in removed] == ["18.0.0"]
+    assert freed > 0
+    assert [t.version for t in store.list()] == ["20.1.0"]
+
+
+def test_command(installs) -> None:
+    cmd = ToolchainsCmd()
+    [result] = cmd.call("install", "node", "20.1.0")
+    assert "Installed node 20.1.0" in result["text"]
+
+    [_, table] = cmd.call()
+    [[kind, version, _, users]] = table["rows"]
+    assert (kind, version, users) == ("node", "20.1.0", "-")
+
+    [result] = cmd.call("gc")
+    assert result["text"].startswith("Removed unused toolchains: node 20.1.0")
+    assert not ToolchainStore().list()
+
+
+def test_remove_used(installs) -> None:
+    venv = c.APP_ROOT / "app1" / "venv"
+    with ToolchainStore().use("node", "20.1.0", venv) as path:
+        link_binaries(path, venv)
+
+    cmd = ToolchainsCmd()
+    [result] = cmd.call("remove", "node", "20.1.0")
+    assert "used by app1" in result["text"]
+    assert ToolchainStore().list()
+
+    [result] = cmd.call("remove", "node", "20.1.0", "--force")
+    assert result["text"] == "Removed node 20.1.0."
+    assert not ToolchainStore().list()
@@ -0,0 +1,103 @@
+# Copyright (c) 2025, Abilian SAS
+#
+# SPDX-License-Identifier: Apache-2.0
+
+from __future__ import annotations
+
+import json
+import socketserver
+import threading
+import time
+
+import pytest
+
+from hop3 import config as c
+from hop3.run.uwsgi.stats import collect_stats, get_stats_socket
+
+STATS = {
+    "listen_queue": 14,
+    "listen_queue_errors": 3,
+    "sockets": [{"name": "/tmp/app.sock", "queue": 14, "max_queue": 16}],
+    "workers": [
+        {"id": 1, "pid": 101, "status": "busy", "requests": 30, "avg_rt": 2000},
+        {
+            "id": 2,
+            "pid": 102,
+            "status": "idle",
+            "requests": 10,
+            "avg_rt": 6000,
+            "rss": 1024,
+            "harakiri_count": 1,
+        },
+    ],
+}
+
+
+@pytest.fixture
+def uwsgi_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(c, "UWSGI_ENABLED", tmp_path / "enabled")
+    monkeypatch.setattr(c, "UWSGI_STATS", tmp_path / "stats")
+    c.UWSGI_ENABLED.mkdir()
+    c.UWSGI_STATS.mkdir()
+
+
+def serve(name: str, handle) -> socketserver.UnixStreamServer:
+    (c.UWSGI_ENABLED / f"{name}.ini").touch()
+
+    class Handler(socketserver.BaseRequestHandler):
+        def handle(self) -> None:
+            handle(self.request)
+
+    server = socketserver.ThreadingUnixStreamServer(
+        str(get_stats_socket(name)), Handler
+    )
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_collect_stats(uwsgi_dirs) -> None:
+    servers = [
+        serve("myapp_wsgi.1", lambda sock: sock.sendall(json.dumps(STATS).encode())),
+        # Hung vassal
+        serve("myapp_wsgi.2.blue", lambda sock: time.sleep(1)),
+    ]
+    # Not running
+    (c.UWSGI_ENABLED / "myapp_worker.1.ini").touch()
+    # Another app
+    (c.UWSGI_ENABLED / "myapp_other_web.1.ini").touch()
+
+    try:
+        t0 = time.perf_counter()
+        vassals = collect_stats("myapp", timeout=0.2)
+        # The sockets are read concurrently
+        assert time.perf_counter() - t0 < 0.5
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+
+    assert [v.name for v in vassals] == [
+        "myapp_worker.1",
+        "myapp_wsgi.1",
+        "myapp_wsgi.2.blue",
+    ]
+    not_running, wsgi, hung = vassals
+    assert not_running.error == "not running"
+    assert hung.error == "timeout"
+    assert (hung.kind, hung.ordinal, hung.generation) == ("wsgi", 2, "blue")
+
+    assert not wsgi.error
+    assert (wsgi.listen_queue, wsgi.listen_queue_max) == (14, 16)
+    assert wsgi.saturated
+    assert wsgi.busy_workers == 1
+    assert wsgi.requests == 40
+    assert wsgi.avg_rt == 3000
+    assert (wsgi.rss, wsgi.harakiri_count) == (1024, 1)
+
+    assert [v.name for v in collect_stats()] == [
+        "myapp_other_web.1",
+        "myapp_worker.1",
+        "myapp_wsgi.1",
+        "myapp_wsgi.2.blue",
+    ]
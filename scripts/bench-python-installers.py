@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2025, Abilian SAS
+#
+# SPDX-License-Identifier: Apache-2.0
+"""Benchmark the Python installers (pip vs uv) on the test apps.
+
+Builds each Python test app with `PythonBuilder`, with each installer,
+twice: with empty package caches ("cold"), then with the caches filled by
+the first build ("warm", the usual case of a redeploy with changed
+dependencies). The build cache is disabled, so that each build installs
+all the dependencies.
+
+Everything happens in a temporary HOP3_ROOT. Needs the network, pip,
+virtualenv and uv.
+
+Usage: python scripts/bench-python-installers.py [--apps 010 100 ...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+TEST_APPS = Path(__file__).parent.parent / "apps" / "test-apps"
+APPS = ["010", "100", "110", "120"]
+INSTALLERS = ["pip", "uv"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--apps", nargs="+", default=APPS, help="app prefixes")
+    args = parser.parse_args()
+
+    app_paths = [
+        path for prefix in args.apps for path in sorted(TEST_APPS.glob(f"{prefix}-*"))
+    ]
+
+    with tempfile.TemporaryDirectory(prefix="hop3-bench-") as tmpdir:
+        # (Read by `hop3.config` on import)
+        os.environ["HOP3_ROOT"] = tmpdir
+        os.environ["BUILD_CACHE"] = "false"
+
+        from hop3 import config as c
+        from hop3.builders import PackageCache, PythonBuilder
+
+        results: dict[tuple[str, str], dict[str, float]] = {}
+        for installer in INSTALLERS:
+            c.PYTHON_INSTALLER = installer
+            PackageCache().clear()
+            for run in ["cold", "warm"]:
+                for app_path in app_paths:
+                    build_path = (
+                        Path(tmpdir) / "apps" / f"{installer}-{run}" / app_path.name
+                    )
+                    shutil.copytree(app_path, build_path / "src")
+                    builder = PythonBuilder(app_path.name, build_path)
+
+                    t0 = time.perf_counter()
+                    builder.build()
+                    duration = time.perf_counter() - t0
+                    results.setdefault((app_path.name, run), {})[installer] = duration
+
+    print()
+    print(f"{'App':<28} {'Run':<5} {'pip':>8} {'uv':>8} {'Speedup':>8}")
+    for (app_name, run), durations in results.items():
+        pip, uv = durations["pip"], durations["uv"]
+        print(f"{app_name:<28} {run:<5} {pip:>7.1f}s {uv:>7.1f}s {pip / uv:>7.1f}x")
+    for run in ["cold", "warm"]:
+        pip = sum(d["pip"] for (_, r), d in results.items() if r == run)
+        uv = sum(d["uv"] for (_, r), d in results.items() if r == run)
+        print(f"{'Total':<28} {run:<5} {pip:>7.1f}s {uv:>7.1f}s {pip / uv:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2025, Abilian SAS
+#
+# SPDX-License-Identifier: Apache-2.0
+"""Benchmark the `/rpc` endpoint of the Hop3 server.
+
+Reports the number of RPC requests per second, first with a new database
+engine (and schema creation) for each request, as the server used to do,
+then with the process-wide, pooled engine.
+
+Usage: python scripts/bench-rpc.py [-n REQUESTS] [-c COMMAND]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+
+# Must be set before hop3.config is imported
+os.environ.setdefault("HOP3_ROOT", tempfile.mkdtemp(prefix="hop3-bench-"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-n", "--requests", type=int, default=500)
+    parser.add_argument("-c", "--command", default="apps")
+    args = parser.parse_args()
+
+    from hop3.orm import session
+    from hop3.server.asgi import create_app
+
+    app = create_app()
+
+    def per_request_database() -> session.Database:
+        # Old behaviour: new engine + create_all on every request
+        database = session.Database.create(session.c.DATABASE_URI)
+        database.migrate()
+        return database
+
+    pooled_get_database = session.get_database
+
+    session.get_database = per_request_database
+    before = asyncio.run(run(app, args.requests, args.command))
+
+    session.get_database = pooled_get_database
+    after = asyncio.run(run(app, args.requests, args.command))
+
+    print(f"Command: {args.command!r}, {args.requests} requests")
+    print(f"  per-request engine: {before:8.1f} req/s")
+    print(f"  pooled engine:      {after:8.1f} req/s")
+    print(f"  speedup:            {after / before:8.1f}x")
+
+
+async def run(app, n: int, command: str) -> float:
+    """Send `n` RPC requests to the ASGI app, return the requests / second."""
+    body = json.dumps({
+        "jsonrpc": "2.0",
+        "method": "cli",
+        "params": [[command]],
+        "id": 1,
+    }).encode()
+
+    # The views are quite verbose
+    with contextlib.redirect_stdout(io.StringIO()):
+        async with lifespan(app):
+            # Warm up (imports, first connection...)
+            await rpc(app, body)
+
+            t0 = time.perf_counter()
+            for _ in range(n):
+                status = await rpc(app, body)
+                assert status == 200, status
+            duration = time.perf_counter() - t0
+
+    return n / duration
+
+
+async def rpc(app, body: bytes) -> int:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/rpc",
+        "raw_path": b"/rpc",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 12345),
+        "server": ("127.0.0.1", 8000),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status = 0
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        return {"type": "http.disconnect"}
+
+    async def send(message) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    """Run the app's startup and shutdown events around the benchmark."""
+    startup = asyncio.Queue()
+    shutdown = asyncio.Queue()
+    await startup.put({"type": "lifespan.startup"})
+
+    async def receive():
+        if not startup.empty():
+            return await startup.get()
+        return await shutdown.get()
+
+    async def send(message) -> None:
+        pass
+
+    task = asyncio.create_task(app({"type": "lifespan"}, receive, send))
+    await asyncio.sleep(0)
+    try:
+        yield
+    finally:
+        await shutdown.put({"type": "lifespan.shutdown"})
+        await task
+
+
+if __name__ == "__main__":
+    main()
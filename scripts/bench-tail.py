@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2025, Abilian SAS
+#
+# SPDX-License-Identifier: Apache-2.0
+"""Benchmark reading the last lines of a large log file.
+
+Compares reading the whole file (through a `deque`, as `MultiTail` used
+to do) with reading it backwards from its end (`tail_lines`), on a
+synthetic uwsgi-like log.
+
+Usage: python scripts/bench-tail.py [--size MB] [-n LINES] [--keep]
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from collections import deque
+from pathlib import Path
+
+LINE = (
+    '127.0.0.1 - - [18/Oct/2025:10:00:00 +0000] "GET /api/items/{i} HTTP/1.1"'
+    ' 200 1534 "-" "Mozilla/5.0" {ms}ms\n'
+)
+
+
+def make_log(path: Path, size: int) -> None:
+    chunk = "".join(LINE.format(i=i, ms=i % 500) for i in range(10_000)).encode()
+    with path.open("wb") as fd:
+        written = 0
+        while written < size:
+            fd.write(chunk)
+            written += len(chunk)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--size", type=int, default=1024, help="in MB")
+    parser.add_argument("-n", "--lines", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="keep the log file")
+    args = parser.parse_args()
+
+    from hop3.lib.multi_tail import tail_lines
+
+    with tempfile.TemporaryDirectory(prefix="hop3-bench-") as tmpdir:
+        path = Path(tmpdir) / "web.1.log"
+        print(f"Writing a {args.size} MB log to {path}...")
+        make_log(path, args.size * 1024 * 1024)
+
+        t0 = time.perf_counter()
+        with path.open(errors="ignore") as fd:
+            expected = list(deque(fd, args.lines))
+        full_read = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        lines = tail_lines(path, args.lines)
+        backward = time.perf_counter() - t0
+
+        assert lines == expected
+        print(f"Last {args.lines} lines:")
+        print(f"  full read (deque): {full_read * 1000:10.1f} ms")
+        print(f"  backward read:     {backward * 1000:10.3f} ms")
+        print(f"  speedup:           {full_read / backward:10.0f}x")
+
+        if args.keep:
+            kept = Path(tempfile.gettempdir()) / path.name
+            path.rename(kept)
+            print(f"Log kept in {kept}")
+
+
+if __name__ == "__main__":
+    main()